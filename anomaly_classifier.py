@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+In-process Anomaly Classifier
+Classifies sliding windows of the 9 IMU axes inside the reader, so results
+are available without a second MQTT subscriber rebuilding the windows.
+
+Model formats:
+    .npz   dense network evaluated with NumPy (see export_dense_model):
+           W0, b0, W1, b1, ... (ReLU between layers, softmax at the end),
+           labels, input ('features' or 'raw'), window, optional mean/std
+           for input standardization
+    .onnx  any float32 [1, n] -> [1, labels] model, run on CPU with
+           onnxruntime; labels/input/window read from the model metadata
+           (metadata_props) with the same keys
+
+Input 'features' is the spectral_features matrix (9 axes x 12 features,
+flattened row by row); 'raw' is the (9, window) block flattened axis by
+axis.
+"""
+
+import json
+import time
+
+from spectral_features import FeatureExtractor, compute_features, np
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+INPUT_KINDS = ('features', 'raw')
+
+
+def _softmax(x):
+    e = np.exp(x - np.max(x))
+    return e / e.sum()
+
+
+class DenseModel:
+    def __init__(self, layers, labels, input_kind='features', window=128, mean=None, std=None):
+        """layers: list of (W, b) with W shaped (inputs, outputs)"""
+        self.layers = layers
+        self.labels = list(labels)
+        self.input_kind = input_kind
+        self.window = window
+        self.input_size = layers[0][0].shape[0]
+        self.mean = mean
+        self.std = std
+
+    def predict(self, x):
+        if self.mean is not None:
+            x = (x - self.mean) / self.std
+        last = len(self.layers) - 1
+        for i, (w, b) in enumerate(self.layers):
+            x = x @ w + b
+            if i < last:
+                np.maximum(x, 0.0, out=x)
+        return _softmax(x)
+
+
+class OnnxModel:
+    def __init__(self, path):
+        if onnxruntime is None:
+            raise ValueError("ONNX models require 'pip install onnxruntime'")
+        self.session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+        meta = self.session.get_modelmeta().custom_metadata_map
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = model_input.shape[-1]
+        self.input_kind = meta.get('input', 'features')
+        self.window = int(meta.get('window', 128))
+        labels = meta.get('labels')
+        self.labels = json.loads(labels) if labels else None
+
+    def predict(self, x):
+        scores = self.session.run(None, {self.input_name: x.astype(np.float32)[None, :]})[0][0]
+        if self.labels is None:
+            self.labels = [f'class{i}' for i in range(len(scores))]
+        # Beberapa exporter sudah menyertakan softmax, sebagian tidak
+        if np.all(scores >= 0) and abs(float(scores.sum()) - 1.0) < 1e-3:
+            return scores
+        return _softmax(scores)
+
+
+def load_model(path):
+    """Load a .npz dense network or an .onnx model"""
+    if np is None:
+        raise ValueError("Classification requires 'pip install numpy'")
+    if path.endswith('.onnx'):
+        model = OnnxModel(path)
+    else:
+        try:
+            data = np.load(path, allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Cannot load model {path}: {e}") from e
+        layers = []
+        while f'W{len(layers)}' in data:
+            i = len(layers)
+            layers.append((data[f'W{i}'], data[f'b{i}']))
+        if not layers or 'labels' not in data:
+            raise ValueError(f"{path} is not a dense model export (missing W0/b0/labels)")
+        model = DenseModel(
+            layers,
+            [str(label) for label in data['labels']],
+            input_kind=str(data['input']) if 'input' in data else 'features',
+            window=int(data['window']) if 'window' in data else 128,
+            mean=data['mean'] if 'mean' in data else None,
+            std=data['std'] if 'std' in data else None,
+        )
+    if model.input_kind not in INPUT_KINDS:
+        raise ValueError(f"Unknown model input '{model.input_kind}' (expected one of {', '.join(INPUT_KINDS)})")
+    return model
+
+
+def export_dense_model(path, weights, biases, labels, input_kind='features', window=128,
+                       mean=None, std=None):
+    """Write a dense network (e.g. trained with Keras/scikit-learn) in the .npz format above"""
+    arrays = {'labels': np.array(labels), 'input': np.array(input_kind), 'window': np.array(window)}
+    for i, (w, b) in enumerate(zip(weights, biases)):
+        arrays[f'W{i}'] = np.asarray(w, dtype=np.float64)
+        arrays[f'b{i}'] = np.asarray(b, dtype=np.float64)
+    if mean is not None:
+        arrays['mean'] = np.asarray(mean, dtype=np.float64)
+        arrays['std'] = np.where(np.asarray(std, dtype=np.float64) == 0, 1.0, std)
+    np.savez(path, **arrays)
+
+
+class WindowClassifier(FeatureExtractor):
+    def __init__(self, model, hop=0):
+        """Classify the model's window every hop samples (default: half a window)"""
+        super().__init__(model.window, hop or max(1, model.window // 2))
+        self.model = model
+        expected = len(self.names) * 9 if model.input_kind == 'features' else 9 * model.window
+        if isinstance(model.input_size, int) and model.input_size != expected:
+            raise ValueError(f"Model expects {model.input_size} inputs, "
+                             f"'{model.input_kind}' input with window {model.window} gives {expected}")
+        self.inferences = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def compute(self):
+        """Run one inference on the current window, returns the classification payload"""
+        block, timestamps, sample_rate = self.window_block()
+        started = time.perf_counter()
+        if self.model.input_kind == 'features':
+            x = compute_features(block, sample_rate, self.n_bands).ravel()
+        else:
+            x = block.ravel()
+        scores = self.model.predict(x)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.inferences += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+        best = int(np.argmax(scores))
+        return {
+            "label": self.model.labels[best],
+            "confidence": round(float(scores[best]), 4),
+            "classifications": {label: round(float(p), 4) for label, p in zip(self.model.labels, scores)},
+            "timestamp": int(timestamps[-1]),
+            "window": len(timestamps),
+            "inference_ms": round(elapsed_ms, 3),
+        }
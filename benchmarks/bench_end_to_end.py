@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark
+Starts a local broker (mosquitto with --mosquitto, otherwise the in-process
+stub from mqtt_stub_broker.py), runs each bridge as a child process against
+synthetic input and measures what reaches a subscriber: sustained
+messages/sec, p50/p99 ingest-to-publish latency, CPU usage and peak RSS of
+the bridge process. Results are printed (and optionally written) as JSON.
+
+Targets:
+    esp32    esp32_mqtt_reader.py fed through a pseudo-terminal
+             (--publish-interval 0, so every sample is published)
+    openplc  integration-scripts/openplc_bridge.py polling a stand-in Modbus
+             TCP server whose holding register 0 carries a sequence number
+    scada    integration-scripts/scada_db_bridge.py reading a synthetic
+             ScadaBR result set (pymysql.connect replaced in the child)
+
+Usage:
+    python3 benchmarks/bench_end_to_end.py [--duration 10] [--targets esp32,openplc,scada]
+                                           [--mosquitto] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tty
+from datetime import datetime
+from pathlib import Path
+
+import paho.mqtt.client as mqtt
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mqtt_stub_broker import StubBroker  # noqa: E402
+
+SAMPLE_LINE = (
+    '{"timestamp":%d,"adxl345":{"ax":0.04,"ay":10.51,"az":-1.61},'
+    '"mpu6050":{"accel":{"x":-0.52,"y":9.71,"z":1.02},'
+    '"gyro":{"x":-0.0213,"y":0.0121,"z":-0.0045},"temp":31.2},'
+    '"bmp280":{"temp":30.1,"pressure":1008.52,"altitude":40.12}}\r\n'
+)
+
+
+# ==================== BROKER ====================
+
+def wait_for_port(host, port, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def start_broker(use_mosquitto):
+    """Return (kind, port, stop function)"""
+    binary = shutil.which('mosquitto') if use_mosquitto else None
+    if use_mosquitto and not binary:
+        print("[!] mosquitto not found on PATH, using the in-process stub broker", file=sys.stderr)
+    if binary:
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        conf = tempfile.NamedTemporaryFile('w', suffix='.conf', delete=False)
+        conf.write(f"listener {port} 127.0.0.1\nallow_anonymous true\n")
+        conf.close()
+        proc = subprocess.Popen([binary, '-c', conf.name],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if not wait_for_port('127.0.0.1', port):
+            proc.kill()
+            raise RuntimeError("mosquitto did not start")
+
+        def stop():
+            proc.terminate()
+            proc.wait()
+            os.unlink(conf.name)
+        return 'mosquitto', port, stop
+
+    broker = StubBroker().start()
+    return 'stub', broker.port, broker.stop
+
+
+# ==================== SUBSCRIBER ====================
+
+class Collector:
+    def __init__(self, port, topic, latency):
+        """Subscribe to topic and time every message with latency(topic, payload, perf, wall)"""
+        self.latency = latency
+        self.counting = False
+        self.messages = 0
+        self.latencies = []
+        client_id = f"bench-collector-{os.getpid()}"
+        if hasattr(mqtt, 'CallbackAPIVersion'):  # paho-mqtt >= 2.0
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id)
+        else:
+            self.client = mqtt.Client(client_id=client_id)
+        self.client.on_message = self.on_message
+        self.client.on_connect = lambda client, userdata, flags, rc: client.subscribe(topic)
+        self.client.connect('127.0.0.1', port)
+        self.client.loop_start()
+
+    def on_message(self, client, userdata, message):
+        perf = time.perf_counter()
+        wall = time.time()
+        if not self.counting:
+            return
+        self.messages += 1
+        try:
+            latency = self.latency(message.topic, message.payload, perf, wall)
+        except (ValueError, KeyError, TypeError):
+            latency = None
+        if latency is not None:
+            self.latencies.append(latency)
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+# ==================== TARGETS ====================
+
+class ESP32Target:
+    name = 'esp32'
+    topic = 'bench/esp32/#'
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.sent = {}
+        self._stop_event = threading.Event()
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+
+    def command(self, broker_port):
+        return [sys.executable, str(ROOT / 'esp32_mqtt_reader.py'), os.ttyname(self.slave),
+                '--broker', '127.0.0.1', '--port', str(broker_port),
+                '--topic-prefix', 'bench/esp32', '--publish-interval', '0']
+
+    def start_input(self):
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def _write_loop(self):
+        period = 1.0 / self.rate
+        start = time.perf_counter()
+        seq = 0
+        while not self._stop_event.is_set():
+            wait = start + seq * period - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            self.sent[seq] = time.perf_counter()
+            try:
+                os.write(self.master, (SAMPLE_LINE % seq).encode())
+            except OSError:
+                return
+            seq += 1
+
+    def latency(self, topic, payload, perf, wall):
+        if not topic.endswith('/all'):
+            return None
+        sent = self.sent.get(json.loads(payload)['timestamp'])
+        return None if sent is None else perf - sent
+
+    def stop_input(self):
+        self._stop_event.set()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class _ModbusHandler(socketserver.BaseRequestHandler):
+    """Modbus TCP: read coils (1), holding (3) and input (4) registers"""
+
+    def handle(self):
+        registers = self.server.registers
+        sock = self.request
+        while True:
+            header = sock.recv(7)
+            if len(header) < 7:
+                return
+            tid, pid, length, unit = struct.unpack('!HHHB', header)
+            pdu = sock.recv(length - 1)
+            function, address, count = struct.unpack_from('!BHH', pdu)
+            if function == 1:
+                bits = bytearray((count + 7) // 8)
+                for i in range(count):
+                    if registers['coil'][address + i]:
+                        bits[i // 8] |= 1 << (i % 8)
+                body = bytes([function, len(bits)]) + bytes(bits)
+            elif function in (3, 4):
+                table = registers['holding' if function == 3 else 'input']
+                values = table[address:address + count]
+                body = bytes([function, 2 * count]) + struct.pack(f'!{count}H', *values)
+            else:
+                body = bytes([function | 0x80, 1])  # Illegal function
+            sock.sendall(struct.pack('!HHHB', tid, pid, len(body) + 1, unit) + body)
+
+
+class OpenPLCTarget:
+    name = 'openplc'
+    topic = 'iiot/#'
+    SCALE = 0.1  # REGISTER_MAPPING['holding:0']['scale']
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.sent = {}
+        self.seen = set()
+        self._stop_event = threading.Event()
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _ModbusHandler)
+        self.server.daemon_threads = True
+        self.server.registers = {
+            'holding': [0, 500, 150, 25] + [0] * 12,
+            'input': [1450, 0, 850] + [0] * 13,
+            'coil': [True] + [False] * 15,
+        }
+
+    def command(self, broker_port):
+        return [sys.executable, __file__, '--child', 'openplc', '--broker-port', str(broker_port),
+                '--modbus-port', str(self.server.server_address[1])]
+
+    def start_input(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._update_loop, daemon=True).start()
+
+    def _update_loop(self):
+        period = 1.0 / self.rate
+        registers = self.server.registers
+        seq = 0
+        while not self._stop_event.wait(period):
+            seq = (seq + 1) & 0xffff
+            self.sent[seq] = time.perf_counter()
+            registers['holding'][0] = seq
+            registers['input'][1] = seq
+
+    def latency(self, topic, payload, perf, wall):
+        if topic != 'iiot/sensor/temperature':
+            return None
+        seq = round(json.loads(payload)['value'] / self.SCALE)
+        if seq in self.seen:
+            return None  # Nilai lama dibaca ulang, bukan data baru
+        self.seen.add(seq)
+        sent = self.sent.get(seq)
+        return None if sent is None else perf - sent
+
+    def stop_input(self):
+        self._stop_event.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SCADATarget:
+    name = 'scada'
+    topic = 'iiot/#'
+
+    def __init__(self, rate):
+        self.rate = rate
+
+    def command(self, broker_port):
+        return [sys.executable, __file__, '--child', 'scada', '--broker-port', str(broker_port),
+                '--rate', str(self.rate)]
+
+    def start_input(self):
+        pass  # Data dibuat di dalam child (SyntheticScadaConnection)
+
+    def latency(self, topic, payload, perf, wall):
+        return wall - json.loads(payload)['timestamp'] / 1000.0
+
+    def stop_input(self):
+        pass
+
+
+TARGETS = {
+    'esp32': ESP32Target,
+    'openplc': OpenPLCTarget,
+    'scada': SCADATarget,
+}
+
+
+# ==================== CHILD MODE ====================
+
+class SyntheticScadaConnection:
+    """Stands in for a pymysql connection to a ScadaBR database"""
+
+    def __init__(self, tags, rate):
+        self.tags = tags
+        self.period = 1.0 / rate
+        self.seq = 0
+        self.last_write = time.time()
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        # Titik data baru ditulis SCADA setiap period
+        now = time.time()
+        if now - self.last_write >= self.period:
+            self.seq += 1
+            self.last_write = now
+
+    def fetchall(self):
+        ts = int(self.last_write * 1000)
+        return [{'tag_name': tag, 'point_name': tag.title(), 'value': float(self.seq + i),
+                 'timestamp': ts, 'unit': ''} for i, tag in enumerate(self.tags)]
+
+    def close(self):
+        pass
+
+
+def run_child(args):
+    """Run one bridge in this process against the benchmark broker"""
+    sys.path.insert(0, str(ROOT / 'integration-scripts'))
+    if args.child == 'openplc':
+        import openplc_bridge as bridge_module
+        bridge_module.OPENPLC_CONFIG.update(host='127.0.0.1', port=args.modbus_port)
+        bridge = bridge_module.OpenPLCBridge
+    else:
+        import scada_db_bridge as bridge_module
+        bridge_module.pymysql.connect = lambda **kwargs: SyntheticScadaConnection(
+            bridge_module.TAG_MAPPING, args.rate)
+        bridge = bridge_module.SCADABridge
+    bridge_module.MQTT_CONFIG.update(broker='127.0.0.1', port=args.broker_port)
+    bridge_module.UPDATE_INTERVAL = args.poll_interval
+
+    instance = bridge()
+    if instance.start():
+        instance.run()
+
+
+# ==================== MEASUREMENT ====================
+
+def process_cpu_seconds(pid):
+    """utime + stime of a running process from /proc (Linux)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def percentile(values, q):
+    return values[max(0, int(len(values) * q) - 1)]
+
+
+def run_target(target, broker_port, duration, warmup):
+    collector = Collector(broker_port, target.topic, target.latency)
+    target.start_input()
+    proc = subprocess.Popen(target.command(broker_port), stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(warmup)
+
+    cpu_start = process_cpu_seconds(proc.pid)
+    collector.counting = True
+    started = time.perf_counter()
+    time.sleep(duration)
+    collector.counting = False
+    elapsed = time.perf_counter() - started
+    cpu_end = process_cpu_seconds(proc.pid)
+
+    # Reap sendiri dengan wait4 (untuk rusage); Popen.send_signal/poll akan me-reap duluan
+    usage = None
+    try:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        crashed = bool(pid)  # Bridge sudah keluar sebelum diminta berhenti
+        if not crashed:
+            os.kill(proc.pid, signal.SIGINT)
+            deadline = time.time() + 10
+            while True:
+                pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                if pid:
+                    break
+                if time.time() > deadline:
+                    proc.kill()
+                    pid, status, usage = os.wait4(proc.pid, 0)
+                    break
+                time.sleep(0.05)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    except ChildProcessError:
+        crashed = True
+        proc.wait()
+    target.stop_input()
+    collector.close()
+
+    latencies = sorted(v * 1000 for v in collector.latencies)
+    if cpu_start is None or cpu_end is None:
+        cpu_percent = None  # Bukan Linux, tidak ada /proc
+    else:
+        cpu_percent = round((cpu_end - cpu_start) / elapsed * 100, 2)
+    return {
+        'messages': collector.messages,
+        'messages_per_sec': round(collector.messages / elapsed, 1),
+        'latency_samples': len(latencies),
+        'latency_ms_p50': round(percentile(latencies, 0.5), 3) if latencies else None,
+        'latency_ms_p99': round(percentile(latencies, 0.99), 3) if latencies else None,
+        'latency_ms_max': round(latencies[-1], 3) if latencies else None,
+        'cpu_percent': cpu_percent,
+        'cpu_seconds_total': round(usage.ru_utime + usage.ru_stime, 3) if usage else None,
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1) if usage else None,  # ru_maxrss dalam KB di Linux
+        'exit_code': proc.returncode,
+        'failed': crashed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end bridge throughput benchmark')
+    parser.add_argument('--targets', default='esp32,openplc,scada',
+                        help='Comma-separated targets: esp32, openplc, scada (default: all)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Measurement window per target in seconds (default: 10)')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Seconds before measuring, bridges wait 2s for MQTT (default: 3)')
+    parser.add_argument('--rate', type=float, default=200.0, help='Synthetic input rate in samples/s (default: 200)')
+    parser.add_argument('--mosquitto', action='store_true', help='Use a local mosquitto binary instead of the stub broker')
+    parser.add_argument('--output', metavar='FILE', help='Also write the JSON results to FILE')
+    # Dipakai saat script menjalankan dirinya sendiri sebagai bridge
+    parser.add_argument('--child', choices=['openplc', 'scada'], help=argparse.SUPPRESS)
+    parser.add_argument('--broker-port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--modbus-port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--poll-interval', type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    names = [name.strip() for name in args.targets.split(',') if name.strip()]
+    unknown = [name for name in names if name not in TARGETS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+
+    kind, port, stop_broker = start_broker(args.mosquitto)
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'broker': kind,
+        'duration_s': args.duration,
+        'input_rate': args.rate,
+        'targets': {},
+    }
+    try:
+        for name in names:
+            print(f"[*] Running {name} for {args.duration:g}s...", file=sys.stderr)
+            try:
+                results['targets'][name] = result = run_target(TARGETS[name](args.rate), port,
+                                                               args.duration, args.warmup)
+            except Exception as e:
+                results['targets'][name] = {'failed': True, 'error': f"{type(e).__name__}: {e}"}
+                print(f"[✗] {name} failed: {e}", file=sys.stderr)
+                continue
+            if result['failed']:
+                print(f"[✗] {name} exited early with code {result['exit_code']}", file=sys.stderr)
+    finally:
+        stop_broker()
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Line framer micro-benchmark
+Feeds large serial bursts through the legacy str split loop and through
+serial_framer.LineFramer, and reports throughput for both.
+
+Usage:
+    python3 benchmarks/bench_framer.py [--lines 20000] [--chunk 4096]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from serial_framer import LineFramer  # noqa: E402
+
+SAMPLE_LINE = (
+    '{"timestamp":%d,"adxl345":{"ax":0.04,"ay":10.51,"az":-1.61},'
+    '"mpu6050":{"accel":{"x":-0.52,"y":9.71,"z":1.02},'
+    '"gyro":{"x":-0.0213,"y":0.0121,"z":-0.0045},"temp":31.2},'
+    '"bmp280":{"temp":30.1,"pressure":1008.52,"altitude":40.12}}\r\n'
+)
+
+
+def legacy_frame(chunks):
+    """Original esp32_mqtt_reader.py loop: decode, concatenate, split"""
+    count = 0
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode('utf-8', errors='ignore')
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            if line.strip():
+                count += 1
+    return count
+
+
+def framer_frame(chunks):
+    count = 0
+    framer = LineFramer()
+    for chunk in chunks:
+        for line in framer.feed(chunk):
+            if line.strip():
+                count += 1
+    return count
+
+
+def bench(func, chunks, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func(chunks)
+        best = min(best, time.perf_counter() - start)
+    return count, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Line framer micro-benchmark')
+    parser.add_argument('--lines', type=int, default=20000, help='Lines per burst (default: 20000)')
+    parser.add_argument('--chunk', type=int, nargs='+', default=[64, 4096, 0],
+                        help='Chunk sizes in bytes, 0 = whole burst in one read (default: 64 4096 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions, best is reported (default: 3)')
+    args = parser.parse_args()
+
+    burst = ''.join(SAMPLE_LINE % i for i in range(args.lines)).encode()
+    results = []
+    for size in args.chunk:
+        size = size or len(burst)
+        chunks = [burst[i:i + size] for i in range(0, len(burst), size)]
+        for name, func in (('legacy_str_split', legacy_frame), ('line_framer', framer_frame)):
+            count, elapsed = bench(func, chunks, args.repeat)
+            results.append({
+                'impl': name,
+                'chunk_bytes': size,
+                'lines': count,
+                'seconds': round(elapsed, 4),
+                'lines_per_sec': round(count / elapsed),
+                'mb_per_sec': round(len(burst) / elapsed / 1e6, 2),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Payload codec benchmark
+Compares payload size and encode/decode time of the JSON documents
+published by esp32_mqtt_reader.py against the binary (and msgpack, if
+installed) encodings from payload_codec.py.
+
+Usage:
+    python3 benchmarks/bench_payload_codec.py [--batch-size 10] [--number 20000]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from payload_codec import ENCODINGS, decode_payload  # noqa: E402
+from sample_batch import SampleBatch  # noqa: E402
+from sensor_parser import SensorLineParser  # noqa: E402
+
+SAMPLE = {
+    "timestamp": 1234567,
+    "adxl345": {"ax": 0.039227, "ay": 10.512856, "az": -1.608315},
+    "mpu6050": {
+        "accel": {"x": -0.521568, "y": 9.713862, "z": 1.024152},
+        "gyro": {"x": -0.021315, "y": 0.012118, "z": -0.004529},
+        "temp": 31.23,
+    },
+    "bmp280": {"temp": 30.12, "pressure": 1008.523, "altitude": 40.1245},
+    "reception_time": datetime.now().isoformat(),
+}
+
+
+def make_batch_payload(size):
+    batch = SampleBatch(size)
+    parser = SensorLineParser()
+    for i in range(size):
+        sample = dict(SAMPLE, timestamp=SAMPLE["timestamp"] + i * 100)
+        batch.append(parser.parse(json.dumps(sample, separators=(',', ':'))))
+    payload = batch.to_payload()
+    payload["reception_time"] = SAMPLE["reception_time"]
+    return payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Payload codec benchmark')
+    parser.add_argument('--batch-size', type=int, default=10, help='Samples per batch message (default: 10)')
+    parser.add_argument('--number', type=int, default=20000, help='Iterations per measurement (default: 20000)')
+    args = parser.parse_args()
+
+    documents = {'sample': SAMPLE, 'batch': make_batch_payload(args.batch_size)}
+    results = []
+    for encoding, encoders in ENCODINGS.items():
+        for (kind, document), encode in zip(documents.items(), encoders):
+            payload = encode(document)
+            if isinstance(payload, str):
+                payload = payload.encode('utf-8')
+            encode_s = min(timeit.repeat(lambda: encode(document), number=args.number, repeat=3))
+            decode_s = min(timeit.repeat(lambda: decode_payload(payload), number=args.number, repeat=3))
+            results.append({
+                'encoding': encoding,
+                'document': kind,
+                'bytes': len(payload),
+                'encode_us': round(encode_s / args.number * 1e6, 2),
+                'decode_us': round(decode_s / args.number * 1e6, 2),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Serial ingestion benchmark for esp32_mqtt_reader.py
+Drives ESP32MQTTReader through a local pseudo-terminal (no ESP32 or broker
+needed) and reports idle CPU usage and per-line serial-to-parse latency.
+
+Usage:
+    python3 benchmarks/bench_serial_ingest.py [--idle 5] [--lines 200]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from esp32_mqtt_reader import ESP32MQTTReader  # noqa: E402
+
+SAMPLE_LINE = (
+    '{"timestamp":%d,"adxl345":{"ax":0.04,"ay":10.51,"az":-1.61},'
+    '"mpu6050":{"accel":{"x":-0.52,"y":9.71,"z":1.02},'
+    '"gyro":{"x":-0.0213,"y":0.0121,"z":-0.0045},"temp":31.2},'
+    '"bmp280":{"temp":30.1,"pressure":1008.52,"altitude":40.12}}\r\n'
+)
+
+
+class BenchReader(ESP32MQTTReader):
+    """Reader with MQTT disabled that timestamps every parsed line"""
+
+    def __init__(self, serial_port):
+        super().__init__(serial_port)
+        self.received = {}
+
+    def setup_mqtt(self):
+        self.is_connected = True
+        return True
+
+    def parse_and_publish(self, data_str):
+        try:
+            ts = json.loads(data_str.strip())["timestamp"]
+        except ValueError:
+            return
+        self.received[ts] = time.perf_counter()
+
+    def cleanup(self):
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial ingestion benchmark')
+    parser.add_argument('--idle', type=float, default=5.0, help='Idle measurement window in seconds (default: 5)')
+    parser.add_argument('--lines', type=int, default=200, help='Number of lines for the latency test (default: 200)')
+    parser.add_argument('--gap', type=float, default=0.02, help='Gap between lines in seconds (default: 0.02)')
+    args = parser.parse_args()
+
+    master_fd, slave_fd = os.openpty()
+    reader = BenchReader(os.ttyname(slave_fd))
+    thread = threading.Thread(target=reader.run, daemon=True)
+    thread.start()
+    time.sleep(1.0)
+
+    # Idle CPU: nothing is written to the port
+    cpu_start = time.process_time()
+    time.sleep(args.idle)
+    idle_cpu = (time.process_time() - cpu_start) / args.idle * 100
+
+    # Per-line latency: write complete lines and time until parse
+    sent = {}
+    for ts in range(args.lines):
+        sent[ts] = time.perf_counter()
+        os.write(master_fd, (SAMPLE_LINE % ts).encode())
+        time.sleep(args.gap)
+    time.sleep(0.5)
+
+    latencies = sorted((reader.received[ts] - sent[ts]) * 1000 for ts in sent if ts in reader.received)
+    result = {
+        'idle_cpu_percent': round(idle_cpu, 3),
+        'lines_sent': len(sent),
+        'lines_received': len(latencies),
+        'latency_ms_p50': round(statistics.median(latencies), 3) if latencies else None,
+        'latency_ms_p99': round(latencies[int(len(latencies) * 0.99) - 1], 3) if latencies else None,
+        'latency_ms_max': round(latencies[-1], 3) if latencies else None,
+    }
+    print(json.dumps(result, indent=2))
+
+    if hasattr(reader, 'stop'):
+        reader.stop()
+    os.close(master_fd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Minimal in-process MQTT 3.1.1 broker for benchmarks
+Enough of the protocol for paho clients: CONNECT, PUBLISH (QoS 0/1/2
+acknowledged, delivered to subscribers at QoS 0), SUBSCRIBE with + and #
+wildcards, UNSUBSCRIBE, PINGREQ and DISCONNECT. No retained messages,
+sessions or authentication. Use mosquitto when those matter.
+"""
+
+import socket
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter match with + and # wildcards"""
+    pattern_levels = pattern.split('/')
+    topic_levels = topic.split('/')
+    for i, level in enumerate(pattern_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels):
+            return False
+        if level != '+' and level != topic_levels[i]:
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+def encode_length(n):
+    out = bytearray()
+    while True:
+        byte = n % 128
+        n //= 128
+        out.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(out)
+
+
+class _Connection:
+    def __init__(self, broker, sock):
+        self.broker = broker
+        self.sock = sock
+        self.subscriptions = []
+        self._send_lock = threading.Lock()
+
+    def send(self, packet_type, flags, body):
+        data = bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+        with self._send_lock:
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                pass
+
+    def _recv_exact(self, n):
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = self.sock.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError
+            buf += chunk
+        return bytes(buf)
+
+    def serve(self):
+        try:
+            while True:
+                first = self._recv_exact(1)[0]
+                length = 0
+                multiplier = 1
+                while True:
+                    byte = self._recv_exact(1)[0]
+                    length += (byte & 0x7f) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = self._recv_exact(length) if length else b''
+                if not self.handle(first >> 4, first & 0x0f, body):
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.broker._remove(self)
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def handle(self, packet_type, flags, body):
+        if packet_type == CONNECT:
+            self.send(CONNACK, 0, b'\x00\x00')
+        elif packet_type == PUBLISH:
+            qos = (flags >> 1) & 3
+            (topic_len,) = struct.unpack_from('!H', body)
+            topic = body[2:2 + topic_len].decode('utf-8')
+            pos = 2 + topic_len
+            if qos:
+                packet_id = body[pos:pos + 2]
+                pos += 2
+                self.send(PUBACK if qos == 1 else PUBREC, 0, packet_id)
+            self.broker.route(topic, body[2:2 + topic_len], body[pos:])
+        elif packet_type == PUBREL:
+            self.send(PUBCOMP, 0, body[:2])
+        elif packet_type == SUBSCRIBE:
+            packet_id = body[:2]
+            pos = 2
+            granted = bytearray()
+            while pos < len(body):
+                (n,) = struct.unpack_from('!H', body, pos)
+                self.subscriptions.append(body[pos + 2:pos + 2 + n].decode('utf-8'))
+                pos += 2 + n + 1
+                granted.append(0)
+            self.send(SUBACK, 0, packet_id + bytes(granted))
+        elif packet_type == UNSUBSCRIBE:
+            packet_id = body[:2]
+            pos = 2
+            while pos < len(body):
+                (n,) = struct.unpack_from('!H', body, pos)
+                pattern = body[pos + 2:pos + 2 + n].decode('utf-8')
+                if pattern in self.subscriptions:
+                    self.subscriptions.remove(pattern)
+                pos += 2 + n
+            self.send(UNSUBACK, 0, packet_id)
+        elif packet_type == PINGREQ:
+            self.send(PINGRESP, 0, b'')
+        elif packet_type == DISCONNECT:
+            return False
+        return True
+
+
+class StubBroker:
+    def __init__(self, host='127.0.0.1', port=0):
+        """Listen on host:port (port 0 = pick a free port, see .port)"""
+        self._sock = socket.create_server((host, port))
+        self.host = host
+        self.port = self._sock.getsockname()[1]
+        self.messages = 0
+        self._connections = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept_loop, name="stub-broker", daemon=True)
+        self._thread.start()
+        return self
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, _ = self._sock.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(self, sock)
+            with self._lock:
+                self._connections.append(connection)
+            threading.Thread(target=connection.serve, daemon=True).start()
+
+    def _remove(self, connection):
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+
+    def route(self, topic, topic_bytes, payload):
+        """Deliver one message to every matching subscriber at QoS 0"""
+        self.messages += 1
+        body = struct.pack('!H', len(topic_bytes)) + topic_bytes + payload
+        with self._lock:
+            targets = [c for c in self._connections
+                       if any(topic_matches(p, topic) for p in c.subscriptions)]
+        for connection in targets:
+            connection.send(PUBLISH, 0, body)
+
+    def stop(self):
+        self._sock.close()
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
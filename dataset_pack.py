@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Dataset Pack
+Packs Edge Impulse JSON recordings (and recorder chunk files / session
+directories) into one columnar store that training and evaluation code can
+memory-map instead of parsing JSON every time:
+
+    PACK_DIR/values.npy   float32, shape (channels, total samples); every
+                          channel is contiguous, recordings are concatenated
+    PACK_DIR/index.json   sensors, and per recording: name, label, offset,
+                          length, interval_ms, source file
+
+A window of a recording is values[:, offset + start:offset + start + size],
+a (channels, size) view in the same layout as spectral_features blocks.
+Chunk files are resampled to their interval_ms grid while packing.
+
+Usage:
+    python3 dataset_pack.py pack dataset/ Normal.json Drop_Voltage.json session_20251211_185218/
+    python3 dataset_pack.py info dataset/
+    python3 dataset_pack.py export dataset/ upload/ --label Normal
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+from recording_writer import load_arrays, read_header, write_edge_impulse
+from sensor_parser import IMU_FIELDS
+from stream_resampler import DEFAULT_INTERVAL_MS, resample
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VALUES_FILE = 'values.npy'
+INDEX_FILE = 'index.json'
+
+# Label dari nama file: Normal_20251211_185218.json / Normal_03.json -> Normal
+_LABEL_SUFFIX = re.compile(r'(_\d{8}_\d{6}|_\d{2,3})$')
+
+
+def label_from_filename(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return _LABEL_SUFFIX.sub('', name)
+
+
+def load_edge_impulse_values(path):
+    """(interval_ms, sensor names, (N, channels) float32 values) of an Edge Impulse JSON file"""
+    with open(path) as f:
+        payload = json.load(f)['payload']
+    sensors = [sensor['name'] for sensor in payload['sensors']]
+    # Recorder lama menulis values sebagai satu list datar
+    values = np.asarray(payload['values'], dtype=np.float32).reshape(-1, len(sensors))
+    return payload.get('interval_ms', DEFAULT_INTERVAL_MS), sensors, values
+
+
+def load_chunk_values(path):
+    """(interval_ms, sensor names, values on the interval grid, label) of a recorder chunk file"""
+    header, timestamps, values = load_arrays(path)
+    interval_ms = header.get('interval_ms', DEFAULT_INTERVAL_MS)
+    if len(timestamps) > 1:
+        values = resample(timestamps, values, interval_ms)[1]
+    return interval_ms, header.get('sensors', list(IMU_FIELDS)), np.asarray(values, dtype=np.float32), header.get('label')
+
+
+def expand_inputs(inputs):
+    """Files and session directories -> list of (path, label or None)"""
+    expanded = []
+    for path in inputs:
+        manifest = os.path.join(path, 'manifest.json')
+        if os.path.isdir(path) and os.path.isfile(manifest):
+            with open(manifest) as f:
+                segments = json.load(f)['segments']
+            expanded.extend((os.path.join(path, seg['file']), seg['label']) for seg in segments)
+        elif os.path.isdir(path):
+            expanded.extend((os.path.join(path, name), None) for name in sorted(os.listdir(path))
+                            if name.endswith('.json') and name != 'manifest.json')
+        else:
+            expanded.append((path, None))
+    return expanded
+
+
+def load_inputs(inputs):
+    """Yield (path, label, interval_ms, sensors, (N, channels) values) for every recording
+
+    Accepts Edge Impulse JSON, chunk files and session directories; the
+    label comes from the session manifest, the chunk header or the file name.
+    """
+    for path, label in expand_inputs(inputs):
+        try:
+            read_header(path)
+            interval_ms, sensors, values, chunk_label = load_chunk_values(path)
+            label = label or chunk_label
+        except (ValueError, UnicodeDecodeError):
+            interval_ms, sensors, values = load_edge_impulse_values(path)
+        yield path, label or label_from_filename(path), interval_ms, sensors, values
+
+
+def pack(inputs, out_dir, label=None):
+    """Pack recordings into out_dir, returns the index dict"""
+    if np is None:
+        raise ValueError("Dataset packs require 'pip install numpy'")
+    sensors = None
+    recordings = []
+    arrays = []
+    offset = 0
+    for path, path_label, interval_ms, rec_sensors, values in load_inputs(inputs):
+        if sensors is None:
+            sensors = list(rec_sensors)
+        elif list(rec_sensors) != sensors:
+            raise ValueError(f"{path}: sensors {rec_sensors} differ from {sensors}")
+        recordings.append({
+            'name': os.path.splitext(os.path.basename(path))[0],
+            'label': label or path_label,
+            'offset': offset,
+            'length': len(values),
+            'interval_ms': interval_ms,
+            'source': path,
+        })
+        arrays.append(values)
+        offset += len(values)
+
+    if not recordings:
+        raise ValueError("No recordings to pack")
+    os.makedirs(out_dir, exist_ok=True)
+    # Channel-major: (channels, total), satu kolom kontigu per sensor
+    np.save(os.path.join(out_dir, VALUES_FILE), np.ascontiguousarray(np.concatenate(arrays).T))
+    index = {'version': 1, 'sensors': sensors, 'samples': offset, 'recordings': recordings}
+    with open(os.path.join(out_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+class DatasetPack:
+    def __init__(self, path):
+        """Memory-map a pack directory (nothing is read until sliced)"""
+        if np is None:
+            raise ValueError("Dataset packs require 'pip install numpy'")
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+        self.sensors = self.index['sensors']
+        self.recordings = self.index['recordings']
+        self.values = np.load(os.path.join(path, VALUES_FILE), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.recordings)
+
+    def labels(self):
+        """Sorted distinct labels"""
+        return sorted({rec['label'] for rec in self.recordings})
+
+    def by_label(self, label):
+        return [rec for rec in self.recordings if rec['label'] == label]
+
+    def recording(self, rec):
+        """(channels, length) view of one recording (index entry or position)"""
+        if isinstance(rec, int):
+            rec = self.recordings[rec]
+        return self.values[:, rec['offset']:rec['offset'] + rec['length']]
+
+    def windows(self, label=None, size=128, stride=64):
+        """Yield (recording entry, (channels, size) view) for every window, optionally for one label"""
+        for rec in self.recordings:
+            if label is not None and rec['label'] != label:
+                continue
+            data = self.recording(rec)
+            for start in range(0, rec['length'] - size + 1, stride):
+                yield rec, data[:, start:start + size]
+
+    def export_edge_impulse(self, rec, out_path):
+        """Write one recording back to Edge Impulse JSON"""
+        data = self.recording(rec).T
+        timestamps = np.arange(len(data)) * rec['interval_ms']
+        return write_edge_impulse(out_path, timestamps, data, rec['interval_ms'], self.sensors, resample_grid=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Pack Edge Impulse recordings into a memory-mappable columnar dataset',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 dataset_pack.py pack dataset/ Normal.json Drop_Voltage.json Normal_20251211_185218.json
+  python3 dataset_pack.py pack dataset/ session_20251211_185218/
+  python3 dataset_pack.py info dataset/
+  python3 dataset_pack.py export dataset/ upload/ --label Drop_Voltage
+        """
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack_cmd = commands.add_parser('pack', help='Create a pack from recordings')
+    pack_cmd.add_argument('output', help='Pack directory')
+    pack_cmd.add_argument('inputs', nargs='+', help='Edge Impulse JSON, chunk files or session directories')
+    pack_cmd.add_argument('--label', help='Use this label for every input (default: from file name / manifest)')
+    info_cmd = commands.add_parser('info', help='Show recordings per label')
+    info_cmd.add_argument('pack', help='Pack directory')
+    export_cmd = commands.add_parser('export', help='Export recordings back to Edge Impulse JSON')
+    export_cmd.add_argument('pack', help='Pack directory')
+    export_cmd.add_argument('output', help='Output directory')
+    export_cmd.add_argument('--label', help='Only recordings with this label')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'pack':
+            index = pack(args.inputs, args.output, args.label)
+            print(f"[✓] Packed {len(index['recordings'])} recordings, {index['samples']} samples -> {args.output}")
+            args.pack = args.output
+        dataset = DatasetPack(args.pack)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[✗] {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'export':
+        os.makedirs(args.output, exist_ok=True)
+        recordings = dataset.by_label(args.label) if args.label else dataset.recordings
+        for rec in recordings:
+            out_path = os.path.join(args.output, f"{rec['name']}.json")
+            count, _ = dataset.export_edge_impulse(rec, out_path)
+            print(f"[✓] {rec['label']}: {count} samples -> {out_path}")
+        return
+
+    print(f"[*] {dataset.path}: {len(dataset)} recordings, {dataset.values.shape[1]} samples, "
+          f"sensors {', '.join(dataset.sensors)}")
+    for label in dataset.labels():
+        recs = dataset.by_label(label)
+        samples = sum(rec['length'] for rec in recs)
+        seconds = sum(rec['length'] * rec['interval_ms'] for rec in recs) / 1000
+        print(f"    - {label}: {len(recs)} recordings, {samples} samples ({seconds:.0f}s)")
+
+
+if __name__ == "__main__":
+    main()
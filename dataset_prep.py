@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Dataset Preparation
+Cuts recorder output into overlapping training windows and optionally
+augments them, all as batched NumPy operations:
+
+    windows     sliding_window_view over each (channels, N) recording, then
+                every stride-th start; a view, nothing is copied until the
+                result is written
+    time shift  window starts jittered by up to +-shift samples, gathered
+                from the same view with one fancy index
+    scaling     per window and channel gain ~ N(1, scale)
+    noise       gaussian noise, std = noise * per-channel std of the window
+
+Inputs are a dataset pack directory (dataset_pack.py, memory-mapped) or
+anything dataset_pack can pack (Edge Impulse JSON, chunk files, session
+directories). The output directory holds windows.npy (float32, shape
+(n, channels, size), same layout as spectral_features blocks), labels.npy
+(int label index per window) and meta.json.
+
+Default size 270 matches the frameLength of dsp_processor.cjs.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from dataset_pack import INDEX_FILE, DatasetPack, load_inputs
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:
+    np = None
+
+
+def sliding_windows(data, size, stride):
+    """(n, channels, size) view of every stride-th window of a (channels, N) array"""
+    if data.shape[1] < size:
+        return np.empty((0, data.shape[0], size), dtype=data.dtype)
+    # (channels, N - size + 1, size) -> ambil tiap stride -> (n, channels, size), tetap view
+    return sliding_window_view(data, size, axis=1)[:, ::stride].transpose(1, 0, 2)
+
+
+def shifted_windows(data, size, stride, shift, rng):
+    """Windows whose starts are jittered by up to +-shift samples (copy)"""
+    view = sliding_window_view(data, size, axis=1)
+    starts = np.arange(0, view.shape[1], stride)
+    starts = np.clip(starts + rng.integers(-shift, shift + 1, len(starts)), 0, view.shape[1] - 1)
+    return view[:, starts].transpose(1, 0, 2)
+
+
+def augment(windows, rng, scale=0.0, noise=0.0):
+    """Scaled + noisy copy of a (n, channels, size) batch"""
+    out = windows.astype(np.float32, copy=True)
+    n, channels, _ = out.shape
+    if scale > 0:
+        out *= rng.normal(1.0, scale, (n, channels, 1)).astype(np.float32)
+    if noise > 0:
+        std = out.std(axis=2, keepdims=True)
+        out += rng.standard_normal(out.shape, dtype=np.float32) * (noise * std)
+    return out
+
+
+def load_recordings(inputs):
+    """[(label, (channels, N) array, interval_ms)] from a pack directory or raw recorder output"""
+    recordings = []
+    for path in inputs:
+        if os.path.isfile(os.path.join(path, INDEX_FILE)):
+            pack = DatasetPack(path)
+            recordings.extend((rec['label'], pack.recording(rec), rec['interval_ms']) for rec in pack.recordings)
+            continue
+        recordings.extend((label, values.T, interval_ms) for _, label, interval_ms, _, values in load_inputs([path]))
+    return recordings
+
+
+def prepare(recordings, size=270, stride=135, copies=0, shift=0, scale=0.0, noise=0.0, seed=None):
+    """Window (and augment) every recording, returns (windows, label indices, label names)"""
+    if np is None:
+        raise ValueError("Dataset preparation requires 'pip install numpy'")
+    if size < 1 or stride < 1:
+        raise ValueError(f"Invalid window size {size} / stride {stride}")
+    rng = np.random.default_rng(seed)
+    names = sorted({label for label, _, _ in recordings})
+    batches = []
+    labels = []
+    for label, data, _ in recordings:
+        if data.shape[1] < size:
+            continue
+        base = sliding_windows(data, size, stride)
+        batches.append(base)
+        for _ in range(copies):
+            source = shifted_windows(data, size, stride, shift, rng) if shift else base
+            batches.append(augment(source, rng, scale, noise))
+        labels.append(np.full(len(base) * (copies + 1), names.index(label), dtype=np.int16))
+    if not batches:
+        raise ValueError(f"No recording is longer than the window size ({size})")
+    # Satu copy: gabungkan view dan hasil augmentasi ke satu array float32
+    return np.concatenate(batches).astype(np.float32, copy=False), np.concatenate(labels), names
+
+
+def write_windows(out_dir, windows, labels, names, meta):
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 'windows.npy'), windows)
+    np.save(os.path.join(out_dir, 'labels.npy'), labels)
+    meta = dict(meta, labels=names, count=len(windows), shape=list(windows.shape[1:]),
+                per_label={name: int((labels == i).sum()) for i, name in enumerate(names)})
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Cut recordings into (augmented) training windows',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 dataset_prep.py windows/ Normal.json Drop_Voltage.json
+  python3 dataset_prep.py windows/ dataset/ --size 128 --stride 32
+  python3 dataset_prep.py windows/ dataset/ --copies 4 --shift 20 --scale 0.05 --noise 0.02 --seed 1
+        """
+    )
+    parser.add_argument('output', help='Output directory (windows.npy, labels.npy, meta.json)')
+    parser.add_argument('inputs', nargs='+', help='Dataset pack, Edge Impulse JSON, chunk files or session directories')
+    parser.add_argument('--size', type=int, default=270, help='Window size in samples (default: 270, dsp_processor frame)')
+    parser.add_argument('--stride', type=int, default=135, help='Samples between window starts (default: 135)')
+    parser.add_argument('--copies', type=int, default=0, help='Augmented copies per window (default: 0)')
+    parser.add_argument('--shift', type=int, default=0, help='Max time shift of augmented windows in samples')
+    parser.add_argument('--scale', type=float, default=0.0, help='Std of the per-channel gain of augmented windows')
+    parser.add_argument('--noise', type=float, default=0.0, help='Noise std relative to each channel std')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible augmentation')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        recordings = load_recordings(args.inputs)
+        windows, labels, names = prepare(recordings, args.size, args.stride, args.copies,
+                                         args.shift, args.scale, args.noise, args.seed)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[✗] {e}", file=sys.stderr)
+        sys.exit(1)
+    interval_ms = sorted({interval for _, _, interval in recordings})
+    meta = write_windows(args.output, windows, labels, names, {
+        'size': args.size, 'stride': args.stride, 'interval_ms': interval_ms,
+        'augmentation': {'copies': args.copies, 'shift': args.shift, 'scale': args.scale,
+                         'noise': args.noise, 'seed': args.seed},
+    })
+    print(f"[✓] {meta['count']} windows {tuple(meta['shape'])} from {len(recordings)} recordings "
+          f"in {time.perf_counter() - started:.2f}s -> {args.output}")
+    for name, count in meta['per_label'].items():
+        print(f"    - {name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,47 +11,156 @@ import time
 import sys
 import argparse
 import glob
+import os
+import queue
+import threading
 from datetime import datetime
 from pathlib import Path
 
+from anomaly_classifier import WindowClassifier, load_model
+from mqtt_publisher import PipelinedPublisher
+from payload_codec import get_encoders
+from pipeline_metrics import MetricsServer, PipelineMetrics
+from publish_plan import DeadbandFilter, build_publish_plan, parse_deadband
+from sample_batch import SampleBatch
+from sensor_parser import SensorLineParser, format_rejected, to_document
+from serial_framer import LineFramer
+from spectral_features import FeatureExtractor
+from serial_replay import PtyReplay, ReplaySerial, load_recording
+from store_forward import SpoolingPublisher, StoreForwardQueue
+from stream_resampler import StreamResampler, format_stats
+
 # Unbuffered output
 sys.stdout = open(sys.stdout.fileno(), mode='w', buffering=1)
 sys.stderr = open(sys.stderr.fileno(), mode='w', buffering=1)
 
+def find_serial_ports():
+    """Auto-detect all ESP32 serial ports"""
+    return sorted(glob.glob('/dev/ttyUSB*')) + sorted(glob.glob('/dev/ttyACM*')) + sorted(glob.glob('COM*'))
+
 def find_serial_port():
     """Auto-detect ESP32 serial port"""
-    ports = glob.glob('/dev/ttyUSB*') + glob.glob('/dev/ttyACM*') + glob.glob('COM*')
+    ports = find_serial_ports()
     if ports:
         return ports[0]
     return None
 
+def device_name(port):
+    """Topic-safe device name from a serial port path (e.g. /dev/ttyUSB0 -> ttyUSB0)"""
+    return os.path.basename(port).replace('/', '_') or port
+
 class ESP32MQTTReader:
     def __init__(self, serial_port, baudrate=115200, mqtt_broker="broker.hivemq.com", 
-                 mqtt_port=1883, mqtt_topic_prefix="iiot/sensors"):
-        """Initialize the ESP32 MQTT Reader"""
+                 mqtt_port=1883, mqtt_topic_prefix="iiot/sensors", queue_size=256,
+                 exclude_topics=(), batch_capacity=0, encoding="json",
+                 spool_path=None, spool_max_bytes=64 * 1024 * 1024, drain_rate=100.0,
+                 deadbands=(), heartbeat=60.0, metrics_port=None, metrics_host="127.0.0.1",
+                 replay=None, publish_interval=1.0, max_inflight=20, max_queued=1000,
+                 backpressure=None, features_window=0, features_hop=0,
+                 classifier_model=None, classifier_hop=0, resample_ms=0):
+        """Initialize the ESP32 MQTT Reader
+
+        replay: serial_replay.ReplaySerial (used instead of the serial port) or
+                PtyReplay (serial_port should be its .port); the reader stops
+                once the recording has been played and processed
+        """
         self.serial_port = serial_port
+        self.device_id = device_name(serial_port) if serial_port else None
         self.baudrate = baudrate
         self.mqtt_broker = mqtt_broker
         self.mqtt_port = mqtt_port
         self.mqtt_topic_prefix = mqtt_topic_prefix
+        self.encoding = encoding
+        self.publish_plan = build_publish_plan(mqtt_topic_prefix, exclude_topics,
+                                               document_encoding=encoding)
+        
+        # Report-by-exception untuk topic retained per-axis
+        self.deadband = DeadbandFilter(self.publish_plan, mqtt_topic_prefix, deadbands, heartbeat)
+        if not self.deadband.active:
+            self.deadband = None
+        
+        # Batch mode: semua sample dalam satu interval dikirim ke .../batch
+        self.batch = SampleBatch(batch_capacity) if batch_capacity > 0 else None
+        self.batch_topic = f"{mqtt_topic_prefix}/batch"
+        self.encode_batch = get_encoders(encoding)[1]
+        
+        # Grid waktu seragam dari timestamp device (opsional)
+        self.resampler = StreamResampler(resample_ms) if resample_ms else None
+        
+        # Spectral features per sliding window di .../features
+        self.features = None
+        if features_window > 0:
+            self.features = FeatureExtractor(features_window, features_hop or features_window // 2)
+        self.features_topic = f"{mqtt_topic_prefix}/features"
+        # Vektor fitur bukan dokumen sample, binary frame tidak berlaku -> JSON
+        self.encode_features = json.dumps if encoding == 'binary' else self.encode_batch
+        
+        # Klasifikasi in-process (model .npz / .onnx) di .../classification
+        self.classifier_model = classifier_model
+        self.classifier = None
+        if classifier_model:
+            self.classifier = WindowClassifier(load_model(classifier_model), classifier_hop)
+        self.classification_topic = f"{mqtt_topic_prefix}/classification"
         
         self.ser = None
+        self.replay = replay
         self.mqtt_client = None
+        self.mqtt_client_id = "esp32-reader"
         self.is_connected = False
+        self.device_label = ""  # Prefix output di gateway mode
+        
+        # Store-and-forward spool (opsional)
+        self.spool_path = spool_path
+        self.spool_max_bytes = spool_max_bytes
+        self.drain_rate = drain_rate
+        self.spooler = None
+        
+        # Publish window (dipakai jika spool tidak aktif)
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        # Default drop_oldest: broker mati tidak boleh menahan thread serial.
+        # Replay tanpa throttle tetap block (lossless, untuk load test)
+        if backpressure is None:
+            backpressure = 'block' if replay is not None and not replay.speed else 'drop_oldest'
+        self.backpressure = backpressure
+        self.publisher = None
         self.last_publish_time = 0
-        self.publish_interval = 1.0  # Publish setiap 1 detik
-        self.latest_data = {}  # Buffer untuk data terbaru
-        self.data_buffer = []  # Buffer untuk data yang dibaca
+        self.publish_interval = publish_interval  # Default publish setiap 1 detik
+        self.latest_data = {}  # Dokumen terakhir yang dipublish
+        self.latest_values = None  # Sample terbaru (tuple sensor_parser.FIELDS)
+        self.parser = SensorLineParser()
+        self.publish_errors = 0
         self.last_print_time = 0  # Untuk throttling print
-        self.data_count = 0  # Counter untuk data yang masuk
+        
+        # Metrics (counter int biasa, dibaca saat /metrics di-scrape)
+        self.bytes_read = 0
+        self.messages_published = 0
+        self.metrics = PipelineMetrics()
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.metrics_server = None
+        
+        # Serial reader thread -> parse/publish stage
+        self.frame_queue = queue.Queue(maxsize=queue_size)
+        self.flush_timeout = 0.1  # Flush partial line setelah 100ms tanpa data
+        self.dropped_frames = 0
+        self.framer = LineFramer()
+        self.reader_thread = None
+        self.pipeline_thread = None
+        self._stop_event = threading.Event()
         
     def setup_serial(self):
         """Setup serial connection"""
+        if isinstance(self.replay, ReplaySerial):
+            self.ser = self.replay
+            print(f"[✓] Replaying {len(self.replay.records)} recorded lines "
+                  f"(speed {self.replay.speed:g}x{', loop' if self.replay.loop else ''})")
+            return True
         try:
             self.ser = serial.Serial(
                 port=self.serial_port,
                 baudrate=self.baudrate,
-                timeout=1,
+                timeout=self.flush_timeout,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 bytesize=serial.EIGHTBITS
@@ -64,12 +173,24 @@ class ESP32MQTTReader:
     
     def setup_mqtt(self):
         """Setup MQTT client"""
-        self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id="esp32-reader")
+        self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=self.mqtt_client_id)
         
         self.mqtt_client.on_connect = self.on_mqtt_connect
         self.mqtt_client.on_disconnect = self.on_mqtt_disconnect
         self.mqtt_client.on_publish = self.on_mqtt_publish
         
+        if self.spool_path:
+            spool = StoreForwardQueue(self.spool_path, self.spool_max_bytes)
+            # Batasi antrian memory paho, sisanya masuk spool di disk
+            self.mqtt_client.max_queued_messages_set(1000)
+            self.spooler = SpoolingPublisher(self.mqtt_client, spool, drain_rate=self.drain_rate)
+            self.spooler.start()
+            if len(spool):
+                print(f"[*] Spool {self.spool_path}: {len(spool)} messages pending from previous run")
+        else:
+            self.publisher = PipelinedPublisher(self.mqtt_client, self.max_inflight, self.max_queued,
+                                                self.backpressure, metrics=self.metrics)
+        
         try:
             # Set reconnect parameters
             self.mqtt_client.reconnect_delay_set(min_delay=1, max_delay=32)
@@ -86,6 +207,8 @@ class ESP32MQTTReader:
         if rc == 0:
             print("[✓] MQTT connection successful")
             self.is_connected = True
+            if self.spooler:
+                self.spooler.on_connect()
         else:
             print(f"[✗] MQTT connection failed with code {rc}", file=sys.stderr)
             self.is_connected = False
@@ -95,94 +218,70 @@ class ESP32MQTTReader:
         if rc != 0:
             pass  # Silent - will auto-reconnect
         self.is_connected = False
+        if self.spooler:
+            self.spooler.on_disconnect()
     
     def on_mqtt_publish(self, client, userdata, mid):
         """MQTT publish callback"""
-        pass  # Silent publish confirmation
+        self.metrics.on_puback(mid)  # Silent publish confirmation
+        if self.publisher:
+            self.publisher.on_publish(mid)
     
     def parse_and_publish(self, data_str):
-        """Parse JSON data and publish to MQTT"""
+        """Parse one serial line and publish to MQTT"""
+        values = self.parser.parse(data_str)
+        if values is None:
+            return  # Dihitung di self.parser.rejected
+        
+        if self.resampler is None:
+            self.handle_sample(values)
+            return
+        for sample in self.resampler.push(values):
+            self.handle_sample(sample)
+    
+    def handle_sample(self, values):
+        """Batch, feature/classifier and publish stages for one sample tuple"""
+        # Store latest sample
+        self.latest_values = values
+        
         try:
-            # Clean up data
-            data_str = data_str.strip()
-            
-            # Skip if doesn't look like JSON
-            if not data_str.startswith('{'):
-                return
-            
-            # Try to find valid JSON by removing corrupted start
-            if not data_str.startswith('{"timestamp'):
-                start_idx = data_str.find('{"timestamp')
-                if start_idx != -1:
-                    data_str = data_str[start_idx:]
-                else:
-                    return
+            if self.batch is not None and self.batch.append(values):
+                # Buffer penuh sebelum interval habis, kirim lebih awal
+                self.publish_batch()
             
-            data = json.loads(data_str)
+            if self.features is not None:
+                features = self.features.push(values)
+                if features is not None:
+                    self.publish(self.features_topic, self.encode_features(features), qos=1, retain=False)
             
-            # Validate that we have required fields
-            if "adxl345" not in data or "mpu6050" not in data or "bmp280" not in data:
-                return
-            
-            # Add reception timestamp if not present
-            if "reception_time" not in data:
-                data["reception_time"] = datetime.now().isoformat()
-            
-            # Store latest data
-            self.latest_data = data
+            if self.classifier is not None:
+                result = self.classifier.push(values)
+                if result is not None:
+                    self.metrics.inference_latency.observe(result["inference_ms"] / 1000.0)
+                    self.publish(self.classification_topic, json.dumps(result), qos=1, retain=False)
+                    print(f"[✓] {self.device_label}Class: {result['label']} ({result['confidence']:.1%}) "
+                          f"in {result['inference_ms']:.2f} ms")
             
             # Check if 1 second has passed since last publish
             current_time = time.time()
             if current_time - self.last_publish_time >= self.publish_interval:
-                # Publish main data
-                main_topic = f"{self.mqtt_topic_prefix}/all"
-                self.mqtt_client.publish(main_topic, json.dumps(data), qos=1, retain=False)
-                
-                # Publish individual sensor data
-                if "adxl345" in data:
-                    adxl_topic = f"{self.mqtt_topic_prefix}/adxl345"
-                    self.mqtt_client.publish(adxl_topic, json.dumps(data["adxl345"]), qos=1, retain=False)
-                    
-                    # Publish individual axes
-                    for axis in ["ax", "ay", "az"]:
-                        if axis in data["adxl345"]:
-                            axis_topic = f"{self.mqtt_topic_prefix}/adxl345/{axis}"
-                            self.mqtt_client.publish(axis_topic, str(data["adxl345"][axis]), qos=1, retain=True)
+                data = to_document(values, datetime.now().isoformat())
+                self.latest_data = data
                 
-                if "mpu6050" in data:
-                    mpu_topic = f"{self.mqtt_topic_prefix}/mpu6050"
-                    self.mqtt_client.publish(mpu_topic, json.dumps(data["mpu6050"]), qos=1, retain=False)
-                    
-                    # Publish accel data
-                    if "accel" in data["mpu6050"]:
-                        accel_data = data["mpu6050"]["accel"]
-                        for axis in ["x", "y", "z"]:
-                            if axis in accel_data:
-                                topic = f"{self.mqtt_topic_prefix}/mpu6050/accel/{axis}"
-                                self.mqtt_client.publish(topic, str(accel_data[axis]), qos=1, retain=True)
-                    
-                    # Publish gyro data
-                    if "gyro" in data["mpu6050"]:
-                        gyro_data = data["mpu6050"]["gyro"]
-                        for axis in ["x", "y", "z"]:
-                            if axis in gyro_data:
-                                topic = f"{self.mqtt_topic_prefix}/mpu6050/gyro/{axis}"
-                                self.mqtt_client.publish(topic, str(gyro_data[axis]), qos=1, retain=True)
-                    
-                    # Publish temperature
-                    if "temp" in data["mpu6050"]:
-                        temp_topic = f"{self.mqtt_topic_prefix}/mpu6050/temp"
-                        self.mqtt_client.publish(temp_topic, str(data["mpu6050"]["temp"]), qos=1, retain=True)
+                # Publish semua topic dari plan (satu pass)
+                publish = self.publish
+                deadband = self.deadband
+                memo = {}
+                for index, (topic, extractor, qos, retain) in enumerate(self.publish_plan):
+                    payload = extractor(data, memo)
+                    if payload is None:
+                        continue
+                    if deadband is not None and not deadband.check(index, payload, current_time):
+                        continue
+                    publish(topic, payload, qos=qos, retain=retain)
                 
-                if "bmp280" in data:
-                    bmp_topic = f"{self.mqtt_topic_prefix}/bmp280"
-                    self.mqtt_client.publish(bmp_topic, json.dumps(data["bmp280"]), qos=1, retain=False)
-                    
-                    # Publish individual parameters
-                    for param in ["temp", "pressure", "altitude"]:
-                        if param in data["bmp280"]:
-                            param_topic = f"{self.mqtt_topic_prefix}/bmp280/{param}"
-                            self.mqtt_client.publish(param_topic, str(data["bmp280"][param]), qos=1, retain=True)
+                if self.batch is not None:
+                    self.publish_batch()
                 
                 # Update last publish time
                 self.last_publish_time = current_time
@@ -194,7 +293,7 @@ class ESP32MQTTReader:
                     bmp = data.get('bmp280', {})
                     ts = data.get('timestamp', 0)
                     
-                    print(f"[✓] TS:{ts} | "
+                    print(f"[✓] {self.device_label}TS:{ts} | "
                           f"ADXL345(ax:{adxl.get('ax', 0):.2f},ay:{adxl.get('ay', 0):.2f},az:{adxl.get('az', 0):.2f}) | "
                           f"MPU6050(ax:{mpu.get('accel', {}).get('x', 0):.2f},ay:{mpu.get('accel', {}).get('y', 0):.2f},az:{mpu.get('accel', {}).get('z', 0):.2f},"
                           f"gx:{mpu.get('gyro', {}).get('x', 0):.4f},gy:{mpu.get('gyro', {}).get('y', 0):.4f},gz:{mpu.get('gyro', {}).get('z', 0):.4f},"
@@ -202,11 +301,49 @@ class ESP32MQTTReader:
                           f"BMP280(t:{bmp.get('temp', 0):.2f},p:{bmp.get('pressure', 0):.2f},alt:{bmp.get('altitude', 0):.2f})")
                     
                     self.last_print_time = current_time
-            
-        except json.JSONDecodeError:
-            pass  # Silent - skip invalid JSON
-        except Exception:
-            pass  # Silent - skip errors
+        
+        except Exception as e:
+            self.publish_errors += 1
+            if self.publish_errors == 1 or self.publish_errors % 100 == 0:
+                print(f"[!] Publish error ({self.publish_errors} total): {e}", file=sys.stderr)
+    
+    def publish(self, topic, payload, qos=1, retain=False):
+        """Publish via the store-and-forward spool if enabled"""
+        self.messages_published += 1
+        if self.publisher:
+            return self.publisher.publish(topic, payload, qos=qos, retain=retain)  # Publisher mencatat metrics
+        sent = self.metrics.before_publish()
+        info = None
+        try:
+            if self.spooler:
+                info = self.spooler.publish(topic, payload, qos=qos, retain=retain)
+            else:
+                info = self.mqtt_client.publish(topic, payload, qos=qos, retain=retain)
+        finally:
+            self.metrics.after_publish(info, sent, qos)
+        return info
+    
+    def metric_sources(self):
+        """(device, reader) pairs rendered on the metrics endpoint"""
+        return [(self.device_id, self)]
+    
+    def render_metrics(self):
+        return self.metrics.render(self.metric_sources(), self.mqtt_client, self.spooler, self.publisher)
+    
+    def start_metrics(self):
+        """Start the local Prometheus endpoint if a port was given"""
+        if self.metrics_port:
+            self.metrics_server = MetricsServer(self.render_metrics, self.metrics_host, self.metrics_port)
+            self.metrics_server.start()
+    
+    def publish_batch(self):
+        """Publish all buffered samples as one message and reset the batch"""
+        if not self.batch.count:
+            return
+        payload = self.batch.to_payload()
+        payload["reception_time"] = datetime.now().isoformat()
+        self.publish(self.batch_topic, self.encode_batch(payload), qos=1, retain=False)
+        self.batch.clear()
     
     def run(self):
         """Main loop to read serial and publish to MQTT"""
@@ -216,6 +353,24 @@ class ESP32MQTTReader:
         print(f"    - Baudrate: {self.baudrate}")
         print(f"    - MQTT Broker: {self.mqtt_broker}:{self.mqtt_port}")
         print(f"    - MQTT Topic Prefix: {self.mqtt_topic_prefix}")
+        print(f"    - Payload Encoding: {self.encoding}")
+        if self.metrics_port:
+            print(f"    - Metrics: http://{self.metrics_host}:{self.metrics_port}/metrics")
+        if self.spool_path:
+            print(f"    - Spool: {self.spool_path} ({self.spool_max_bytes // (1024 * 1024)} MB, drain {self.drain_rate:g} msg/s)")
+        if self.deadband is not None:
+            print(f"    - Deadband: heartbeat {self.deadband.heartbeat:g}s")
+        if self.batch is not None:
+            print(f"    - Batch Topic: {self.batch_topic} (capacity {self.batch.capacity})")
+        if self.features is not None:
+            print(f"    - Features Topic: {self.features_topic} (window {self.features.window.length}, hop {self.features.hop})")
+        if self.classifier is not None:
+            model = self.classifier.model
+            print(f"    - Classifier: {self.classifier_model} ({', '.join(model.labels or [])}; "
+                  f"{model.input_kind} input, window {model.window}) -> {self.classification_topic}")
+        if self.resampler is not None:
+            print(f"    - Resample: {self.resampler.interval_ms:g} ms grid from device timestamps "
+                  f"(gap > {self.resampler.max_gap_ms:g} ms)")
         print(f"\n[*] Press Ctrl+C to stop\n")
         
         if not self.setup_serial():
@@ -223,6 +378,7 @@ class ESP32MQTTReader:
         
         if not self.setup_mqtt():
             return False
+        self.start_metrics()
         
         # Wait for MQTT connection
         timeout = time.time() + 5
@@ -232,32 +388,10 @@ class ESP32MQTTReader:
         if not self.is_connected:
             print("[!] Warning: MQTT connection not established yet, but continuing...", file=sys.stderr)
         
-        buffer = ""
-        last_read_time = time.time()
+        self.start_reader()
+        
         try:
-            while True:
-                if self.ser and self.ser.in_waiting:
-                    try:
-                        chunk = self.ser.read(self.ser.in_waiting).decode('utf-8', errors='ignore')
-                        buffer += chunk
-                        last_read_time = time.time()
-                        
-                        while '\n' in buffer:
-                            line, buffer = buffer.split('\n', 1)
-                            if line.strip():
-                                self.parse_and_publish(line)
-                    except Exception as e:
-                        print(f"[!] Error reading serial: {e}", file=sys.stderr)
-                        buffer = ""
-                        continue
-                else:
-                    # If buffer has data but no more input for 100ms, process incomplete line
-                    if buffer and (time.time() - last_read_time) > 0.1:
-                        if buffer.strip():
-                            self.parse_and_publish(buffer)
-                        buffer = ""
-                
-                time.sleep(0.01)
+            self.process_frames()
         
         except KeyboardInterrupt:
             print("\n[*] Shutting down...")
@@ -265,18 +399,284 @@ class ESP32MQTTReader:
         finally:
             self.cleanup()
     
+    def start_reader(self):
+        """Start the serial reader thread"""
+        if isinstance(self.replay, PtyReplay):
+            self.replay.start()
+        self.reader_thread = threading.Thread(target=self._serial_reader_loop,
+                                              name=f"serial-reader-{device_name(self.serial_port)}",
+                                              daemon=True)
+        self.reader_thread.start()
+    
+    def start_pipeline(self):
+        """Run process_frames() in its own thread (gateway mode)"""
+        self.pipeline_thread = threading.Thread(target=self.process_frames,
+                                                name=f"pipeline-{device_name(self.serial_port)}",
+                                                daemon=True)
+        self.pipeline_thread.start()
+    
+    def process_frames(self):
+        """Parse/publish stage: consume frames until stop() is called"""
+        while not self._stop_event.is_set():
+            try:
+                line = self.frame_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if line is None:
+                self._stop_event.set()  # Replay selesai dan semua frame sudah diproses
+                break
+            self.parse_and_publish(line)
+    
+    def stop(self):
+        """Stop the reader thread and the main loop"""
+        self._stop_event.set()
+    
+    def _enqueue_frame(self, line):
+        """Hand a complete frame to the parse/publish stage (drop oldest if full)"""
+        if self.replay is not None and not self.replay.speed:
+            # Unthrottled replay: backpressure instead of loss, to measure max throughput
+            while not self._stop_event.is_set():
+                try:
+                    self.frame_queue.put(line, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+            return
+        try:
+            self.frame_queue.put_nowait(line)
+        except queue.Full:
+            try:
+                self.frame_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped_frames += 1
+            self.frame_queue.put_nowait(line)
+    
+    def _serial_reader_loop(self):
+        """Reader thread: block on the serial port and frame complete lines"""
+        framer = self.framer
+        while not self._stop_event.is_set():
+            try:
+                # Blocks in select() until bytes arrive or flush_timeout expires
+                chunk = self.ser.read(max(1, self.ser.in_waiting))
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                print(f"[!] Error reading serial {self.serial_port}: {e}", file=sys.stderr)
+                framer.reset()
+                if not self._reopen_serial():
+                    break
+                continue
+            
+            if not chunk:
+                # No input for flush_timeout, process incomplete line
+                line = framer.flush()
+                if line and line.strip():
+                    self._enqueue_frame(line)
+                if self.replay is not None and self.replay.done.is_set():
+                    self._enqueue_frame(None)  # End of recording
+                    break
+                continue
+            
+            self.bytes_read += len(chunk)
+            for line in framer.feed(chunk):
+                if line.strip():
+                    self._enqueue_frame(line)
+    
+    def _reopen_serial(self):
+        """Close the port and retry opening it until it is back or stop() is called"""
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+        while not self._stop_event.wait(1.0):
+            try:
+                self.ser.open()
+            except (serial.SerialException, OSError):
+                continue
+            print(f"[✓] Serial port {self.serial_port} reopened")
+            return True
+        return False
+    
     def cleanup(self):
         """Cleanup resources"""
+        self.close_serial()
+        self.close_mqtt()
+    
+    def close_serial(self):
+        """Stop the reader/pipeline threads, flush pending samples and close the port"""
+        self._stop_event.set()
+        for thread in (self.reader_thread, self.pipeline_thread):
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=2 * self.flush_timeout + 1)
+        
+        print(f"[*] {self.device_label}Lines accepted: {self.parser.accepted}, "
+              f"rejected: {format_rejected(self.parser.rejected)}")
+        if self.resampler is not None and self.resampler.samples:
+            print(f"[*] {self.device_label}Timing: {format_stats(self.resampler.stats())}; "
+                  f"{self.resampler.samples} samples -> {self.resampler.emitted} on grid")
+        if self.classifier is not None and self.classifier.inferences:
+            print(f"[*] {self.device_label}Classifier: {self.classifier.inferences} inferences, "
+                  f"avg {self.classifier.total_ms / self.classifier.inferences:.2f} ms, max {self.classifier.max_ms:.2f} ms")
+        if self.deadband is not None:
+            print(f"[*] {self.device_label}Deadband: {self.deadband.suppressed} updates suppressed "
+                  f"({self.deadband.suppression_ratio():.1%} of filtered topics)")
+        
+        if self.mqtt_client and self.batch is not None:
+            self.publish_batch()  # Jangan buang sisa sample
+        
         if self.ser and self.ser.is_open:
             self.ser.close()
-            print("[✓] Serial connection closed")
+            print(f"[✓] {self.device_label}Serial connection closed")
         
+        if self.replay is not None:
+            if isinstance(self.replay, PtyReplay):
+                self.replay.close()
+            print(f"[*] Replay: {self.replay.lines_sent} lines / {self.replay.bytes_sent} bytes sent, "
+                  f"{self.messages_published} messages published, {self.dropped_frames} frames dropped")
+    
+    def close_mqtt(self):
+        """Stop the spool and disconnect from the broker"""
+        if self.metrics_server:
+            self.metrics_server.stop()
         if self.mqtt_client:
+            if self.publisher:
+                if not self.publisher.flush(timeout=5.0):
+                    print(f"[!] {self.publisher.queued + self.publisher.outstanding} messages not confirmed before shutdown",
+                          file=sys.stderr)
+                self.publisher.stop()
+                if self.publisher.dropped:
+                    print(f"[*] Backpressure ({self.backpressure}): {self.publisher.dropped} messages dropped, "
+                          f"{self.publisher.coalesced} coalesced")
+            if self.spooler:
+                self.spooler.stop()
+                pending = len(self.spooler.spool)
+                self.spooler.spool.close()
+                print(f"[✓] Spool closed ({pending} messages pending)")
             self.mqtt_client.loop_stop()
             self.mqtt_client.disconnect()
             print("[✓] MQTT connection closed")
 
 
+class ESP32Gateway(ESP32MQTTReader):
+    def __init__(self, serial_ports=None, rescan_interval=5.0, **reader_kwargs):
+        """Serve several ESP32 boards from one process over one MQTT connection
+
+        serial_ports:    list of 'PORT' or 'PORT=NAME'; None to auto-detect and
+                         follow hot-plug by rescanning
+        rescan_interval: seconds between port rescans
+        Each device publishes under <topic-prefix>/<NAME> (NAME defaults to the
+        port basename, e.g. iiot/sensors/ttyUSB0/all).
+        """
+        super().__init__(serial_port=None, **reader_kwargs)
+        self.mqtt_client_id = "esp32-gateway"
+        self.rescan_interval = rescan_interval
+        self.reader_kwargs = {k: v for k, v in reader_kwargs.items()
+                              if k not in ('mqtt_topic_prefix', 'spool_path', 'metrics_port', 'metrics_host')}
+        self.explicit_ports = None
+        if serial_ports:
+            self.explicit_ports = {}
+            for spec in serial_ports:
+                port, _, name = spec.partition('=')
+                self.explicit_ports[port] = name or device_name(port)
+        self.devices = {}  # port -> ESP32MQTTReader
+    
+    def add_device(self, port, name):
+        """Open one port and start its reader/pipeline threads on the shared client"""
+        device = ESP32MQTTReader(port, mqtt_topic_prefix=f"{self.mqtt_topic_prefix}/{name}",
+                                 **self.reader_kwargs)
+        device.device_label = f"[{name}] "
+        device.mqtt_client = self.mqtt_client
+        device.spooler = self.spooler
+        device.publisher = self.publisher
+        device.metrics = self.metrics  # PUBACK datang lewat callback gateway
+        device.device_id = name
+        if not device.setup_serial():
+            return None  # Dicoba lagi pada rescan berikutnya
+        device.start_reader()
+        device.start_pipeline()
+        self.devices[port] = device
+        print(f"[+] Device {name} on {port} -> {self.mqtt_topic_prefix}/{name}")
+        return device
+    
+    def remove_device(self, port):
+        """Stop one device, flushing its pending batch"""
+        device = self.devices.pop(port, None)
+        if device is not None:
+            device.close_serial()
+            print(f"[-] Device on {port} removed")
+    
+    def metric_sources(self):
+        return [(device.device_id, device) for device in list(self.devices.values())]
+    
+    def rescan(self):
+        """Add newly attached ports and drop devices whose port disappeared"""
+        if self.explicit_ports is not None:
+            candidates = self.explicit_ports
+        else:
+            candidates = {port: device_name(port) for port in find_serial_ports()}
+        
+        for port in list(self.devices):
+            if port.startswith('/dev/') and not os.path.exists(port):
+                self.remove_device(port)
+        
+        for port, name in candidates.items():
+            if port in self.devices:
+                continue
+            if port.startswith('/dev/') and not os.path.exists(port):
+                continue  # Belum dicolok
+            self.add_device(port, name)
+    
+    def run(self):
+        """Serve all devices until interrupted"""
+        print("\n[*] Starting ESP32 Serial to MQTT Gateway")
+        print(f"[*] Configuration:")
+        if self.explicit_ports is not None:
+            print(f"    - Serial Ports: {', '.join(f'{p}={n}' for p, n in self.explicit_ports.items())}")
+        else:
+            print(f"    - Serial Ports: auto-detect (rescan every {self.rescan_interval:g}s)")
+        print(f"    - Baudrate: {self.baudrate}")
+        print(f"    - MQTT Broker: {self.mqtt_broker}:{self.mqtt_port}")
+        print(f"    - MQTT Topic Prefix: {self.mqtt_topic_prefix}/<device>")
+        print(f"    - Payload Encoding: {self.encoding}")
+        if self.metrics_port:
+            print(f"    - Metrics: http://{self.metrics_host}:{self.metrics_port}/metrics")
+        if self.spool_path:
+            print(f"    - Spool: {self.spool_path} ({self.spool_max_bytes // (1024 * 1024)} MB, drain {self.drain_rate:g} msg/s)")
+        print(f"\n[*] Press Ctrl+C to stop\n")
+        
+        if not self.setup_mqtt():
+            return False
+        self.start_metrics()
+        
+        # Wait for MQTT connection
+        timeout = time.time() + 5
+        while not self.is_connected and time.time() < timeout:
+            time.sleep(0.1)
+        
+        if not self.is_connected:
+            print("[!] Warning: MQTT connection not established yet, but continuing...", file=sys.stderr)
+        
+        try:
+            while True:
+                self.rescan()
+                if self._stop_event.wait(self.rescan_interval):
+                    break
+        
+        except KeyboardInterrupt:
+            print("\n[*] Shutting down...")
+        
+        finally:
+            self.cleanup()
+    
+    def cleanup(self):
+        """Stop every device, then close the shared MQTT connection"""
+        self._stop_event.set()
+        for port in list(self.devices):
+            self.remove_device(port)
+        self.close_mqtt()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='ESP32 Serial to HiveMQ MQTT Reader',
@@ -287,20 +687,99 @@ Examples:
   python3 esp32_mqtt_reader.py /dev/ttyUSB0
   python3 esp32_mqtt_reader.py /dev/ttyUSB0 --broker test.mosquitto.org
   python3 esp32_mqtt_reader.py COM3 --broker broker.hivemq.com --topic-prefix home/sensors
+  python3 esp32_mqtt_reader.py --gateway                          (all ports, hot-plug)
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0=line1 /dev/ttyUSB1=line2
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --batch
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --batch --encoding binary
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --features --features-window 256 --exclude-topic "*"
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --classify models/vibration_dense.npz
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --resample-ms 100 --features
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --deadband "adxl345/*=0.05" --deadband "bmp280/*=0.5%"
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --spool /var/lib/iiot/spool.db --spool-size 256
+  python3 esp32_mqtt_reader.py --replay Normal.json --replay-speed 10 --broker localhost
+  python3 esp32_mqtt_reader.py --replay capture.log --replay-speed 0 --replay-pty
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --metrics-port 9108
+  python3 esp32_mqtt_reader.py /dev/ttyUSB0 --exclude-topic "mpu6050/*/*" --exclude-topic "bmp280/*"
         '''
     )
     
-    parser.add_argument('serial_port', nargs='?', default=None, help='Serial port (e.g., /dev/ttyUSB0 or COM3). Auto-detect if not specified.')
+    parser.add_argument('serial_ports', nargs='*', metavar='serial_port',
+                        help='Serial port (e.g., /dev/ttyUSB0 or COM3). Auto-detect if not specified. '
+                             'Several ports (PORT or PORT=NAME) run in gateway mode.')
+    parser.add_argument('--gateway', action='store_true',
+                        help='Serve every detected port from one process, topics under <topic-prefix>/<device>')
+    parser.add_argument('--rescan-interval', type=float, default=5.0,
+                        help='Gateway mode: seconds between hot-plug rescans (default: 5)')
     parser.add_argument('-b', '--baudrate', type=int, default=115200, help='Serial baudrate (default: 115200)')
     parser.add_argument('--broker', default='broker.hivemq.com', help='MQTT broker address (default: broker.hivemq.com)')
     parser.add_argument('--port', type=int, default=1883, help='MQTT port (default: 1883)')
     parser.add_argument('--topic-prefix', default='iiot/sensors', help='MQTT topic prefix (default: iiot/sensors)')
+    parser.add_argument('--publish-interval', type=float, default=1.0,
+                        help='Seconds between per-topic publishes, 0 = every sample (default: 1)')
+    parser.add_argument('--exclude-topic', action='append', default=[], metavar='PATTERN',
+                        help='Skip topics whose suffix matches PATTERN, e.g. "mpu6050/gyro/*" (repeatable)')
+    parser.add_argument('--encoding', choices=['json', 'binary', 'msgpack'], default='json',
+                        help='Encoding for the <prefix>/all and <prefix>/batch payloads (default: json)')
+    parser.add_argument('--batch', action='store_true', help='Also publish every sample of each interval on <topic-prefix>/batch')
+    parser.add_argument('--batch-capacity', type=int, default=64, help='Max samples per batch message, flushed early when full (default: 64)')
+    parser.add_argument('--features', action='store_true',
+                        help='Publish RMS/peak/kurtosis/FFT band energies of the 9 IMU axes on <topic-prefix>/features (requires numpy)')
+    parser.add_argument('--features-window', type=int, default=128, help='Samples per feature window (default: 128)')
+    parser.add_argument('--features-hop', type=int, default=0, help='Samples between feature vectors (default: half the window)')
+    parser.add_argument('--resample-ms', type=float, default=0, metavar='MS',
+                        help='Resample onto a uniform MS grid using the ESP32 timestamps (e.g. 100 for 10Hz)')
+    parser.add_argument('--classify', metavar='MODEL',
+                        help='Classify sliding windows in-process with a .npz dense model or .onnx model, '
+                             'results on <topic-prefix>/classification')
+    parser.add_argument('--classify-hop', type=int, default=0, help='Samples between classifications (default: half the model window)')
+    parser.add_argument('--deadband', action='append', default=[], metavar='PATTERN=VALUE[%]',
+                        help='Only republish retained topics matching PATTERN when they move more than VALUE (or VALUE%%), e.g. "adxl345/*=0.05" (repeatable)')
+    parser.add_argument('--heartbeat', type=float, default=60.0, help='Max silence in seconds for deadband topics (default: 60)')
+    parser.add_argument('--spool', metavar='PATH', help='Store-and-forward spool database (SQLite) used while the broker is unreachable')
+    parser.add_argument('--spool-size', type=int, default=64, help='Spool byte budget in MB, oldest messages evicted first (default: 64)')
+    parser.add_argument('--drain-rate', type=float, default=100.0, help='Max spooled messages per second after reconnect (default: 100)')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='Replay a raw serial log or Edge Impulse JSON recording instead of reading hardware')
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help='Replay speed factor, 0 = unthrottled (default: 1)')
+    parser.add_argument('--replay-loop', action='store_true', help='Restart the recording when it ends')
+    parser.add_argument('--replay-pty', action='store_true',
+                        help='Feed the replay through a pseudo-terminal so the real serial code is used')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='Serve Prometheus metrics on http://<metrics-host>:PORT/metrics (default: disabled)')
+    parser.add_argument('--metrics-host', default='127.0.0.1', help='Metrics endpoint bind address (default: 127.0.0.1)')
+    parser.add_argument('--max-inflight', type=int, default=20, help='Max messages handed to the MQTT client at once (default: 20)')
+    parser.add_argument('--max-queued', type=int, default=1000, help='Max messages waiting for a free in-flight slot (default: 1000)')
+    parser.add_argument('--backpressure', choices=['block', 'drop_oldest', 'coalesce'],
+                        help='When the publish queue is full: block the pipeline (stalls serial reading while '
+                             'the broker is down), drop the oldest message, or keep only the newest message '
+                             'per topic (default: drop_oldest; block for --replay-speed 0)')
+    parser.add_argument('--queue-size', type=int, default=256, help='Max frames buffered between serial reader and publisher (default: 256)')
     
     args = parser.parse_args()
     
+    gateway = args.gateway or len(args.serial_ports) > 1
+    
+    replay = None
+    if args.replay:
+        if gateway:
+            print("[✗] --replay cannot be combined with gateway mode", file=sys.stderr)
+            sys.exit(1)
+        try:
+            records = load_recording(args.replay)
+        except OSError as e:
+            print(f"[✗] {e}", file=sys.stderr)
+            sys.exit(1)
+        if args.replay_pty:
+            replay = PtyReplay(records, speed=args.replay_speed, loop=args.replay_loop)
+            args.serial_ports = [replay.port]
+        else:
+            replay = ReplaySerial(records, speed=args.replay_speed, loop=args.replay_loop)
+            args.serial_ports = [f"replay:{os.path.basename(args.replay)}"]
+    
     # Auto-detect serial port if not provided
-    serial_port = args.serial_port
-    if not serial_port:
+    serial_port = args.serial_ports[0] if args.serial_ports else None
+    if not gateway and not serial_port:
         serial_port = find_serial_port()
         if not serial_port:
             print("[✗] No serial port found. Please specify manually.", file=sys.stderr)
@@ -308,14 +787,50 @@ Examples:
             sys.exit(1)
         print(f"[*] Auto-detected serial port: {serial_port}")
     
-    reader = ESP32MQTTReader(
-        serial_port=serial_port,
+    try:
+        get_encoders(args.encoding)
+        deadbands = [parse_deadband(spec) for spec in args.deadband]
+    except ValueError as e:
+        print(f"[✗] {e}", file=sys.stderr)
+        sys.exit(1)
+    
+    reader_kwargs = dict(
         baudrate=args.baudrate,
         mqtt_broker=args.broker,
         mqtt_port=args.port,
-        mqtt_topic_prefix=args.topic_prefix
+        mqtt_topic_prefix=args.topic_prefix,
+        publish_interval=args.publish_interval,
+        queue_size=args.queue_size,
+        exclude_topics=args.exclude_topic,
+        batch_capacity=args.batch_capacity if args.batch else 0,
+        encoding=args.encoding,
+        spool_path=args.spool,
+        spool_max_bytes=args.spool_size * 1024 * 1024,
+        drain_rate=args.drain_rate,
+        deadbands=deadbands,
+        heartbeat=args.heartbeat,
+        features_window=args.features_window if args.features else 0,
+        features_hop=args.features_hop,
+        classifier_model=args.classify,
+        classifier_hop=args.classify_hop,
+        resample_ms=args.resample_ms,
+        max_inflight=args.max_inflight,
+        max_queued=args.max_queued,
+        backpressure=args.backpressure,
+        metrics_port=args.metrics_port,
+        metrics_host=args.metrics_host
     )
     
+    try:
+        if gateway:
+            reader = ESP32Gateway(args.serial_ports or None, rescan_interval=args.rescan_interval,
+                                  **reader_kwargs)
+        else:
+            reader = ESP32MQTTReader(serial_port=serial_port, replay=replay, **reader_kwargs)
+    except ValueError as e:
+        print(f"[✗] {e}", file=sys.stderr)
+        sys.exit(1)
+    
     reader.run()
 
 
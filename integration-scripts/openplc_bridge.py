@@ -16,8 +16,13 @@ import paho.mqtt.client as mqtt
 import json
 import time
 import logging
+import sys
+from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mqtt_publisher import ACCEPTED, PipelinedPublisher  # noqa: E402
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,7 +46,10 @@ MQTT_CONFIG = {
     'port': 1883,
     'username': '',  # Kosongkan jika tidak pakai auth
     'password': '',
-    'client_id': 'OpenPLC_Bridge'
+    'client_id': 'OpenPLC_Bridge',
+    'max_inflight': 20,     # Pesan QoS 1 yang menunggu PUBACK sekaligus
+    'max_queued': 1000,     # Antrian saat window penuh
+    'backpressure': 'coalesce',  # block / drop_oldest / coalesce (nilai terbaru per topic)
 }
 
 # Update interval (seconds)
@@ -110,17 +118,29 @@ REGISTER_MAPPING = {
 class MQTTClient:
     def __init__(self, config):
         self.config = config
-        self.client = mqtt.Client(config['client_id'])
+        if hasattr(mqtt, 'CallbackAPIVersion'):  # paho-mqtt >= 2.0
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=config['client_id'])
+        else:
+            self.client = mqtt.Client(client_id=config['client_id'])
 
         if config['username']:
             self.client.username_pw_set(config['username'], config['password'])
 
         self.client.on_connect = self.on_connect
+        self.client.on_publish = self.on_publish
         self.client.on_disconnect = self.on_disconnect
         self.client.on_message = self.on_message
 
         self.connected = False
 
+        # Window publish QoS 1 dengan backpressure
+        self.publisher = PipelinedPublisher(
+            self.client,
+            max_inflight=config['max_inflight'],
+            max_queued=config['max_queued'],
+            policy=config['backpressure']
+        )
+
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logger.info("MQTT Connected")
@@ -162,12 +182,26 @@ class MQTTClient:
             return False
 
     def publish(self, topic, payload):
+        """Publish one payload dict, returns the publisher status or None if not connected"""
         if self.connected:
-            self.client.publish(topic, json.dumps(payload), qos=1)
-            return True
-        return False
+            return self.publisher.publish(topic, json.dumps(payload), qos=1)
+        return None
+
+    def on_publish(self, client, userdata, mid):
+        self.publisher.on_publish(mid)
+
+    def publish_many(self, messages):
+        """Publish a list of (topic, payload dict) in one go, returns the status per message or None if not connected"""
+        if self.connected:
+            return self.publisher.publish_many((topic, json.dumps(payload), 1, False) for topic, payload in messages)
+        return None
 
     def disconnect(self):
+        self.publisher.flush(timeout=5)
+        self.publisher.stop()
+        stats = self.publisher.stats()
+        if stats['dropped'] or stats['coalesced']:
+            logger.info(f"Publisher: {stats['dropped']} dropped, {stats['coalesced']} coalesced")
         self.client.loop_stop()
         self.client.disconnect()
 
@@ -284,6 +318,7 @@ class OpenPLCBridge:
 
     def read_and_publish(self):
         """Read semua registers dan publish ke MQTT"""
+        messages = []
         for reg_key, config in REGISTER_MAPPING.items():
             reg_type, address = reg_key.split(':')
             address = int(address)
@@ -308,11 +343,19 @@ class OpenPLCBridge:
                     'name': config['name']
                 }
 
-                # Publish ke MQTT
-                if self.mqtt.publish(config['topic'], payload):
-                    logger.debug(f"Published {config['name']}: {scaled_value} {config['unit']}")
-                else:
-                    logger.warning(f"Failed to publish {config['name']}")
+                messages.append((config['topic'], payload))
+                logger.debug(f"Read {config['name']}: {scaled_value} {config['unit']}")
+
+        # Publish semua register sekaligus ke MQTT
+        if not messages:
+            return
+        statuses = self.mqtt.publish_many(messages)
+        if statuses is None:
+            logger.warning(f"Failed to publish {len(messages)} values (MQTT not connected)")
+            return
+        failed = [topic for (topic, _), status in zip(messages, statuses) if status not in ACCEPTED]
+        if failed:
+            logger.warning(f"Failed to publish {len(failed)} values: {', '.join(failed)}")
 
     def handle_commands(self):
         """Handle commands dari dashboard (jika ada)"""
@@ -19,8 +19,13 @@ import paho.mqtt.client as mqtt
 import json
 import time
 import logging
+import sys
+from pathlib import Path
 from datetime import datetime, timedelta
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from mqtt_publisher import ACCEPTED, PipelinedPublisher  # noqa: E402
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -47,7 +52,10 @@ MQTT_CONFIG = {
     'port': 1883,
     'username': '',
     'password': '',
-    'client_id': 'SCADA_DB_Bridge'
+    'client_id': 'SCADA_DB_Bridge',
+    'max_inflight': 20,     # Pesan QoS 1 yang menunggu PUBACK sekaligus
+    'max_queued': 1000,     # Antrian saat window penuh
+    'backpressure': 'coalesce',  # block / drop_oldest / coalesce (nilai terbaru per topic)
 }
 
 # Update interval (seconds)
@@ -213,14 +221,26 @@ class DatabaseClient:
 class MQTTClient:
     def __init__(self, config):
         self.config = config
-        self.client = mqtt.Client(config['client_id'])
+        if hasattr(mqtt, 'CallbackAPIVersion'):  # paho-mqtt >= 2.0
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=config['client_id'])
+        else:
+            self.client = mqtt.Client(client_id=config['client_id'])
 
         if config['username']:
             self.client.username_pw_set(config['username'], config['password'])
 
         self.client.on_connect = self.on_connect
+        self.client.on_publish = self.on_publish
         self.connected = False
 
+        # Window publish QoS 1 dengan backpressure
+        self.publisher = PipelinedPublisher(
+            self.client,
+            max_inflight=config['max_inflight'],
+            max_queued=config['max_queued'],
+            policy=config['backpressure']
+        )
+
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logger.info("MQTT Connected")
@@ -239,12 +259,26 @@ class MQTTClient:
             return False
 
     def publish(self, topic, payload):
+        """Publish one payload dict, returns the publisher status or None if not connected"""
+        if self.connected:
+            return self.publisher.publish(topic, json.dumps(payload), qos=1)
+        return None
+
+    def on_publish(self, client, userdata, mid):
+        self.publisher.on_publish(mid)
+
+    def publish_many(self, messages):
+        """Publish a list of (topic, payload dict) in one go, returns the status per message or None if not connected"""
         if self.connected:
-            result = self.client.publish(topic, json.dumps(payload), qos=1)
-            return result.rc == mqtt.MQTT_ERR_SUCCESS
-        return False
+            return self.publisher.publish_many((topic, json.dumps(payload), 1, False) for topic, payload in messages)
+        return None
 
     def disconnect(self):
+        self.publisher.flush(timeout=5)
+        self.publisher.stop()
+        stats = self.publisher.stats()
+        if stats['dropped'] or stats['coalesced']:
+            logger.info(f"Publisher: {stats['dropped']} dropped, {stats['coalesced']} coalesced")
         self.client.loop_stop()
         self.client.disconnect()
 
@@ -285,6 +319,8 @@ class SCADABridge:
             return
 
         # Process setiap tag
+        messages = []
+        published = []
         for tag_name, tag_data in data.items():
             # Check jika tag ada di mapping
             if tag_name not in TAG_MAPPING:
@@ -311,11 +347,22 @@ class SCADABridge:
                 'point_name': tag_data['name']
             }
 
-            # Publish ke MQTT
-            if self.mqtt.publish(topic, payload):
-                logger.info(f"Published {tag_name}: {tag_data['value']} {tag_data['unit']} -> {topic}")
+            messages.append((topic, payload))
+            published.append((tag_name, tag_data))
+
+        if not messages:
+            return
+
+        # Publish semua tag yang berubah sekaligus ke MQTT
+        statuses = self.mqtt.publish_many(messages)
+        if statuses is None:
+            logger.warning(f"Failed to publish {len(messages)} values (MQTT not connected)")
+            return
+        for (tag_name, tag_data), (topic, _), status in zip(published, messages, statuses):
+            if status in ACCEPTED:
+                logger.info(f"Published {tag_name}: {tag_data['value']} {tag_data['unit']} -> {topic} ({status})")
             else:
-                logger.warning(f"Failed to publish {tag_name}")
+                logger.warning(f"Failed to publish {tag_name} ({status})")
 
     def run(self):
         """Main loop"""
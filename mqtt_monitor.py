@@ -2,106 +2,359 @@
 """
 Simple MQTT monitor - subscribes to sensor topics and displays data
 Shows 1 line per second for clean output
+
+Subscribes to <prefix>/# and routes every topic through a dispatch table
+built once from the publish plan layout (all, per-sensor, per-axis, batch,
+features, classification; also under <prefix>/<device>/ in gateway mode).
+on_message only stores the raw payload of the route; payloads are decoded
+when a line is printed, so the full per-axis topic tree costs one dict
+lookup per message.
+
+--stats replaces the line with a table refreshed in place: per topic the
+message rate, inter-arrival mean/jitter/p99, payload size, and for the
+sample documents (all, batch) end-to-end latency from the reader's
+reception_time and drift of the device timestamp against the host clock.
+Every topic keeps fixed-size histograms and running sums, so memory does
+not grow with the number of messages.
 """
 
-import json
-import paho.mqtt.client as mqtt
+import argparse
+import math
+import sys
+import time
 from datetime import datetime
-from collections import defaultdict
+
+import paho.mqtt.client as mqtt
+
+from payload_codec import decode_payload
+from pipeline_metrics import PUBACK_BUCKETS, Histogram
+from publish_plan import TOPIC_LAYOUT
+
+
+def decode_scalar(payload):
+    return float(payload)
+
+
+# suffix -> (path dalam dokumen, decoder); dokumen tambahan reader tanpa path
+ROUTES = {suffix: (path, decode_payload if encoding == 'json' else decode_scalar)
+          for suffix, path, encoding, _ in TOPIC_LAYOUT}
+ROUTES.update({suffix: (None, decode_payload) for suffix in ('batch', 'features', 'classification')})
+
+# Topic yang ikut membentuk dokumen sample (batch/features/classification tidak)
+RENDER_TOPICS = [suffix for suffix, _, _, _ in TOPIC_LAYOUT]
+
+IGNORED = None
+
+# Dokumen dengan timestamp device dan reception_time (latency + drift)
+TIMED = ('all', 'batch')
+
+# Detik antar pesan, dari batch cepat sampai topic retained yang jarang berubah
+GAP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def reception_seconds(value):
+    """ISO reception_time (reader host clock) -> unix seconds, None if missing"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def device_time(data):
+    """Device timestamp (ms) of the newest sample in an all/batch document"""
+    if 'columns' in data:
+        period = data.get('period_ms') or 0.0
+        return data['t0'] + (data['count'] - 1) * period
+    return data['timestamp']
+
+
+class TopicStats:
+    def __init__(self):
+        """Streaming statistics of one topic (fixed memory)"""
+        self.count = 0
+        self.bytes = 0
+        self.max_size = 0
+        self.last_arrival = None
+        self.gaps = Histogram(GAP_BUCKETS)
+        self._gap_mean = 0.0
+        self._gap_m2 = 0.0
+        self.latency = Histogram(PUBACK_BUCKETS)
+        self.offset0 = None
+        self.drift_ms = None
+        self.last_device_ms = None
+        self._rate_count = 0
+        self._rate_time = None
+
+    def observe(self, size, arrival):
+        """Count one message of size bytes arriving at arrival (unix seconds)"""
+        self.count += 1
+        self.bytes += size
+        if size > self.max_size:
+            self.max_size = size
+        last = self.last_arrival
+        self.last_arrival = arrival
+        if last is None:
+            self._rate_time = arrival
+            return
+        gap = arrival - last
+        self.gaps.observe(gap)
+        # Welford: mean dan variance inter-arrival tanpa menyimpan sample
+        delta = gap - self._gap_mean
+        self._gap_mean += delta / self.gaps.count
+        self._gap_m2 += delta * (gap - self._gap_mean)
+
+    def observe_document(self, data, arrival):
+        """Latency from reception_time and drift of the device clock"""
+        reception = reception_seconds(data.get('reception_time'))
+        if reception is not None:
+            self.latency.observe(arrival - reception)
+        try:
+            device_ms = device_time(data)
+        except (KeyError, TypeError):
+            return
+        offset = arrival * 1000.0 - device_ms
+        rebooted = self.last_device_ms is not None and device_ms < self.last_device_ms
+        self.last_device_ms = device_ms
+        if self.offset0 is None or rebooted:
+            self.offset0 = offset  # Pertama kali, atau ESP32 reboot (timestamp mundur)
+        self.drift_ms = offset - self.offset0
+
+    @property
+    def jitter(self):
+        """Standard deviation of the inter-arrival time (seconds)"""
+        n = self.gaps.count
+        return math.sqrt(self._gap_m2 / (n - 1)) if n > 1 else None
+
+    def rate(self, now):
+        """Messages per second since the previous call"""
+        if self._rate_time is None:
+            return 0.0
+        elapsed = now - self._rate_time
+        rate = (self.count - self._rate_count) / elapsed if elapsed > 0 else 0.0
+        self._rate_count = self.count
+        self._rate_time = now
+        return rate
+
+    def row(self, now):
+        def ms(seconds, fmt='.1f'):
+            return '-' if seconds is None else format(seconds * 1000, fmt)
+        gap_mean = self._gap_mean if self.gaps.count else None
+        return (f"{self.count:>8} {self.rate(now):>8.1f} {now - self.last_arrival:>6.1f} "
+                f"{ms(gap_mean):>8} {ms(self.jitter):>8} {ms(self.gaps.quantile(0.99)):>8} "
+                f"{self.bytes / self.count:>7.0f} {self.max_size:>7} "
+                f"{ms(self.latency.quantile(0.5)):>8} {ms(self.latency.quantile(0.99)):>8} "
+                f"{'-' if self.drift_ms is None else format(self.drift_ms, '.0f'):>8}")
+
+
+STATS_HEADER = (f"{'TOPIC':<28} {'MSGS':>8} {'MSG/s':>8} {'AGE s':>6} {'GAP ms':>8} {'JIT ms':>8} "
+                f"{'GAP p99':>8} {'AVG B':>7} {'MAX B':>7} {'LAT p50':>8} {'LAT p99':>8} {'DRIFT':>8}")
+
 
 class MQTTMonitor:
-    def __init__(self, broker="broker.hivemq.com", port=1883, topic_prefix="iiot/sensors"):
+    def __init__(self, broker="broker.hivemq.com", port=1883, topic_prefix="iiot/sensors", interval=1.0,
+                 stats=False):
         self.broker = broker
         self.port = port
         self.topic_prefix = topic_prefix
+        self.interval = interval
+        self.stats = {} if stats else None  # topic -> TopicStats
+        self.started = time.time()
         self.mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id="mqtt-monitor")
-        self.last_data = defaultdict(dict)
+        # topic -> (device, suffix) atau IGNORED, diisi sekali per topic
+        self.routes = {f"{topic_prefix}/{suffix}": ('', suffix) for suffix in ROUTES}
+        # (device, suffix) -> (urutan terima, payload mentah terakhir)
+        self.latest = {}
+        self.devices = {'': None}
         self.last_print_time = 0
-        
+        self.messages = 0
+        self.ignored = 0
+
         # Setup callbacks
         self.mqtt_client.on_connect = self.on_connect
         self.mqtt_client.on_message = self.on_message
         self.mqtt_client.on_disconnect = self.on_disconnect
-    
+
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             print("[✓] Connected to MQTT broker")
-            client.subscribe(f"{self.topic_prefix}/all")
-            client.subscribe(f"{self.topic_prefix}/adxl345")
-            client.subscribe(f"{self.topic_prefix}/mpu6050")
-            client.subscribe(f"{self.topic_prefix}/bmp280")
+            client.subscribe(f"{self.topic_prefix}/#", qos=0)
         else:
             print(f"[✗] Connection failed with code {rc}")
-    
+
     def on_disconnect(self, client, userdata, rc):
         if rc != 0:
             print(f"[!] Unexpected MQTT disconnection with code {rc}")
-    
+
+    def resolve(self, topic):
+        """Route for a topic not in the table yet: <prefix>/<suffix> or <prefix>/<device>/<suffix>"""
+        route = IGNORED
+        head = f"{self.topic_prefix}/"
+        if topic.startswith(head):
+            device, _, suffix = topic[len(head):].partition('/')
+            if suffix in ROUTES:
+                route = (device, suffix)
+                self.devices.setdefault(device, None)
+        self.routes[topic] = route
+        return route
+
     def on_message(self, client, userdata, msg):
-        try:
-            topic = msg.topic
-            payload = msg.payload.decode('utf-8')
-            
-            # Parse JSON if it's data
+        topic = msg.topic
+        route = self.routes.get(topic, False)
+        if route is False:
+            route = self.resolve(topic)
+        self.messages += 1
+        if route is IGNORED:
+            self.ignored += 1
+            return
+        # Simpan mentah, decode hanya saat render. Retained replay (urutan 0) selalu
+        # dianggap lebih lama dari pesan live
+        self.latest[route] = (0 if msg.retain else self.messages, msg.payload)
+
+        if self.stats is not None:
+            if not msg.retain:  # Retained replay saat subscribe bukan traffic live
+                self.observe(topic, route, msg.payload)
+            return  # Tabel di-refresh dari thread utama
+
+        # Print data every interval (for real-time monitoring)
+        current_time = time.monotonic()
+        if current_time - self.last_print_time >= self.interval:
+            self.last_print_time = current_time
+            for device in self.devices:
+                self.print_data(device)
+
+    def observe(self, topic, route, payload):
+        """Update the statistics of a routed topic"""
+        arrival = time.time()
+        stats = self.stats.get(topic)
+        if stats is None:
+            stats = self.stats[topic] = TopicStats()
+        stats.observe(len(payload), arrival)
+        if route[1] in TIMED:
+            try:
+                data = decode_payload(payload)
+            except ValueError:
+                return
+            if isinstance(data, dict):
+                stats.observe_document(data, arrival)
+
+    def print_stats(self):
+        """Redraw the per-topic table (in place on a terminal)"""
+        now = time.time()
+        skip = len(self.topic_prefix) + 1
+        lines = [
+            f"[*] {self.topic_prefix}/# on {self.broker}:{self.port} - {self.messages} messages, "
+            f"{self.ignored} unrouted, {now - self.started:.0f}s",
+            "    GAP = inter-arrival (ms), LAT = reception_time -> monitor (ms), DRIFT = device vs host clock (ms)",
+            "",
+            STATS_HEADER,
+        ]
+        for topic, stats in sorted(list(self.stats.items())):
+            lines.append(f"{topic[skip:]:<28} {stats.row(now)}")
+        if sys.stdout.isatty():
+            sys.stdout.write("\033[H\033[J")  # Cursor ke kiri atas + clear, tanpa scroll
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+
+    def document(self, device=''):
+        """Latest sample document of a device, merged from whichever topics arrived
+
+        Payloads are applied oldest first, so the newest value wins: a fresh
+        'all' document overrides retained, deadbanded or excluded per-axis
+        topics that stopped updating.
+        """
+        received = [(self.latest[(device, suffix)], suffix) for suffix in RENDER_TOPICS
+                    if (device, suffix) in self.latest]
+        received.sort(key=lambda item: item[0][0])
+        data = {}
+        for (_, payload), suffix in received:
+            path, decode = ROUTES[suffix]
             try:
-                data = json.loads(payload)
-            except:
-                data = payload
-            
-            # Store latest data
-            if "all" in topic:
-                self.last_data['all'] = data
-            elif "adxl345" in topic:
-                self.last_data['adxl345'] = data
-            elif "mpu6050" in topic:
-                self.last_data['mpu6050'] = data
-            elif "bmp280" in topic:
-                self.last_data['bmp280'] = data
-            
-            # Print data every 1 second (for real-time monitoring)
-            import time
-            current_time = time.time()
-            if current_time - self.last_print_time >= 1.0:
-                self.print_data()
-                self.last_print_time = current_time
-        except Exception as e:
-            pass  # Silent - skip errors
-    
-    def print_data(self):
+                value = decode(payload)
+            except (ValueError, TypeError):
+                continue  # Silent - skip errors
+            if not path:
+                if isinstance(value, dict):
+                    data.update(value)
+                continue
+            node = data
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+                if not isinstance(node, dict):
+                    break
+            else:
+                node[path[-1]] = value
+        return data
+
+    def print_data(self, device=''):
         """Print formatted sensor data"""
-        all_data = self.last_data.get('all', {})
+        all_data = self.document(device)
         if not all_data:
             return
-        
+
         adxl = all_data.get('adxl345', {})
         mpu = all_data.get('mpu6050', {})
         bmp = all_data.get('bmp280', {})
         ts = all_data.get('timestamp', 'N/A')
-        
+
         # Format: same as ESP32 reader output
-        output = f"[✓] TS:{ts} | "
+        output = f"[✓] {device + ' ' if device else ''}TS:{ts} | "
         output += f"ADXL345(ax:{adxl.get('ax', 0):.2f},ay:{adxl.get('ay', 0):.2f},az:{adxl.get('az', 0):.2f}) | "
-        
+
         accel = mpu.get('accel', {})
         gyro = mpu.get('gyro', {})
         output += f"MPU6050(ax:{accel.get('x', 0):.2f},ay:{accel.get('y', 0):.2f},az:{accel.get('z', 0):.2f},"
         output += f"gx:{gyro.get('x', 0):.4f},gy:{gyro.get('y', 0):.4f},gz:{gyro.get('z', 0):.4f},"
         output += f"t:{mpu.get('temp', 0):.2f}) | "
-        
+
         output += f"BMP280(t:{bmp.get('temp', 0):.2f},p:{bmp.get('pressure', 0):.2f},alt:{bmp.get('altitude', 0):.2f})"
-        
+
         print(output)
-    
+
     def run(self):
         """Start MQTT monitor"""
-        print(f"[*] MQTT Monitor connecting to {self.broker}:{self.port}")
+        print(f"[*] MQTT Monitor connecting to {self.broker}:{self.port} ({self.topic_prefix}/#)")
         self.mqtt_client.connect(self.broker, self.port, keepalive=60)
-        self.mqtt_client.loop_forever()
+        if self.stats is None:
+            self.mqtt_client.loop_forever()
+            return
+        # Refresh dengan timer, supaya topic yang berhenti tetap terlihat (AGE naik)
+        self.mqtt_client.loop_start()
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.print_stats()
+        finally:
+            self.mqtt_client.loop_stop()
 
-if __name__ == "__main__":
-    monitor = MQTTMonitor()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Monitor ESP32 sensor topics on an MQTT broker',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 mqtt_monitor.py
+  python3 mqtt_monitor.py --broker localhost --topic-prefix home/sensors
+  python3 mqtt_monitor.py --interval 0.2
+  python3 mqtt_monitor.py --broker localhost --stats
+        """
+    )
+    parser.add_argument('--broker', default='broker.hivemq.com', help='MQTT broker address (default: broker.hivemq.com)')
+    parser.add_argument('--port', type=int, default=1883, help='MQTT broker port (default: 1883)')
+    parser.add_argument('--topic-prefix', default='iiot/sensors', help='MQTT topic prefix (default: iiot/sensors)')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between printed lines / table refreshes (default: 1)')
+    parser.add_argument('--stats', action='store_true',
+                        help='Show per-topic rate, jitter, payload size, latency and drift instead of sensor values')
+    args = parser.parse_args()
+
+    monitor = MQTTMonitor(args.broker, args.port, args.topic_prefix, args.interval, args.stats)
     try:
         monitor.run()
     except KeyboardInterrupt:
         print("\n[*] Stopping MQTT monitor")
+        print(f"    - Messages: {monitor.messages} ({monitor.ignored} on unrouted topics)")
         monitor.mqtt_client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
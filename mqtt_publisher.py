@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Pipelined MQTT Publisher
+Bounded publish window in front of a paho client. Up to max_inflight
+messages are handed to paho at once (sent, awaiting PUBACK for QoS>0);
+further messages wait in a queue of at most max_queued entries. When the
+queue is full the producer gets backpressure according to the policy:
+
+    block        wait until the window drains (lossless)
+    drop_oldest  discard the oldest queued message
+    coalesce     keep only the newest payload per topic (latest-value
+                 telemetry); if no queued message shares the topic, the
+                 oldest one is discarded
+
+on_publish(mid) must be called from the client's on_publish callback.
+
+publish() returns what happened to the message: SENT (handed to paho),
+QUEUED, COALESCED (replaced a queued payload of the same topic), DROPPED
+(block timeout) or FAILED (rejected by paho).
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import paho.mqtt.client as mqtt
+
+POLICIES = ('block', 'drop_oldest', 'coalesce')
+
+# Status publish() / publish_many()
+SENT = 'sent'
+QUEUED = 'queued'
+COALESCED = 'coalesced'
+DROPPED = 'dropped'
+FAILED = 'failed'
+ACCEPTED = (SENT, QUEUED, COALESCED)
+
+
+class PipelinedPublisher:
+    def __init__(self, client, max_inflight=20, max_queued=1000, policy='block',
+                 block_timeout=None, metrics=None):
+        """Wrap a paho client whose network loop is already running (or will be)
+
+        block_timeout: max seconds a producer waits under 'block' before the
+                       message is dropped (None = wait as long as needed)
+        metrics:       optional PipelineMetrics; every message handed to paho
+                       is wrapped in before_publish()/after_publish()
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy} (choose from {', '.join(POLICIES)})")
+        self.client = client
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.metrics = metrics
+        client.max_inflight_messages_set(max_inflight)
+
+        self.outstanding = 0  # Diserahkan ke paho, belum selesai (PUBACK / terkirim)
+        self.published = 0
+        self.completed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.blocked_seconds = 0.0
+
+        # coalesce: topic -> message, selain itu deque FIFO
+        self._queue = OrderedDict() if policy == 'coalesce' else deque()
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)  # Producer menunggu ruang (block)
+        self._idle = threading.Condition(self._lock)  # flush() menunggu kosong
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._send_loop, name="mqtt-publisher", daemon=True)
+        self._thread.start()
+
+    @property
+    def queued(self):
+        return len(self._queue)
+
+    def publish(self, topic, payload, qos=1, retain=False):
+        """Send now if the window has room, else queue under the backpressure policy
+
+        Returns SENT, QUEUED, COALESCED, DROPPED or FAILED.
+        """
+        with self._lock:
+            if self.outstanding < self.max_inflight and not self._queue:
+                self.outstanding += 1
+                direct = True
+            else:
+                direct = False
+                status = self._enqueue((topic, payload, qos, retain))
+        if direct:
+            return SENT if self._send(topic, payload, qos, retain) else FAILED
+        self._wake.set()
+        return status
+
+    def publish_many(self, messages):
+        """Publish an iterable of (topic, payload, qos, retain) under one lock acquisition
+
+        Returns the status of every message, in order.
+        """
+        with self._lock:
+            statuses = [self._enqueue(message) for message in messages]
+        self._wake.set()
+        return statuses
+
+    def _enqueue(self, message):
+        """Add one message to the queue (lock held), applying the policy if full; returns its status"""
+        queue = self._queue
+        if self.policy == 'coalesce':
+            topic = message[0]
+            if topic in queue:
+                queue[topic] = message  # Posisi tetap, payload terbaru
+                self.coalesced += 1
+                return COALESCED
+            if len(queue) >= self.max_queued:
+                queue.popitem(last=False)
+                self.dropped += 1
+            queue[topic] = message
+            return QUEUED
+
+        if len(queue) >= self.max_queued:
+            if self.policy == 'drop_oldest':
+                queue.popleft()
+                self.dropped += 1
+            else:
+                started = time.monotonic()
+                deadline = None if self.block_timeout is None else started + self.block_timeout
+                while len(queue) >= self.max_queued and not self._stop_event.is_set():
+                    self._wake.set()
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._space.wait(remaining if remaining is not None else 0.5)
+                self.blocked_seconds += time.monotonic() - started
+                if len(queue) >= self.max_queued:
+                    self.dropped += 1
+                    return DROPPED
+        queue.append(message)
+        return QUEUED
+
+    def _send(self, topic, payload, qos, retain):
+        """Hand one message to paho (window slot already reserved, lock not held)
+
+        Returns the MQTTMessageInfo, or None if paho rejected the message.
+        """
+        metrics = self.metrics
+        sent = metrics.before_publish() if metrics is not None else None
+        info = None
+        try:
+            info = self.client.publish(topic, payload, qos=qos, retain=retain)
+        except Exception as e:
+            self._release()
+            self.failed += 1
+            print(f"[!] Publish to {topic} failed: {e}", file=sys.stderr)
+            return None
+        finally:
+            if metrics is not None:
+                metrics.after_publish(info, sent, qos)
+        self.published += 1
+        # QoS 0 tanpa koneksi dibuang paho, QUEUE_SIZE ditolak: tidak akan ada on_publish
+        if info.rc == mqtt.MQTT_ERR_QUEUE_SIZE or (info.rc != mqtt.MQTT_ERR_SUCCESS and not qos):
+            self._release()
+            self.failed += 1
+            return None
+        return info
+
+    def _release(self):
+        """Free one window slot, returns False if none was outstanding"""
+        with self._lock:
+            if self.outstanding <= 0:
+                return False  # PUBACK duplikat / mid yang tidak pernah dikirim lewat window ini
+            self.outstanding -= 1
+            if not self.outstanding and not self._queue:
+                self._idle.notify_all()
+        self._wake.set()
+        return True
+
+    def on_publish(self, mid):
+        """Call from the client's on_publish callback (paho network thread)"""
+        if self._release():
+            self.completed += 1
+
+    def _send_loop(self):
+        """Move queued messages into the window as PUBACKs free slots"""
+        while not self._stop_event.is_set():
+            self._wake.wait(timeout=0.5)
+            self._wake.clear()
+            while True:
+                with self._lock:
+                    if not self._queue or self.outstanding >= self.max_inflight:
+                        break
+                    if self.policy == 'coalesce':
+                        _, message = self._queue.popitem(last=False)
+                    else:
+                        message = self._queue.popleft()
+                    self.outstanding += 1
+                    self._space.notify()
+                self._send(*message)
+
+    def flush(self, timeout=5.0):
+        """Wait until every queued and outstanding message is done, returns True if drained"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._queue or self.outstanding > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._wake.set()
+                self._idle.wait(min(remaining, 0.1))
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        with self._lock:
+            self._space.notify_all()
+        self._thread.join(timeout=2)
+
+    def stats(self):
+        return {
+            'outstanding': self.outstanding,
+            'queued': len(self._queue),
+            'published': self.published,
+            'completed': self.completed,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'failed': self.failed,
+        }
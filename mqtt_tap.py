@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+MQTT Tap
+Recorder input that subscribes to what esp32_mqtt_reader.py already
+publishes, so training data can be captured from the live line while the
+reader keeps the serial port:
+
+    .../batch   every sample of each publish interval (--batch on the
+                reader); timestamps rebuilt from t0 + i * period_ms
+    .../all     one document per publish interval (low rate, fallback)
+
+Payloads are decoded with payload_codec (json, msgpack or binary). The
+subscription is QoS 0 with its own client id, so the broker fans the
+messages out without extra PUBACK traffic or state on the production
+publisher.
+
+URL form used by record_training_data.py:
+    mqtt://broker[:port][/topic]   (default topic iiot/sensors/batch)
+"""
+
+import queue
+import sys
+import time
+from urllib.parse import urlparse
+
+import paho.mqtt.client as mqtt
+
+from payload_codec import decode_payload
+from sensor_parser import IMU_FIELDS, IMU_SLICE, SensorLineParser
+
+DEFAULT_TOPIC = 'iiot/sensors/batch'
+
+
+class MQTTTap:
+    def __init__(self, broker, port=1883, topic=DEFAULT_TOPIC, client_id=None, parser=None, queue_size=100000):
+        """Queue (timestamp, 9 IMU values) samples decoded from topic"""
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.client_id = client_id or f"iiot-recorder-tap-{int(time.time())}"
+        self.parser = parser or SensorLineParser()
+        self.samples = queue.Queue(maxsize=queue_size)
+        self.client = None
+        self.connected = False
+
+        self.messages = 0
+        self.sample_count = 0
+        self.decode_errors = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """mqtt://broker[:port][/topic]"""
+        parsed = urlparse(url)
+        if parsed.scheme != 'mqtt' or not parsed.hostname:
+            raise ValueError(f"Invalid tap URL: {url} (expected mqtt://broker[:port][/topic])")
+        return cls(parsed.hostname, parsed.port or 1883, parsed.path.lstrip('/') or DEFAULT_TOPIC, **kwargs)
+
+    def start(self, timeout=10.0):
+        """Connect and subscribe, returns True once subscribed"""
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=self.client_id)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+        try:
+            self.client.connect(self.broker, self.port, keepalive=60)
+        except Exception as e:
+            print(f"[✗] Failed to connect to MQTT broker: {e}", file=sys.stderr)
+            return False
+        self.client.loop_start()
+        deadline = time.time() + timeout
+        while not self.connected and time.time() < deadline:
+            time.sleep(0.05)
+        return self.connected
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            self.connected = True
+            # Subscribe ulang juga setelah reconnect
+            client.subscribe(self.topic, qos=0)
+        else:
+            print(f"[✗] MQTT connection failed with code {rc}", file=sys.stderr)
+
+    def on_disconnect(self, client, userdata, rc):
+        self.connected = False
+
+    def on_message(self, client, userdata, message):
+        """Decode a batch or single-sample payload (paho network thread)"""
+        self.messages += 1
+        try:
+            data = decode_payload(message.payload)
+            if 'columns' in data:
+                samples = self._batch_samples(data)
+            else:
+                values = self.parser.parse_document(data)
+                samples = [] if values is None else [(values[0], list(values[IMU_SLICE]))]
+        except (ValueError, KeyError, TypeError):
+            self.decode_errors += 1
+            return
+        for sample in samples:
+            try:
+                self.samples.put_nowait(sample)
+                self.sample_count += 1
+            except queue.Full:
+                self.dropped += 1
+
+    def _batch_samples(self, data):
+        """Batch payload (column-major) -> list of (timestamp, 9 IMU values)"""
+        columns = data['columns']
+        axes = [data['values'][columns.index(name)] for name in IMU_FIELDS]
+        t0 = data['t0']
+        period = data['period_ms'] or 0.0
+        return [(int(round(t0 + i * period)), [axis[i] for axis in axes]) for i in range(data['count'])]
+
+    def read_sample(self, timeout=1.0):
+        """Next (timestamp, values) or None if nothing arrived within timeout"""
+        try:
+            return self.samples.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        if self.client is not None:
+            self.client.loop_stop()
+            self.client.disconnect()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Sensor Payload Codec
+Encoders for the ESP32 sample document (iiot/sensors/all) and the batch
+message (iiot/sensors/batch), plus a decoder that Python subscribers can
+use without knowing which encoding the publisher was started with.
+
+Encodings:
+    json    - current JSON documents (default, used by the dashboard)
+    binary  - struct-packed little-endian float32 frame with a versioned header
+    msgpack - MessagePack of the JSON document (requires the msgpack package)
+
+Binary frame layout (little-endian):
+    header  magic 'ES' | version u8 | schema u8 | count u16 |
+            timestamp i64 (device ms, t0 for batch) |
+            reception_time f64 (unix seconds) | period_ms f32 (NaN = none)
+    body    count * len(fields) float32, column-major
+"""
+
+import json
+import math
+import struct
+from datetime import datetime
+
+from sample_batch import BATCH_COLUMNS
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b'ES'
+VERSION = 1
+HEADER = struct.Struct('<2sBBHqdf')
+
+SCHEMA_SAMPLE = 1
+SCHEMA_BATCH = 2
+
+# Field layout per schema: path dalam JSON ESP32 untuk setiap float32
+SAMPLE_FIELDS = (
+    ('adxl345', 'ax'), ('adxl345', 'ay'), ('adxl345', 'az'),
+    ('mpu6050', 'accel', 'x'), ('mpu6050', 'accel', 'y'), ('mpu6050', 'accel', 'z'),
+    ('mpu6050', 'gyro', 'x'), ('mpu6050', 'gyro', 'y'), ('mpu6050', 'gyro', 'z'),
+    ('mpu6050', 'temp'),
+    ('bmp280', 'temp'), ('bmp280', 'pressure'), ('bmp280', 'altitude'),
+)
+BATCH_FIELDS = tuple(BATCH_COLUMNS)
+
+SCHEMAS = {
+    SCHEMA_SAMPLE: SAMPLE_FIELDS,
+    SCHEMA_BATCH: BATCH_FIELDS,
+}
+
+_SAMPLE_BODY = struct.Struct(f'<{len(SAMPLE_FIELDS)}f')
+
+
+def _reception_seconds(value):
+    """ISO reception_time string -> unix seconds (0.0 if missing)"""
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _reception_iso(seconds):
+    return datetime.fromtimestamp(seconds).isoformat() if seconds else None
+
+
+# ==================== ENCODERS ====================
+
+def encode_sample_binary(data):
+    """Pack one ESP32 sample document into a binary frame"""
+    values = []
+    for path in SAMPLE_FIELDS:
+        value = data
+        for key in path:
+            value = value[key]
+        values.append(value)
+    header = HEADER.pack(MAGIC, VERSION, SCHEMA_SAMPLE, 1, int(data.get("timestamp", 0)),
+                         _reception_seconds(data.get("reception_time")), math.nan)
+    return header + _SAMPLE_BODY.pack(*values)
+
+
+def encode_batch_binary(payload):
+    """Pack a SampleBatch payload (column-major values) into a binary frame"""
+    count = payload["count"]
+    period = payload["period_ms"]
+    header = HEADER.pack(MAGIC, VERSION, SCHEMA_BATCH, count, int(payload["t0"] or 0),
+                         _reception_seconds(payload.get("reception_time")),
+                         math.nan if period is None else period)
+    body = struct.pack(f'<{count * len(BATCH_FIELDS)}f',
+                       *(v for column in payload["values"] for v in column))
+    return header + body
+
+
+def encode_msgpack(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+# name -> (sample encoder, batch encoder)
+ENCODINGS = {
+    'json': (json.dumps, json.dumps),
+    'binary': (encode_sample_binary, encode_batch_binary),
+}
+if msgpack is not None:
+    ENCODINGS['msgpack'] = (encode_msgpack, encode_msgpack)
+
+
+def get_encoders(name):
+    """Return (sample_encoder, batch_encoder) for an encoding name"""
+    if name not in ENCODINGS:
+        if name == 'msgpack':
+            raise ValueError("msgpack encoding requires 'pip install msgpack'")
+        raise ValueError(f"Unknown encoding: {name}")
+    return ENCODINGS[name]
+
+
+# ==================== DECODER ====================
+
+def decode_binary(payload):
+    """Unpack a binary frame into the same dict shape as the JSON document"""
+    magic, version, schema, count, timestamp, reception, period = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported frame (magic={magic!r}, version={version})")
+    fields = SCHEMAS.get(schema)
+    if fields is None:
+        raise ValueError(f"Unknown schema id: {schema}")
+
+    values = struct.unpack_from(f'<{count * len(fields)}f', payload, HEADER.size)
+
+    if schema == SCHEMA_BATCH:
+        return {
+            "t0": timestamp,
+            "period_ms": None if math.isnan(period) else period,
+            "count": count,
+            "columns": list(fields),
+            "values": [list(values[c * count:(c + 1) * count]) for c in range(len(fields))],
+            "reception_time": _reception_iso(reception),
+        }
+
+    data = {"timestamp": timestamp}
+    for path, value in zip(fields, values):
+        node = data
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    data["reception_time"] = _reception_iso(reception)
+    return data
+
+
+def decode_payload(payload):
+    """Decode a sensor payload in any supported encoding
+
+    Returns the decoded object, or raises ValueError if the payload is not
+    a recognised document.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    if payload[:2] == MAGIC:
+        return decode_binary(payload)
+    first = payload[:1]
+    if first in (b'{', b'['):
+        return json.loads(payload)
+    if msgpack is not None and first and (0x80 <= first[0] <= 0x8f or first[0] in (0xde, 0xdf)):
+        try:
+            return msgpack.unpackb(payload, raw=False)
+        except Exception as e:
+            raise ValueError(f"Invalid msgpack payload: {e}") from e
+    raise ValueError("Unrecognised payload encoding")
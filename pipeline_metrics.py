@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Pipeline Metrics
+Counters and histograms for the ESP32 reader pipeline (serial bytes, framed
+lines, parse rejections, published messages, publish-to-PUBACK latency,
+paho in-flight depth), rendered in Prometheus text format on an optional
+local HTTP endpoint.
+
+The hot path only increments plain int attributes that already live on the
+reader, framer and parser; everything is gathered when /metrics is scraped.
+"""
+
+import sys
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Detik, dari LAN broker (~1ms) sampai broker publik yang lambat
+PUBACK_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INFERENCE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+# Publish tanpa PUBACK selama ini dianggap hilang (mid bisa dipakai ulang paho)
+PENDING_TIMEOUT = 60.0
+PENDING_PRUNE_SIZE = 1024
+
+
+class Histogram:
+    def __init__(self, buckets):
+        """Fixed-bucket histogram (cumulative counts are built at render time)"""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Slot terakhir = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimated q-quantile, linear within the bucket (like histogram_quantile); None if empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        total = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and total + count >= rank:
+                return lower + (bound - lower) * (rank - total) / count
+            total += count
+            lower = bound
+        return self.buckets[-1]  # Di atas bucket terbesar
+
+    def render(self, name, labels=''):
+        """Prometheus exposition lines for this histogram"""
+        sep = ',' if labels else ''
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound:g}"}} {total}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum:.6f}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class PipelineMetrics:
+    def __init__(self):
+        """Shared metrics for one MQTT client and the readers publishing through it"""
+        self.puback_latency = Histogram(PUBACK_BUCKETS)
+        self.inference_latency = Histogram(INFERENCE_BUCKETS)
+        self._pending = {}  # mid -> perf_counter() sebelum publish (hanya QoS > 0)
+        self._acked = {}  # mid -> perf_counter() ack yang datang sebelum after_publish
+        self._sending = 0  # publish() yang sedang berjalan
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def before_publish(self):
+        """Call right before handing a message to paho, returns the send time for after_publish()"""
+        with self._lock:
+            self._sending += 1
+        return time.perf_counter()
+
+    def after_publish(self, info, sent, qos=1):
+        """Call once publish() returned (info None if it failed); tracks QoS>0 until PUBACK
+
+        On a local broker the PUBACK can arrive before publish() returns; on_puback
+        keeps acks that arrive while a publish is in progress and they are matched here.
+        """
+        with self._lock:
+            self._sending -= 1
+            if qos and info is not None and info.mid:
+                acked = self._acked.pop(info.mid, None)
+                if acked is not None and acked >= sent:
+                    self.puback_latency.observe(acked - sent)
+                else:
+                    self._pending[info.mid] = sent
+                    if len(self._pending) > PENDING_PRUNE_SIZE:
+                        self._prune(sent)
+            if not self._sending:
+                # Ack yang tidak dicocokkan milik publish lain (mis. QoS 0)
+                self._acked.clear()
+
+    def on_puback(self, mid):
+        """Called from the paho network thread when a publish is acknowledged"""
+        now = time.perf_counter()
+        with self._lock:
+            sent = self._pending.pop(mid, None)
+            if sent is not None:
+                self.puback_latency.observe(now - sent)
+            elif self._sending:
+                self._acked[mid] = now  # Mungkin milik publish() yang belum kembali
+
+    def _prune(self, now):
+        """Forget publishes older than PENDING_TIMEOUT whose PUBACK never came (lock held)"""
+        cutoff = now - PENDING_TIMEOUT
+        for mid in [mid for mid, t in self._pending.items() if t < cutoff]:
+            del self._pending[mid]
+
+    def render(self, readers, client=None, spooler=None, publisher=None):
+        """Prometheus text for a list of (device, reader) pairs"""
+        out = []
+
+        def metric(name, kind, help_text, samples):
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                out.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+
+        devices = [(f'device="{name}"', reader) for name, reader in readers]
+
+        metric('esp32_serial_bytes_read_total', 'counter', 'Bytes read from the serial port',
+               [(d, r.bytes_read) for d, r in devices])
+        metric('esp32_lines_framed_total', 'counter', 'Complete lines produced by the framer',
+               [(d, r.framer.frames) for d, r in devices])
+        metric('esp32_framer_oversize_total', 'counter', 'Frames discarded for exceeding max_frame_size',
+               [(d, r.framer.oversize_frames) for d, r in devices])
+        metric('esp32_framer_resyncs_total', 'counter', 'Times the framer resynchronized on the frame marker',
+               [(d, r.framer.resyncs) for d, r in devices])
+        metric('esp32_frames_dropped_total', 'counter', 'Frames dropped because the publish stage fell behind',
+               [(d, r.dropped_frames) for d, r in devices])
+        metric('esp32_frame_queue_depth', 'gauge', 'Frames waiting for the parse/publish stage',
+               [(d, r.frame_queue.qsize()) for d, r in devices])
+        metric('esp32_samples_accepted_total', 'counter', 'Lines parsed into a sensor sample',
+               [(d, r.parser.accepted) for d, r in devices])
+        metric('esp32_parse_failures_total', 'counter', 'Rejected lines by reason',
+               [(f'{d},reason="{reason}"', count)
+                for d, r in devices for reason, count in sorted(r.parser.rejected.items())])
+        metric('esp32_messages_published_total', 'counter', 'MQTT messages handed to the client or spool',
+               [(d, r.messages_published) for d, r in devices])
+        metric('esp32_publish_errors_total', 'counter', 'Exceptions raised while publishing a sample',
+               [(d, r.publish_errors) for d, r in devices])
+        metric('esp32_deadband_suppressed_total', 'counter', 'Updates suppressed by report-by-exception',
+               [(d, r.deadband.suppressed) for d, r in devices if r.deadband is not None])
+
+        out.append('# HELP esp32_puback_latency_seconds Time from publish() to PUBACK (QoS 1)')
+        out.append('# TYPE esp32_puback_latency_seconds histogram')
+        out.extend(self.puback_latency.render('esp32_puback_latency_seconds'))
+
+        if self.inference_latency.count:
+            out.append('# HELP esp32_inference_latency_seconds In-process classification time per window')
+            out.append('# TYPE esp32_inference_latency_seconds histogram')
+            out.extend(self.inference_latency.render('esp32_inference_latency_seconds'))
+
+        if client is not None:
+            # paho 1.x tidak punya API publik untuk kedalaman antrian
+            inflight = len(getattr(client, '_out_messages', ()))
+            metric('esp32_mqtt_inflight_messages', 'gauge', 'Messages queued or awaiting PUBACK in paho',
+                   [('', inflight)])
+            metric('esp32_puback_pending', 'gauge', 'Tracked publishes still waiting for PUBACK',
+                   [('', len(self._pending))])
+        if publisher is not None:
+            metric('esp32_publish_outstanding', 'gauge', 'Messages handed to paho and not yet completed',
+                   [('', publisher.outstanding)])
+            metric('esp32_publish_queued', 'gauge', 'Messages waiting for a free in-flight slot',
+                   [('', publisher.queued)])
+            metric('esp32_publish_dropped_total', 'counter', 'Messages dropped by the backpressure policy',
+                   [('', publisher.dropped)])
+            metric('esp32_publish_coalesced_total', 'counter', 'Queued messages replaced by a newer payload for the same topic',
+                   [('', publisher.coalesced)])
+            metric('esp32_publish_blocked_seconds_total', 'counter', 'Time producers spent blocked on a full queue',
+                   [('', f'{publisher.blocked_seconds:.3f}')])
+        if spooler is not None:
+            metric('esp32_spool_messages', 'gauge', 'Messages held in the store-and-forward spool',
+                   [('', len(spooler.spool))])
+            metric('esp32_spool_evicted_total', 'counter', 'Spooled messages evicted by the byte budget',
+                   [('', spooler.spool.evicted)])
+        metric('esp32_uptime_seconds', 'gauge', 'Seconds since the reader started',
+               [('', f'{time.time() - self.started:.1f}')])
+        return '\n'.join(out) + '\n'
+
+
+class MetricsServer:
+    def __init__(self, render, host='127.0.0.1', port=9108):
+        """Serve render() as text/plain on http://host:port/metrics"""
+        self.render = render
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        render = self.render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                try:
+                    body = render().encode('utf-8')
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Silent - scrape setiap beberapa detik
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"[✗] Failed to start metrics endpoint on {self.host}:{self.port}: {e}", file=sys.stderr)
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        print(f"[✓] Metrics endpoint at http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
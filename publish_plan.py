@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+MQTT Publish Plan
+Topic layout for ESP32 sensor data, compiled once at startup into a flat
+table of (topic, extractor, qos, retain) entries so that publishing a sample
+is a single pass over the table. DeadbandFilter adds report-by-exception
+for the retained per-axis topics of a compiled plan.
+"""
+
+import json
+import math
+from array import array
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
+from payload_codec import get_encoders
+
+PublishEntry = namedtuple('PublishEntry', ['topic', 'extractor', 'qos', 'retain'])
+
+# (topic suffix, path dalam JSON ESP32, encoding, retain)
+# encoding 'json' = json.dumps, 'str' = str() untuk nilai scalar
+TOPIC_LAYOUT = [
+    ('all', (), 'json', False),
+    ('adxl345', ('adxl345',), 'json', False),
+    ('adxl345/ax', ('adxl345', 'ax'), 'str', True),
+    ('adxl345/ay', ('adxl345', 'ay'), 'str', True),
+    ('adxl345/az', ('adxl345', 'az'), 'str', True),
+    ('mpu6050', ('mpu6050',), 'json', False),
+    ('mpu6050/accel/x', ('mpu6050', 'accel', 'x'), 'str', True),
+    ('mpu6050/accel/y', ('mpu6050', 'accel', 'y'), 'str', True),
+    ('mpu6050/accel/z', ('mpu6050', 'accel', 'z'), 'str', True),
+    ('mpu6050/gyro/x', ('mpu6050', 'gyro', 'x'), 'str', True),
+    ('mpu6050/gyro/y', ('mpu6050', 'gyro', 'y'), 'str', True),
+    ('mpu6050/gyro/z', ('mpu6050', 'gyro', 'z'), 'str', True),
+    ('mpu6050/temp', ('mpu6050', 'temp'), 'str', True),
+    ('bmp280', ('bmp280',), 'json', False),
+    ('bmp280/temp', ('bmp280', 'temp'), 'str', True),
+    ('bmp280/pressure', ('bmp280', 'pressure'), 'str', True),
+    ('bmp280/altitude', ('bmp280', 'altitude'), 'str', True),
+]
+
+ENCODERS = {
+    'json': json.dumps,
+    'str': str,
+}
+
+
+def encode_document(data, memo):
+    """json.dumps(data), reusing top-level values already serialized in memo"""
+    parts = []
+    for key, value in data.items():
+        encoded = memo.get(key)
+        if encoded is None:
+            encoded = memo[key] = json.dumps(value)
+        parts.append(f"{json.dumps(key)}: {encoded}")
+    return "{" + ", ".join(parts) + "}"
+
+
+def make_extractor(path, encoding):
+    """Build extractor(data, memo) returning the encoded value at path, or None if missing
+
+    memo is a per-sample dict of serialized top-level values, so every
+    sub-document is serialized once even though it appears on two topics.
+    """
+    encode = ENCODERS[encoding]
+    if not path:
+        return encode_document if encoding == 'json' else (lambda data, memo: encode(data))
+
+    if len(path) == 1:
+        (k1,) = path
+        if encoding == 'json':
+            def extract(data, memo):
+                encoded = memo.get(k1)
+                if encoded is None:
+                    try:
+                        encoded = memo[k1] = encode(data[k1])
+                    except (KeyError, TypeError):
+                        return None
+                return encoded
+        else:
+            def extract(data, memo):
+                try:
+                    return encode(data[k1])
+                except (KeyError, TypeError):
+                    return None
+    elif len(path) == 2:
+        k1, k2 = path
+
+        def extract(data, memo):
+            try:
+                return encode(data[k1][k2])
+            except (KeyError, TypeError):
+                return None
+    else:
+        def extract(data, memo):
+            try:
+                for key in path:
+                    data = data[key]
+            except (KeyError, TypeError):
+                return None
+            return encode(data)
+
+    return extract
+
+
+def make_document_extractor(encode):
+    """Extractor for the full sample document in a non-JSON encoding"""
+    def extract(data, memo):
+        try:
+            return encode(data)
+        except (KeyError, TypeError):
+            return None
+
+    return extract
+
+
+def build_publish_plan(topic_prefix, exclude=(), qos=1, layout=TOPIC_LAYOUT,
+                       document_encoding='json'):
+    """Compile the topic layout into a list of PublishEntry
+
+    exclude: fnmatch patterns matched against the topic suffix,
+             e.g. 'mpu6050/gyro/*' or 'bmp280/altitude'
+    document_encoding: payload_codec encoding for the full sample document
+             ('all'); per-sensor and per-axis topics stay JSON/text for the
+             dashboard
+    """
+    encode_document = get_encoders(document_encoding)[0]
+    plan = []
+    for suffix, path, encoding, retain in layout:
+        if any(fnmatchcase(suffix, pattern) for pattern in exclude):
+            continue
+        plan.append(PublishEntry(
+            topic=f"{topic_prefix}/{suffix}",
+            extractor=(make_document_extractor(encode_document)
+                       if not path and document_encoding != 'json'
+                       else make_extractor(path, encoding)),
+            qos=qos,
+            retain=retain,
+        ))
+    return plan
+
+
+# ==================== REPORT BY EXCEPTION ====================
+
+DEADBAND_NONE = 0
+DEADBAND_ABSOLUTE = 1
+DEADBAND_PERCENT = 2
+
+
+def parse_deadband(spec):
+    """Parse 'PATTERN=VALUE' (absolute) or 'PATTERN=VALUE%' (percent of last value)"""
+    pattern, sep, value = spec.partition('=')
+    if not sep or not pattern:
+        raise ValueError(f"Invalid deadband '{spec}', expected PATTERN=VALUE or PATTERN=VALUE%")
+    value = value.strip()
+    if value.endswith('%'):
+        return pattern, DEADBAND_PERCENT, float(value[:-1]) / 100.0
+    return pattern, DEADBAND_ABSOLUTE, float(value)
+
+
+class DeadbandFilter:
+    def __init__(self, plan, topic_prefix, deadbands, heartbeat=60.0):
+        """Per-entry deadbands for the retained scalar topics of a plan
+
+        deadbands: list of (pattern, mode, threshold); first match wins
+        heartbeat: max seconds a filtered topic may stay silent
+        """
+        n = len(plan)
+        self.heartbeat = heartbeat
+        self._mode = array('b', bytes(n))
+        self._threshold = array('d', bytes(8 * n))
+        self._last_value = array('d', [math.nan]) * n
+        self._last_time = array('d', bytes(8 * n))
+        self.published = 0
+        self.suppressed = 0
+
+        skip = len(topic_prefix) + 1
+        for i, entry in enumerate(plan):
+            if not entry.retain:
+                continue  # Dokumen stream tidak difilter
+            suffix = entry.topic[skip:]
+            for pattern, mode, threshold in deadbands:
+                if fnmatchcase(suffix, pattern):
+                    self._mode[i] = mode
+                    self._threshold[i] = threshold
+                    break
+
+    @property
+    def active(self):
+        return any(self._mode)
+
+    def check(self, index, payload, now):
+        """True if the entry at index should be published now"""
+        mode = self._mode[index]
+        if mode == DEADBAND_NONE:
+            return True
+        value = float(payload)
+        last = self._last_value[index]
+        delta = abs(value - last)  # NaN jika belum pernah publish
+        if mode == DEADBAND_PERCENT:
+            moved = not delta <= self._threshold[index] * abs(last)
+        else:
+            moved = not delta <= self._threshold[index]
+        if moved or now - self._last_time[index] >= self.heartbeat:
+            self._last_value[index] = value
+            self._last_time[index] = now
+            self.published += 1
+            return True
+        self.suppressed += 1
+        return False
+
+    def suppression_ratio(self):
+        """Fraction of filtered-topic updates that were suppressed"""
+        total = self.published + self.suppressed
+        return self.suppressed / total if total else 0.0
@@ -2,49 +2,78 @@
 """
 Training Data Recorder for Edge Impulse
 Records sensor data from ESP32 via serial and saves in Edge Impulse JSON format
+
+Samples are kept in a float32 SampleBuffer and streamed to a chunk file
+(NDJSON or float32, see recording_writer.py) while recording; the Edge
+Impulse JSON is serialized from the buffer at the end. An interrupted
+recording keeps everything written so far.
+
+Session mode records a whole schedule (label, duration, repeats, pause)
+over one serial connection and writes one file per segment plus a
+manifest.json.
+
+Multi-node mode records several ports at once (one reader thread each),
+maps every node's device timestamps to the host clock and writes one
+aligned multi-channel recording with sensors named <node>.<axis>.
+
+The source can also be the reader's live MQTT stream instead of a serial
+port (mqtt://broker[:port][/topic], see mqtt_tap.py), so recording does not
+take the production line offline.
 """
 
 import serial
 import time
+import argparse
 import json
-import sys
+import os
+import threading
+from collections import Counter
 from datetime import datetime
 
+from mqtt_tap import MQTTTap
+from recording_writer import EXTENSIONS, FORMATS, ChunkWriter, export_edge_impulse, write_edge_impulse
+from sample_buffer import SampleBuffer, np
+from sensor_parser import IMU_FIELDS, IMU_SLICE, SensorLineParser, format_rejected
+from stream_resampler import align, format_stats, monotonic_mask
+
 class TrainingDataRecorder:
-    def __init__(self, port, duration_seconds=30, label="Unknown"):
+    def __init__(self, port, duration_seconds=30, label="Unknown", chunk_path=None, fmt='ndjson', parser=None):
         self.port = port
         self.duration = duration_seconds
         self.label = label
-        self.samples = []
         self.interval_ms = 100  # 10Hz sampling rate
+        self.fmt = fmt
+        self.chunk_path = chunk_path or f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{EXTENSIONS[fmt]}"
+        self.writer = None
+        self.buffer = SampleBuffer.for_duration(duration_seconds, self.interval_ms)
+        self.sample_count = 0
+        self.interrupted = False
+        self.timing = None  # Statistik interval/jitter (diisi saat export)
+        self.started = None
+        self.elapsed = 0.0
+        self.parser = parser or SensorLineParser()  # Bisa dibagi antar segmen session
         
     def parse_serial_line(self, line):
-        """Parse serial line and extract sensor data"""
+        """Parse serial line, returns (device timestamp ms, 9 IMU values) or None"""
+        # Old format: [✓] TS:123456 | ADXL345(ax:0.04,ay:10.51,az:-1.61) | MPU6050(...)
+        if line.lstrip().startswith('[✓]'):
+            return self.parse_legacy_line(line)
+        
+        # JSON format (current firmware) via shared parser
+        values = self.parser.parse(line)
+        if values is None:
+            return None
+        return values[0], list(values[IMU_SLICE])
+    
+    def parse_legacy_line(self, line):
+        """Parse the old text output format"""
         try:
-            # Try JSON format first (current format)
-            if line.strip().startswith('{'):
-                data = json.loads(line)
-                
-                # Extract from JSON format
-                sample = [
-                    data['adxl345']['ax'],          # ax1
-                    data['adxl345']['ay'],          # ay1
-                    data['adxl345']['az'],          # az1
-                    data['mpu6050']['accel']['x'],  # ax2
-                    data['mpu6050']['accel']['y'],  # ay2
-                    data['mpu6050']['accel']['z'],  # az2
-                    data['mpu6050']['gyro']['x'],   # gx
-                    data['mpu6050']['gyro']['y'],   # gy
-                    data['mpu6050']['gyro']['z']    # gz
-                ]
-                
-                return sample
-            
-            # Fallback to old format
-            # Example line: [✓] TS:123456 | ADXL345(ax:0.04,ay:10.51,az:-1.61) | MPU6050(...)
-            
-            if '[✓]' not in line:
-                return None
+            # Timestamp device; tanpa TS pakai waktu host
+            ts_start = line.find('TS:')
+            if ts_start >= 0:
+                timestamp = int(line[ts_start + 3:line.find(' ', ts_start)])
+            else:
+                timestamp = int(time.time() * 1000)
             
             # Extract ADXL345 data
             adxl_start = line.find('ADXL345(') + 8
@@ -82,10 +111,10 @@ class TrainingDataRecorder:
                 mpu_parts['gz']    # gz
             ]
             
-            return sample
+            return timestamp, sample
             
-        except Exception as e:
-            # Silent fail for non-parseable lines
+        except (ValueError, KeyError):
+            self.parser.rejected['bad_legacy_line'] += 1
             return None
     
     def record(self):
@@ -96,117 +125,124 @@ class TrainingDataRecorder:
         print(f"⏱️  Duration: {self.duration} seconds")
         print(f"📊 Sample Rate: {1000/self.interval_ms:.0f}Hz ({self.interval_ms}ms)")
         print(f"🔌 Port: {self.port}")
+        print(f"💾 Chunk file: {self.chunk_path} ({self.fmt})")
         print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         print(f"")
         
         try:
-            # Open serial port
-            ser = serial.Serial(self.port, 115200, timeout=1)
-            print(f"✅ Serial port opened")
-            print(f"")
-            
-            # Wait for stable data
-            print(f"⏳ Waiting for stable sensor data...")
-            stable_count = 0
-            while stable_count < 5:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                sample = self.parse_serial_line(line)
-                if sample:
-                    stable_count += 1
-                    print(f"   Stable reading {stable_count}/5")
-            
-            print(f"")
-            print(f"🔴 RECORDING STARTED")
-            print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-            
-            start_time = time.time()
-            sample_count = 0
-            last_progress = 0
-            
-            while (time.time() - start_time) < self.duration:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                
-                if line:
-                    sample = self.parse_serial_line(line)
-                    if sample:
-                        self.samples.append(sample)
-                        sample_count += 1
-                        
-                        # Show progress every 10%
-                        elapsed = time.time() - start_time
-                        progress = int((elapsed / self.duration) * 100)
-                        
-                        if progress >= last_progress + 10:
-                            print(f"📊 {progress}% - {sample_count} samples - {elapsed:.1f}s / {self.duration}s")
-                            last_progress = progress
-            
-            ser.close()
-            
-            print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-            print(f"✅ RECORDING COMPLETED")
-            print(f"")
-            print(f"📊 Total samples: {sample_count}")
-            print(f"⏱️  Actual duration: {time.time() - start_time:.1f}s")
-            print(f"📈 Average rate: {sample_count / (time.time() - start_time):.1f}Hz")
-            print(f"")
-            
+            source = self.open_source()
+            self.capture(source)
+            source.close()
             return True
             
         except serial.SerialException as e:
             print(f"❌ Serial error: {e}")
             return False
         except KeyboardInterrupt:
-            print(f"\n⚠️  Recording interrupted by user")
-            return False
+            # Sample yang sudah ditulis tetap valid
+            self.interrupted = True
+            print(f"\n⚠️  Recording interrupted by user ({self.sample_count} samples kept)")
+            return self.sample_count > 0
+    
+    def open_source(self, stop_event=None):
+        """Open the serial port (or MQTT tap) and wait for 5 stable readings
+
+        Returns None (source closed) if stop_event is set while waiting.
+        """
+        if self.port.startswith('mqtt://'):
+            source = MQTTTap.from_url(self.port, parser=self.parser)
+            if not source.start():
+                raise serial.SerialException(f"could not subscribe to {self.port}")
+            print(f"✅ Subscribed to {source.topic} on {source.broker}:{source.port}")
+        else:
+            source = serial.Serial(self.port, 115200, timeout=1)
+            print(f"✅ Serial port opened")
+        print(f"")
+        
+        # Wait for stable data
+        print(f"⏳ Waiting for stable sensor data...")
+        stable_count = 0
+        while stable_count < 5:
+            if stop_event is not None and stop_event.is_set():
+                source.close()
+                return None
+            sample = self.read_sample(source)
+            if sample:
+                stable_count += 1
+                print(f"   Stable reading {stable_count}/5")
+        return source
+    
+    def read_sample(self, source):
+        """Next (timestamp, values) from the source, None on timeout or a rejected line"""
+        if isinstance(source, MQTTTap):
+            return source.read_sample()
+        line = source.readline().decode('utf-8', errors='ignore').strip()
+        return self.parse_serial_line(line) if line else None
+    
+    def capture(self, source):
+        """Record self.duration seconds from an open source into the buffer and chunk file"""
+        print(f"")
+        print(f"🔴 RECORDING STARTED")
+        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        
+        self.writer = ChunkWriter(self.chunk_path, self.fmt, header={
+            'label': self.label, 'interval_ms': self.interval_ms, 'port': self.port})
+        self.started = time.time()
+        start_time = time.time()
+        last_progress = 0
+        
+        try:
+            while (time.time() - start_time) < self.duration:
+                parsed = self.read_sample(source)
+                if parsed:
+                    timestamp, sample = parsed
+                    self.buffer.append(timestamp, sample)
+                    self.writer.append(timestamp, sample)
+                    self.sample_count += 1
+                    
+                    # Show progress every 10%
+                    elapsed = time.time() - start_time
+                    progress = int((elapsed / self.duration) * 100)
+                    
+                    if progress >= last_progress + 10:
+                        print(f"📊 {progress}% - {self.sample_count} samples - {elapsed:.1f}s / {self.duration}s")
+                        last_progress = progress
+        finally:
+            self.writer.close()
+            self.elapsed = time.time() - start_time
+        
+        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print(f"✅ RECORDING COMPLETED")
+        print(f"")
+        print(f"📊 Total samples: {self.sample_count}")
+        print(f"⏱️  Actual duration: {self.elapsed:.1f}s")
+        print(f"📈 Average rate: {self.sample_count / self.elapsed:.1f}Hz")
+        if self.parser.rejected_total:
+            print(f"⚠️  Rejected lines: {format_rejected(self.parser.rejected)}")
+        print(f"")
     
     def save_to_json(self, filename):
-        """Save recorded data in Edge Impulse JSON format"""
-        if not self.samples:
+        """Serialize the buffer to Edge Impulse JSON (resampled to interval_ms)"""
+        if not self.sample_count:
             print(f"❌ No samples to save!")
             return False
         
-        # Flatten samples into single array
-        values = []
-        for sample in self.samples:
-            values.extend(sample)
-        
-        # Create Edge Impulse JSON structure
-        data = {
-            "protected": {
-                "ver": "v1",
-                "alg": "HS256",
-                "iat": int(time.time())
-            },
-            "signature": "0" * 50,  # Dummy signature
-            "payload": {
-                "device_type": "EDGE_IMPULSE_UPLOADER",
-                "interval_ms": self.interval_ms,
-                "sensors": [
-                    {"name": "ax1", "units": "N/A"},
-                    {"name": "ay1", "units": "N/A"},
-                    {"name": "az1", "units": "N/A"},
-                    {"name": "ax2", "units": "N/A"},
-                    {"name": "ay2", "units": "N/A"},
-                    {"name": "az2", "units": "N/A"},
-                    {"name": "gx", "units": "N/A"},
-                    {"name": "gy", "units": "N/A"},
-                    {"name": "gz", "units": "N/A"}
-                ],
-                "values": values
-            }
-        }
-        
         try:
-            with open(filename, 'w') as f:
-                json.dump(data, f, indent=2)
+            if np is not None:
+                count, self.timing = write_edge_impulse(filename, self.buffer.timestamps(), self.buffer.values(),
+                                                        self.interval_ms)
+            else:
+                count, self.timing = export_edge_impulse(self.chunk_path, filename, self.interval_ms)
             
             print(f"✅ Data saved to: {filename}")
             print(f"")
             print(f"📦 File details:")
-            print(f"   Samples: {len(self.samples)}")
-            print(f"   Values: {len(values)}")
-            print(f"   Duration: {len(self.samples) * self.interval_ms / 1000:.1f}s")
+            print(f"   Samples: {count} (recorded {self.sample_count})")
+            if self.timing is not None:
+                print(f"   Device timing: {format_stats(self.timing)}")
+            print(f"   Duration: {count * self.interval_ms / 1000:.1f}s")
             print(f"   Label: {self.label}")
+            print(f"   Chunk file: {self.chunk_path}")
             print(f"")
             print(f"✨ Ready to upload to Edge Impulse!")
             
@@ -216,30 +252,367 @@ class TrainingDataRecorder:
             print(f"❌ Save error: {e}")
             return False
 
-def main():
-    if len(sys.argv) < 3:
-        print(f"Usage: {sys.argv[0]} <serial_port> <label> [duration_seconds]")
+class MultiNodeRecorder:
+    def __init__(self, nodes, duration_seconds=30, label="Unknown", fmt='ndjson', base=None, ready_timeout=30.0):
+        """nodes: list of (port or mqtt:// URL, node name)
+
+        ready_timeout: max seconds for every node to open and give stable readings
+        """
+        self.duration = duration_seconds
+        self.ready_timeout = ready_timeout
+        self.label = label
+        self.interval_ms = 100
+        self.base = base or f"{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.names = [name for _, name in nodes]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Node names must be unique: {', '.join(self.names)}")
+        # Satu recorder (parser, buffer, chunk file) per node, tidak ada state bersama
+        self.nodes = [TrainingDataRecorder(port, duration_seconds, label, fmt=fmt,
+                                           chunk_path=f"{self.base}_{name}{EXTENSIONS[fmt]}")
+                      for port, name in nodes]
+        # Per node: [[index sample pertama, host_ms - device_ms]] per segmen; segmen baru
+        # setiap ESP32 reset (timestamp mundur), offset = latency terkecil di segmen
+        self.offsets = [[[0, None]] for _ in nodes]
+        self.opened = [False] * len(nodes)
+        self.ready = threading.Barrier(len(nodes) + 1)
+        self.stop_event = threading.Event()
+        self.errors = []
+        self.timestamps = None
+        self.values = None
+    
+    def _node_loop(self, index):
+        """Open, wait for all nodes, then read until stopped (one thread per node)"""
+        node = self.nodes[index]
+        source = None
+        try:
+            source = node.open_source(self.stop_event)
+            if source is None:
+                return  # Dihentikan sebelum data stabil
+            self.opened[index] = True
+            self.ready.wait(self.ready_timeout)
+            node.writer = ChunkWriter(node.chunk_path, node.fmt, header={
+                'label': self.label, 'interval_ms': self.interval_ms, 'port': node.port, 'node': self.names[index]})
+            node.started = time.time()
+            segments = self.offsets[index]
+            last_timestamp = None
+            while not self.stop_event.is_set():
+                parsed = node.read_sample(source)
+                if not parsed:
+                    continue
+                host_ms = time.time() * 1000
+                timestamp, sample = parsed
+                if last_timestamp is not None and timestamp < last_timestamp:
+                    segments.append([len(node.buffer), None])  # Device reset: clock offset baru
+                last_timestamp = timestamp
+                node.buffer.append(timestamp, sample)
+                node.writer.append(timestamp, sample)
+                node.sample_count += 1
+                # Offset clock device -> host dari sample dengan delay terkecil
+                segment = segments[-1]
+                if segment[1] is None or host_ms - timestamp < segment[1]:
+                    segment[1] = host_ms - timestamp
+        except threading.BrokenBarrierError:
+            pass
+        except Exception as e:
+            # Apapun errornya, node lain dan record() tidak boleh menunggu selamanya
+            self.errors.append(f"{self.names[index]}: {e}")
+            self.ready.abort()
+            self.stop_event.set()
+        finally:
+            if node.writer is not None:
+                node.writer.close()
+            if source is not None:
+                source.close()
+    
+    def record(self):
+        print(f"🎙️  Multi-Node Training Data Recorder")
+        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print(f"📝 Label: {self.label}")
+        print(f"⏱️  Duration: {self.duration} seconds")
+        for node, name in zip(self.nodes, self.names):
+            print(f"🔌 {name}: {node.port}")
+        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         print(f"")
-        print(f"Example:")
-        print(f"  {sys.argv[0]} /dev/ttyUSB0 Normal 30")
-        print(f"  {sys.argv[0]} /dev/ttyUSB0 Drop_Voltage 30")
-        sys.exit(1)
+        
+        threads = [threading.Thread(target=self._node_loop, args=(i,), name=f"node-{name}", daemon=True)
+                   for i, name in enumerate(self.names)]
+        for thread in threads:
+            thread.start()
+        try:
+            # Mulai bersamaan setelah semua node stabil
+            self.ready.wait(self.ready_timeout)
+            print(f"")
+            print(f"🔴 RECORDING STARTED ({len(self.nodes)} nodes)")
+            start_time = time.time()
+            while time.time() - start_time < self.duration and not self.stop_event.is_set():
+                time.sleep(0.5)
+            print(f"✅ RECORDING COMPLETED")
+        except threading.BrokenBarrierError:
+            if not self.errors:
+                waiting = [name for name, opened in zip(self.names, self.opened) if not opened]
+                self.errors.append(f"{', '.join(waiting) or 'all'}: no stable data within {self.ready_timeout:g}s")
+        except KeyboardInterrupt:
+            print(f"\n⚠️  Recording interrupted by user")
+        finally:
+            self.stop_event.set()
+            self.ready.abort()  # Lepaskan node yang masih menunggu start
+            for thread in threads:
+                thread.join(timeout=5)
+        
+        for error in self.errors:
+            print(f"❌ Node {error}")
+        for node, name in zip(self.nodes, self.names):
+            print(f"📊 {name}: {node.sample_count} samples, chunk file {node.chunk_path}")
+        return not self.errors and all(node.sample_count > 1 for node in self.nodes)
+    
+    def align(self):
+        """Map every node to the host clock and resample onto one shared grid"""
+        if np is None:
+            raise ValueError("Multi-node alignment requires 'pip install numpy'")
+        streams = []
+        for node, name, segments in zip(self.nodes, self.names, self.offsets):
+            host = node.buffer.timestamps().astype(np.float64)
+            ends = [start for start, _ in segments[1:]] + [len(host)]
+            for (start, offset), end in zip(segments, ends):
+                host[start:end] += offset
+            if len(segments) > 1:
+                print(f"⚠️  {name}: {len(segments) - 1} device reset(s), each segment mapped separately")
+            dropped = len(host) - int(monotonic_mask(host).sum())
+            if dropped:
+                print(f"⚠️  {name}: {dropped} samples out of order on the host clock, skipped")
+            streams.append((host, node.buffer.values()))
+        self.timestamps, self.values = align(streams, self.interval_ms)
+        return len(self.timestamps)
     
-    port = sys.argv[1]
-    label = sys.argv[2]
-    duration = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    def save_to_json(self, filename):
+        """Write the aligned recording as one multi-channel Edge Impulse file"""
+        if np is None:
+            print(f"❌ Multi-node alignment requires 'pip install numpy' "
+                  f"(chunk files kept: {', '.join(node.chunk_path for node in self.nodes)})")
+            return False
+        count = self.align()
+        if not count:
+            print(f"❌ Nodes do not overlap in time, nothing to save!")
+            return False
+        sensors = [f"{name}.{axis}" for name in self.names for axis in IMU_FIELDS]
+        write_edge_impulse(filename, self.timestamps, self.values, self.interval_ms, sensors, resample_grid=False)
+        print(f"✅ Data saved to: {filename}")
+        print(f"")
+        print(f"📦 File details:")
+        print(f"   Samples: {count} aligned ({', '.join(str(n.sample_count) for n in self.nodes)} recorded)")
+        print(f"   Channels: {len(sensors)} ({', '.join(self.names)})")
+        print(f"   Duration: {count * self.interval_ms / 1000:.1f}s")
+        print(f"   Label: {self.label}")
+        return True
+
+
+def parse_schedule(spec, pause=5.0):
+    """Schedule from a JSON file or "LABEL:SECONDS[xREPEATS],..." -> list of dicts
+
+    JSON: [{"label": "Normal", "duration": 30, "repeats": 3, "pause": 5}, ...]
+    """
+    if os.path.isfile(spec):
+        with open(spec) as f:
+            entries = json.load(f)
+    else:
+        entries = []
+        for item in spec.split(','):
+            try:
+                label, rest = item.strip().rsplit(':', 1)
+                duration, _, repeats = rest.partition('x')
+                entries.append({'label': label, 'duration': float(duration), 'repeats': int(repeats or 1)})
+            except ValueError:
+                raise ValueError(f"Invalid schedule entry '{item}' (expected LABEL:SECONDS[xREPEATS])")
     
-    # Create recorder
-    recorder = TrainingDataRecorder(port, duration, label)
+    schedule = []
+    for entry in entries:
+        if not entry.get('label') or entry.get('duration', 0) <= 0:
+            raise ValueError(f"Invalid schedule entry: {entry}")
+        schedule.append({
+            'label': entry['label'],
+            'duration': entry['duration'],
+            'repeats': int(entry.get('repeats', 1)),
+            'pause': float(entry.get('pause', pause)),
+        })
+    return schedule
+
+
+class RecordingSession:
+    def __init__(self, port, schedule, output_dir=None, fmt='ndjson'):
+        """Record every schedule entry over one warm serial connection"""
+        self.port = port
+        self.schedule = schedule
+        self.fmt = fmt
+        self.output_dir = output_dir or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.manifest_path = os.path.join(self.output_dir, 'manifest.json')
+        self.parser = SensorLineParser()  # Satu parser (dan statistiknya) untuk semua segmen
+        self.input = TrainingDataRecorder(port, parser=self.parser)
+        self.segments = []
+        self.label_counts = Counter()  # Nomor file per label (label boleh muncul berulang di schedule)
+        self.interrupted = False
     
-    # Record data
-    if recorder.record():
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{label}_{timestamp}.json"
+    def write_manifest(self):
+        """Rewrite manifest.json (after every segment, so a crash keeps the finished ones)"""
+        manifest = {
+            'port': self.port,
+            'format': self.fmt,
+            'schedule': self.schedule,
+            'segments': self.segments,
+            'rejected_lines': dict(self.parser.rejected),
+            'interrupted': self.interrupted,
+        }
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+    
+    def idle(self, source, seconds):
+        """Keep reading (and discarding) during a pause so no stale lines pile up"""
+        end = time.time() + seconds
+        while time.time() < end:
+            self.input.read_sample(source)
+    
+    def record_segment(self, source, entry, repeat):
+        self.label_counts[entry['label']] += 1
+        name = f"{entry['label']}_{self.label_counts[entry['label']]:02d}"
+        recorder = TrainingDataRecorder(self.port, entry['duration'], entry['label'], fmt=self.fmt,
+                                        chunk_path=os.path.join(self.output_dir, name + EXTENSIONS[self.fmt]),
+                                        parser=self.parser)
+        print(f"🎬 Segment {len(self.segments) + 1}: {entry['label']} "
+              f"(repeat {repeat + 1}/{entry['repeats']}, {entry['duration']}s)")
+        try:
+            recorder.capture(source)
+        except KeyboardInterrupt:
+            self.interrupted = True
+            print(f"\n⚠️  Session interrupted by user ({recorder.sample_count} samples kept)")
+        
+        if recorder.sample_count:
+            json_path = os.path.join(self.output_dir, name + '.json')
+            recorder.save_to_json(json_path)
+            self.segments.append({
+                'label': entry['label'],
+                'repeat': repeat + 1,
+                'file': os.path.basename(json_path),
+                'chunk': os.path.basename(recorder.chunk_path),
+                'started': round(recorder.started, 3),
+                'duration': round(recorder.elapsed, 3),
+                'samples': recorder.sample_count,
+                'timing': recorder.timing,
+                'complete': not self.interrupted,
+            })
+        self.write_manifest()
+    
+    def run(self):
+        total = sum(e['duration'] * e['repeats'] for e in self.schedule)
+        print(f"🎙️  Training Data Recording Session")
+        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        for entry in self.schedule:
+            print(f"📝 {entry['label']}: {entry['repeats']} x {entry['duration']}s (pause {entry['pause']}s)")
+        print(f"⏱️  Recording time: {total:.0f} seconds")
+        print(f"🔌 Port: {self.port}")
+        print(f"📁 Output: {self.output_dir}")
+        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        print(f"")
         
-        # Save to file
-        recorder.save_to_json(filename)
+        os.makedirs(self.output_dir, exist_ok=True)
+        source = None
+        try:
+            source = self.input.open_source()
+            for index, entry in enumerate(self.schedule):
+                for repeat in range(entry['repeats']):
+                    self.record_segment(source, entry, repeat)
+                    if self.interrupted:
+                        return False
+                    last = index == len(self.schedule) - 1 and repeat == entry['repeats'] - 1
+                    if entry['pause'] > 0 and not last:
+                        print(f"⏸️  Pause {entry['pause']}s")
+                        self.idle(source, entry['pause'])
+            return True
+        except serial.SerialException as e:
+            print(f"❌ Serial error: {e}")
+            return False
+        except KeyboardInterrupt:
+            self.interrupted = True
+            print(f"\n⚠️  Session interrupted by user")
+            self.write_manifest()
+            return False
+        finally:
+            if source is not None:
+                source.close()
+            print(f"📋 Manifest: {self.manifest_path} ({len(self.segments)} segments)")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Record ESP32 training data in Edge Impulse JSON format',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 record_training_data.py /dev/ttyUSB0 Normal 30
+  python3 record_training_data.py /dev/ttyUSB0 Drop_Voltage 600 --format f32
+  python3 record_training_data.py --export Normal_20251211_185218.ndjson
+  python3 record_training_data.py /dev/ttyUSB0 --session "Normal:30x5,Drop_Voltage:30x5" --pause 10
+  python3 record_training_data.py /dev/ttyUSB0 --session schedule.json --output-dir dataset/day1
+  python3 record_training_data.py mqtt://localhost/iiot/sensors/batch Normal 60
+  python3 record_training_data.py /dev/ttyUSB0=motor,/dev/ttyUSB1=pump Drop_Voltage 60
+        """
+    )
+    parser.add_argument('port', nargs='?',
+                        help='Serial port (e.g., /dev/ttyUSB0) or the reader\'s MQTT stream (mqtt://broker[:port][/topic]); '
+                             'several as PORT[=NAME],PORT[=NAME],... for a synchronized multi-node recording')
+    parser.add_argument('label', nargs='?', help='Label for this recording (e.g., Normal)')
+    parser.add_argument('duration', nargs='?', type=int, default=30, help='Duration in seconds (default: 30)')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson',
+                        help='Chunk file format written while recording (default: ndjson)')
+    parser.add_argument('--session', metavar='SCHEDULE',
+                        help='Record a schedule over one connection: "LABEL:SECONDS[xREPEATS],..." or a JSON file')
+    parser.add_argument('--pause', type=float, default=5.0, help='Seconds between session segments (default: 5)')
+    parser.add_argument('--output-dir', help='Session output directory (default: session_<timestamp>)')
+    parser.add_argument('--export', metavar='CHUNK_FILE',
+                        help='Only convert an existing chunk file (e.g. from an interrupted run) to Edge Impulse JSON')
+    args = parser.parse_args()
+    
+    if args.export:
+        filename = os.path.splitext(args.export)[0] + '.json'
+        count, timing = export_edge_impulse(args.export, filename)
+        print(f"✅ {count} samples exported to: {filename}")
+        if timing is not None:
+            print(f"   Device timing: {format_stats(timing)}")
+        return
+    
+    if args.session:
+        if not args.port:
+            parser.error('port is required')
+        try:
+            schedule = parse_schedule(args.session, args.pause)
+        except ValueError as e:
+            parser.error(str(e))
+        RecordingSession(args.port, schedule, args.output_dir, args.format).run()
+        return
+    
+    if not args.port or not args.label:
+        parser.error('port and label are required')
+    
+    # Create recorder (nama file dengan timestamp)
+    base = f"{args.label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if ',' in args.port:
+        nodes = []
+        for i, spec in enumerate(args.port.split(',')):
+            port, _, name = spec.partition('=')
+            nodes.append((port, name or (f"node{i}" if port.startswith('mqtt://') else os.path.basename(port))))
+        try:
+            recorder = MultiNodeRecorder(nodes, args.duration, args.label, args.format, base)
+        except ValueError as e:
+            parser.error(str(e))
+        if recorder.record():
+            recorder.save_to_json(f"{base}.json")
+        return
+    
+    recorder = TrainingDataRecorder(args.port, args.duration, args.label,
+                                    chunk_path=base + EXTENSIONS[args.format], fmt=args.format)
+    
+    # Record data, lalu export ke JSON (juga setelah Ctrl+C)
+    if recorder.record():
+        recorder.save_to_json(f"{base}.json")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Streaming Recording Writer
+Appends recorded samples to disk in chunks while the recorder runs, so a
+long capture does not have to live in memory and an interrupted session
+(Ctrl+C, crash, power loss) still leaves a readable file.
+
+Formats:
+    ndjson  first line is the JSON header, then one JSON array per sample:
+            [timestamp, ax1, ay1, az1, ax2, ay2, az2, gx, gy, gz]
+    f32     MAGIC, uint32 header length, JSON header (padded to 4 bytes),
+            then fixed 40-byte records: uint32 timestamp + 9 float32
+            (little endian)
+
+Every chunk is flushed and fsync'ed; a partial last line/record left by a
+crash is ignored when reading. write_edge_impulse() serializes arrays (e.g.
+a SampleBuffer) to Edge Impulse JSON in one pass, resampled to interval_ms;
+export_edge_impulse() does the same for a chunk file.
+"""
+
+import json
+import os
+import struct
+import time
+
+from sensor_parser import IMU_FIELDS
+from stream_resampler import DEFAULT_INTERVAL_MS, resample, timing_stats
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FORMATS = ('ndjson', 'f32')
+EXTENSIONS = {'ndjson': '.ndjson', 'f32': '.f32'}
+MAGIC = b'IIOTREC1'
+RECORD = struct.Struct('<I9f')
+EXPORT_CHUNK = 4096  # Baris per json.dumps saat export
+
+
+def _f32_dtype():
+    return np.dtype([('timestamp', '<u4'), ('values', '<f4', (len(IMU_FIELDS),))])
+
+
+class ChunkWriter:
+    def __init__(self, path, fmt='ndjson', header=None, chunk_samples=100):
+        """Open path for writing; header is stored in the file (label, interval_ms, ...)"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown recording format: {fmt} (choose from {', '.join(FORMATS)})")
+        self.path = path
+        self.fmt = fmt
+        self.chunk_samples = chunk_samples
+        self.header = {'format': fmt, 'sensors': list(IMU_FIELDS), 'started': time.time()}
+        self.header.update(header or {})
+        self.count = 0
+        self.bytes_written = 0
+        self._pending = []
+        self._file = open(path, 'wb')
+        self._write(self._encode_header())
+
+    def _encode_header(self):
+        header = json.dumps(self.header).encode('utf-8')
+        if self.fmt == 'ndjson':
+            return header + b'\n'
+        # Padding agar record mulai di offset kelipatan 4 (bisa di-mmap)
+        header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 4)
+        return MAGIC + struct.pack('<I', len(header)) + header
+
+    def _write(self, data):
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.bytes_written += len(data)
+
+    def append(self, timestamp, sample):
+        """Buffer one sample, written when the chunk is full"""
+        self._pending.append((timestamp, sample))
+        if len(self._pending) >= self.chunk_samples:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        if self.fmt == 'ndjson':
+            data = ''.join(json.dumps([ts] + list(sample)) + '\n' for ts, sample in self._pending).encode('utf-8')
+        else:
+            data = b''.join(RECORD.pack(int(ts) & 0xFFFFFFFF, *sample) for ts, sample in self._pending)
+        self.count += len(self._pending)
+        self._pending = []
+        self._write(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(path):
+    """(header dict, data offset) of a chunk file"""
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic == MAGIC:
+            length, = struct.unpack('<I', f.read(4))
+            return json.loads(f.read(length)), len(MAGIC) + 4 + length
+        f.seek(0)
+        line = f.readline()
+    try:
+        header = json.loads(line)
+    except ValueError:
+        header = None
+    # File JSON satu baris (mis. Edge Impulse) juga lolos json.loads
+    if not isinstance(header, dict) or header.get('format') not in FORMATS:
+        raise ValueError(f"{path} is not a recording chunk file")
+    return header, len(line)
+
+
+def iter_samples(path):
+    """Yield (timestamp, values) from a chunk file, skipping a truncated tail"""
+    header, offset = read_header(path)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        if header['format'] == 'f32':
+            while True:
+                data = f.read(RECORD.size * 1024)
+                usable = len(data) - len(data) % RECORD.size
+                for record in RECORD.iter_unpack(data[:usable]):
+                    yield record[0], record[1:]
+                if len(data) < RECORD.size * 1024:
+                    return
+        else:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    return  # Baris terakhir terpotong
+                yield row[0], row[1:]
+
+
+def load_arrays(path):
+    """(header, timestamps (N,), values (N, 9)) as NumPy arrays"""
+    if np is None:
+        raise ValueError("Loading recordings as arrays requires 'pip install numpy'")
+    header, offset = read_header(path)
+    if header['format'] == 'f32':
+        dtype = _f32_dtype()
+        count = (os.path.getsize(path) - offset) // dtype.itemsize
+        records = np.fromfile(path, dtype=dtype, count=count, offset=offset)
+        return header, records['timestamp'].astype(np.float64), records['values']
+    rows = [[ts] + list(values) for ts, values in iter_samples(path)]
+    data = np.array(rows, dtype=np.float64).reshape(-1, len(IMU_FIELDS) + 1)
+    return header, data[:, 0], data[:, 1:]
+
+
+def edge_impulse_prefix(interval_ms, sensors=IMU_FIELDS):
+    """Edge Impulse JSON up to the opening bracket of payload.values"""
+    head = json.dumps({
+        "protected": {"ver": "v1", "alg": "HS256", "iat": int(time.time())},
+        "signature": "0" * 50,  # Dummy signature
+        "payload": {
+            "device_type": "EDGE_IMPULSE_UPLOADER",
+            "interval_ms": interval_ms,
+            "sensors": [{"name": name, "units": "N/A"} for name in sensors],
+            "values": [],
+        },
+    }, separators=(',', ':'))
+    return head[:-len(']}}')]
+
+
+def _round_values(values, float32):
+    """6 decimals; float32 data also capped to 7 significant digits (-33.8157, not -33.815701)"""
+    if not float32:
+        return np.round(values, 6)
+    magnitude = np.floor(np.log10(np.abs(values), out=np.zeros_like(values), where=values != 0))
+    scale = 10.0 ** np.minimum(6, 6 - magnitude)
+    return np.round(values * scale) / scale
+
+
+def write_edge_impulse(out_path, timestamps, values, interval_ms, sensors=IMU_FIELDS, resample_grid=True):
+    """Write Edge Impulse JSON from (N,) timestamps and (N, C) values, returns (samples written, timing stats)"""
+    stats = timing_stats(timestamps, interval_ms)
+    float32 = np.asarray(values).dtype == np.float32
+    if resample_grid and len(timestamps) > 1:
+        values = resample(timestamps, values, interval_ms)[1]
+    with open(out_path, 'w') as out:
+        out.write(edge_impulse_prefix(interval_ms, sensors))
+        for start in range(0, len(values), EXPORT_CHUNK):
+            chunk = _round_values(np.asarray(values[start:start + EXPORT_CHUNK], dtype=np.float64), float32)
+            out.write((',' if start else '') + json.dumps(chunk.tolist(), separators=(',', ':'))[1:-1])
+        out.write(']}}')
+    return len(values), stats
+
+
+def export_edge_impulse(chunk_path, out_path, interval_ms=None, resample_grid=True):
+    """Write Edge Impulse JSON from a chunk file, returns (samples written, timing stats)"""
+    header = read_header(chunk_path)[0]
+    interval_ms = interval_ms or header.get('interval_ms', DEFAULT_INTERVAL_MS)
+    sensors = header.get('sensors', IMU_FIELDS)
+    if np is not None:
+        _, timestamps, values = load_arrays(chunk_path)
+        return write_edge_impulse(out_path, timestamps, values, interval_ms, sensors, resample_grid)
+
+    # Tanpa NumPy: baris apa adanya, tanpa resample
+    count = 0
+    with open(out_path, 'w') as out:
+        out.write(edge_impulse_prefix(interval_ms, sensors))
+        for _, sample in iter_samples(chunk_path):
+            out.write((',' if count else '') + json.dumps([round(v, 6) for v in sample], separators=(',', ':')))
+            count += 1
+        out.write(']}}')
+    return count, None
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Sample Batch Buffer
+Preallocated column-major buffer that keeps every ESP32 sample received
+during one publish interval, so the full-rate signal can be sent as a
+single MQTT message on the .../batch topic.
+"""
+
+from array import array
+
+from sensor_parser import FIELD_INDEX, IMU_FIELDS
+
+# Kolom batch (nama field sensor_parser) - nama IMU sama dengan sensor Edge Impulse
+BATCH_COLUMNS = IMU_FIELDS + ('temp', 'pressure')
+
+
+class SampleBatch:
+    def __init__(self, capacity=64, columns=BATCH_COLUMNS):
+        """Preallocate storage for capacity samples"""
+        self.capacity = capacity
+        self.columns = columns
+        self.names = list(columns)
+        self._indices = [FIELD_INDEX[name] for name in columns]
+        self._ts_index = FIELD_INDEX['timestamp']
+
+        # Column-major: kolom c berada di [c * capacity, (c + 1) * capacity)
+        self._values = array('d', bytes(8 * capacity * len(columns)))
+        self._timestamps = array('q', bytes(8 * capacity))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def is_full(self):
+        return self.count >= self.capacity
+
+    def append(self, values):
+        """Store one sample (sensor_parser FIELDS tuple), returns True when the batch is full"""
+        i = self.count
+        cap = self.capacity
+        buf = self._values
+        for c, index in enumerate(self._indices):
+            buf[c * cap + i] = values[index]
+        self._timestamps[i] = int(values[self._ts_index])
+        self.count = i + 1
+        return self.count >= cap
+
+    def period_ms(self):
+        """Average sample period from the device timestamps"""
+        if self.count < 2:
+            return None
+        return (self._timestamps[self.count - 1] - self._timestamps[0]) / (self.count - 1)
+
+    def to_payload(self):
+        """Batch message: start timestamp, sample period and column-major axis arrays"""
+        n = self.count
+        cap = self.capacity
+        values = self._values
+        return {
+            "t0": self._timestamps[0] if n else None,
+            "period_ms": self.period_ms(),
+            "count": n,
+            "columns": self.names,
+            "values": [values[c * cap:c * cap + n].tolist() for c in range(len(self.columns))],
+        }
+
+    def clear(self):
+        """Reset the batch without releasing the preallocated storage"""
+        self.count = 0
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Recording Sample Buffer
+Growable float32 buffer shaped (n, channels), row-major, for the training
+recorder. 4 bytes per value plus a uint32 device timestamp per sample
+(40 bytes for 9 axes) instead of a list of Python floats per sample.
+
+Storage is preallocated for the expected duration * rate and grows by
+half its size if the recording runs longer. timestamps()/values() return
+zero-copy NumPy views for export (release them before appending again,
+the buffer cannot grow while a view exists).
+"""
+
+from array import array
+
+from sensor_parser import IMU_FIELDS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SampleBuffer:
+    def __init__(self, capacity=1024, channels=len(IMU_FIELDS)):
+        """Preallocate storage for capacity samples"""
+        self.channels = channels
+        self.capacity = max(1, int(capacity))
+        self._values = array('f', bytes(4 * self.capacity * channels))
+        self._timestamps = array('I', bytes(4 * self.capacity))
+        self.count = 0
+
+    @classmethod
+    def for_duration(cls, seconds, interval_ms, channels=len(IMU_FIELDS), margin=1.1):
+        """Size for seconds of data at interval_ms, with a small margin for a fast device"""
+        return cls(int(seconds * 1000 / interval_ms * margin) + 1, channels)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.capacity * (self.channels + 1) * 4
+
+    def _grow(self):
+        extra = max(1, self.capacity // 2)
+        self._values.frombytes(bytes(4 * extra * self.channels))
+        self._timestamps.frombytes(bytes(4 * extra))
+        self.capacity += extra
+
+    def append(self, timestamp, sample):
+        """Store one sample (channels values)"""
+        i = self.count
+        if i >= self.capacity:
+            self._grow()
+        start = i * self.channels
+        self._values[start:start + self.channels] = array('f', sample)
+        self._timestamps[i] = int(timestamp) & 0xFFFFFFFF
+        self.count = i + 1
+
+    def timestamps(self):
+        """(n,) uint32 view of the device timestamps"""
+        if np is None:
+            raise ValueError("Array export requires 'pip install numpy'")
+        return np.frombuffer(self._timestamps, dtype=np.uint32, count=self.count)
+
+    def values(self):
+        """(n, channels) float32 view of the samples"""
+        if np is None:
+            raise ValueError("Array export requires 'pip install numpy'")
+        return np.frombuffer(self._values, dtype=np.float32,
+                             count=self.count * self.channels).reshape(self.count, self.channels)
+
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+ESP32 Sensor Line Parser
+Shared parser for the JSON lines emitted by ESP32.ino, used by the MQTT
+reader and the training data recorder. Returns a flat tuple of values in
+FIELDS order and counts rejected lines by reason instead of dropping them
+silently.
+
+Fast path: the firmware always serializes the same key layout, so a line
+starting with '{"timestamp' is decoded with the C JSON decoder (orjson if
+installed) and the values are read with fixed key lookups. Anything else
+goes through the tolerant fallback, which searches for the frame start and
+walks every field path.
+"""
+
+import json
+import math
+from collections import Counter
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _DECODE_ERRORS = (orjson.JSONDecodeError, ValueError)
+except ImportError:
+    orjson = None
+    _loads = json.loads
+    _DECODE_ERRORS = (ValueError,)
+
+FRAME_MARKER = '{"timestamp'
+
+# Flat layout: nama field -> path dalam JSON ESP32
+FIELD_PATHS = (
+    ('timestamp', ('timestamp',)),
+    ('ax1', ('adxl345', 'ax')),
+    ('ay1', ('adxl345', 'ay')),
+    ('az1', ('adxl345', 'az')),
+    ('ax2', ('mpu6050', 'accel', 'x')),
+    ('ay2', ('mpu6050', 'accel', 'y')),
+    ('az2', ('mpu6050', 'accel', 'z')),
+    ('gx', ('mpu6050', 'gyro', 'x')),
+    ('gy', ('mpu6050', 'gyro', 'y')),
+    ('gz', ('mpu6050', 'gyro', 'z')),
+    ('mpu_temp', ('mpu6050', 'temp')),
+    ('temp', ('bmp280', 'temp')),
+    ('pressure', ('bmp280', 'pressure')),
+    ('altitude', ('bmp280', 'altitude')),
+)
+FIELDS = tuple(name for name, _ in FIELD_PATHS)
+FIELD_INDEX = {name: i for i, name in enumerate(FIELDS)}
+
+# 9 IMU axes (urutan sensor Edge Impulse)
+IMU_FIELDS = FIELDS[1:10]
+IMU_SLICE = slice(1, 10)
+
+REQUIRED_SENSORS = ('adxl345', 'mpu6050', 'bmp280')
+
+_decoder = json.JSONDecoder()
+
+
+def is_number(value):
+    """True for a finite int/float (bool, None, strings, NaN and Infinity are rejected)"""
+    kind = type(value)
+    return kind is int or (kind is float and math.isfinite(value))
+
+
+class SensorLineParser:
+    def __init__(self):
+        """Initialize parser statistics"""
+        self.accepted = 0
+        self.fast_path = 0
+        self.rejected = Counter()  # reason -> jumlah baris
+
+    @property
+    def rejected_total(self):
+        return sum(self.rejected.values())
+
+    def parse(self, line):
+        """Parse one line, returns a tuple in FIELDS order or None if rejected"""
+        if line.startswith(FRAME_MARKER):
+            try:
+                data = _loads(line)
+                adxl = data['adxl345']
+                mpu = data['mpu6050']
+                accel = mpu['accel']
+                gyro = mpu['gyro']
+                bmp = data['bmp280']
+                values = (
+                    data['timestamp'],
+                    adxl['ax'], adxl['ay'], adxl['az'],
+                    accel['x'], accel['y'], accel['z'],
+                    gyro['x'], gyro['y'], gyro['z'],
+                    mpu['temp'],
+                    bmp['temp'], bmp['pressure'], bmp['altitude'],
+                )
+            except Exception:
+                pass  # Layout berbeda, coba jalur tolerant
+            else:
+                # Validasi sama dengan parse_document; bool/NaN/null ditolak di sana
+                if all(map(is_number, values)):
+                    self.accepted += 1
+                    self.fast_path += 1
+                    return values
+        return self._parse_fallback(line)
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        return None
+
+    def _parse_fallback(self, line):
+        """Tolerant parse: strip garbage before the frame start, walk every path"""
+        line = line.strip()
+        if '{' not in line:
+            return self._reject('not_json')
+
+        start = line.find(FRAME_MARKER)
+        if start == -1:
+            return self._reject('no_timestamp')
+
+        try:
+            data, _ = _decoder.raw_decode(line, start)
+        except _DECODE_ERRORS:
+            return self._reject('decode_error')
+
+        if not isinstance(data, dict):
+            return self._reject('decode_error')
+        return self.parse_document(data)
+
+    def parse_document(self, data):
+        """Flatten an already decoded ESP32 document (e.g. from MQTT) into a FIELDS tuple"""
+        for sensor in REQUIRED_SENSORS:
+            if sensor not in data:
+                return self._reject(f'missing_{sensor}')
+
+        values = []
+        for name, path in FIELD_PATHS:
+            value = data
+            try:
+                for key in path:
+                    value = value[key]
+            except (KeyError, TypeError):
+                return self._reject('missing_field')
+            if not is_number(value):
+                return self._reject('bad_value')
+            values.append(value)
+
+        self.accepted += 1
+        return tuple(values)
+
+    def stats(self):
+        """Summary dict of accepted / rejected counts"""
+        return {
+            'accepted': self.accepted,
+            'fast_path': self.fast_path,
+            'rejected': dict(self.rejected),
+        }
+
+
+def format_rejected(rejected):
+    """'12 (decode_error 10, not_json 2)' summary of a rejected-by-reason Counter/dict"""
+    total = sum(rejected.values())
+    if not total:
+        return "0"
+    reasons = ", ".join(f"{reason} {count}" for reason, count in sorted(rejected.items()) if count)
+    return f"{total} ({reasons})"
+
+
+def to_document(values, reception_time=None):
+    """Rebuild the nested ESP32 JSON document from a FIELDS-ordered tuple"""
+    (timestamp, ax1, ay1, az1, ax2, ay2, az2, gx, gy, gz,
+     mpu_temp, temp, pressure, altitude) = values
+    data = {
+        "timestamp": timestamp,
+        "adxl345": {"ax": ax1, "ay": ay1, "az": az1},
+        "mpu6050": {
+            "accel": {"x": ax2, "y": ay2, "z": az2},
+            "gyro": {"x": gx, "y": gy, "z": gz},
+            "temp": mpu_temp,
+        },
+        "bmp280": {"temp": temp, "pressure": pressure, "altitude": altitude},
+    }
+    if reception_time is not None:
+        data["reception_time"] = reception_time
+    return data
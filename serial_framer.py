@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Serial Line Framer
+Incremental newline framer for the ESP32 serial stream, built on a reusable
+bytearray. Delimiters are located in place, the unconsumed tail is never
+copied per line, and only complete frames are decoded to str.
+"""
+
+DEFAULT_MAX_FRAME_SIZE = 2048
+RESYNC_MARKER = b'{"timestamp'
+
+
+class LineFramer:
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE, delimiter=b'\n',
+                 resync_marker=RESYNC_MARKER):
+        """Initialize the framer"""
+        self.max_frame_size = max_frame_size
+        self.delimiter = delimiter
+        self.resync_marker = resync_marker
+
+        self._buf = bytearray()
+        self._scan_pos = 0  # Posisi awal pencarian delimiter berikutnya
+        self._delimiter_tail = len(delimiter) - 1
+
+        # Statistics
+        self.frames = 0
+        self.oversize_frames = 0  # Frame lebih panjang dari max_frame_size
+        self.resyncs = 0  # Buffer overflow tanpa delimiter
+        self.discarded_bytes = 0
+
+    @property
+    def pending(self):
+        """Number of buffered bytes not yet framed"""
+        return len(self._buf)
+
+    def feed(self, data):
+        """Append raw bytes and return the list of complete decoded lines"""
+        buf = self._buf
+        buf += data
+        pos = buf.find(self.delimiter, self._scan_pos)
+        if pos == -1:
+            # Fast path: belum ada frame lengkap
+            if len(buf) > self.max_frame_size:
+                self._resync()
+            self._scan_pos = max(0, len(buf) - self._delimiter_tail)
+            return []
+
+        lines = []
+        delimiter_len = len(self.delimiter)
+        max_size = self.max_frame_size
+        start = 0
+        view = memoryview(buf)
+        try:
+            while pos != -1:
+                end = pos
+                if end > start and buf[end - 1] == 0x0D:  # Strip '\r'
+                    end -= 1
+                if end - start > max_size:
+                    # Resync ke marker terakhir di dalam frame jika ada
+                    self.oversize_frames += 1
+                    idx = buf.rfind(self.resync_marker, start, end)
+                    if idx != -1 and end - idx <= max_size:
+                        self.discarded_bytes += idx - start
+                        lines.append(str(view[idx:end], 'utf-8', 'ignore'))
+                    else:
+                        self.discarded_bytes += end - start
+                elif end > start:
+                    lines.append(str(view[start:end], 'utf-8', 'ignore'))
+                start = pos + delimiter_len
+                pos = buf.find(self.delimiter, start)
+        finally:
+            view.release()
+        del buf[:start]
+        self.frames += len(lines)
+
+        if len(buf) > max_size:
+            self._resync()
+        self._scan_pos = max(0, len(buf) - self._delimiter_tail)
+        return lines
+
+    def flush(self):
+        """Return the buffered partial line (if any) and clear the buffer"""
+        buf = self._buf
+        line = None
+        if buf:
+            end = len(buf)
+            if buf[end - 1] == 0x0D:
+                end -= 1
+            if end <= self.max_frame_size:
+                line = str(memoryview(buf)[:end], 'utf-8', 'ignore') or None
+        self.reset()
+        return line
+
+    def reset(self):
+        """Drop all buffered bytes"""
+        del self._buf[:]
+        self._scan_pos = 0
+
+    def _resync(self):
+        """Discard garbage up to the next frame start marker"""
+        buf = self._buf
+        while len(buf) > self.max_frame_size:
+            self.resyncs += 1
+            idx = buf.find(self.resync_marker, 1)
+            if idx == -1:
+                # Simpan hanya ekor yang benar-benar awal marker yang terpotong
+                idx = len(buf) - self._marker_prefix_length()
+            self.discarded_bytes += idx
+            del buf[:idx]
+
+    def _marker_prefix_length(self):
+        """Length of the longest suffix of the buffer that is a proper prefix of the marker"""
+        buf = self._buf
+        marker = self.resync_marker
+        for n in range(min(len(marker) - 1, len(buf) - 1), 0, -1):
+            if buf.endswith(marker[:n]):
+                return n
+        return 0
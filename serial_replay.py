@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Serial Replay
+Feeds captured ESP32 output back into the reader pipeline without hardware.
+
+Sources:
+    raw log      - bytes captured from the serial port (one line per frame);
+                   paced by the "timestamp" field when present
+    Edge Impulse - recordings such as Normal.json / Drop_Voltage.json; each
+                   row is re-serialized as an ESP32 JSON line at interval_ms
+
+Playback at speed 1.0 (real time), N (N times faster) or 0 (unthrottled),
+either through ReplaySerial (drop-in for serial.Serial inside the reader)
+or through PtyReplay, which writes into a pseudo-terminal so the real
+pyserial code path is exercised as well.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+from sensor_parser import FIELD_INDEX, FIELDS, to_document
+
+# Nilai default untuk field yang tidak ada di rekaman Edge Impulse (hanya 9 axis)
+EI_DEFAULTS = {
+    'mpu_temp': 30.0,
+    'temp': 25.0,
+    'pressure': 1013.25,
+    'altitude': 0.0,
+}
+DEFAULT_PERIOD = 0.1  # 10Hz, sama dengan firmware
+
+_TIMESTAMP = re.compile(rb'"timestamp"\s*:\s*(\d+)')
+
+
+def load_edge_impulse(path):
+    """Edge Impulse JSON recording -> list of (offset seconds, ESP32 JSON line bytes)"""
+    with open(path) as f:
+        payload = json.load(f)['payload']
+    interval = payload.get('interval_ms', DEFAULT_PERIOD * 1000)
+    columns = [FIELD_INDEX[sensor['name']] for sensor in payload['sensors']]
+
+    template = [EI_DEFAULTS.get(name, 0.0) for name in FIELDS]
+    records = []
+    for i, row in enumerate(payload['values']):
+        values = list(template)
+        values[0] = int(i * interval)
+        for index, value in zip(columns, row):
+            values[index] = value
+        line = json.dumps(to_document(values), separators=(',', ':')) + '\r\n'
+        records.append((i * interval / 1000.0, line.encode('utf-8')))
+    return records
+
+
+def load_raw_log(path, period=DEFAULT_PERIOD):
+    """Captured serial log -> list of (offset seconds, line bytes), kept byte-exact"""
+    with open(path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+
+    timestamps = [_TIMESTAMP.search(line) for line in lines]
+    paced_by_device = any(timestamps)
+
+    records = []
+    offset = 0.0
+    last_ts = None
+    for line, match in zip(lines, timestamps):
+        if match:
+            ts = int(match.group(1))
+            if last_ts is not None and ts > last_ts:
+                offset += (ts - last_ts) / 1000.0
+            elif records:
+                offset += period  # ESP32 reset, timestamp mulai dari 0 lagi
+            last_ts = ts
+        elif records and not paced_by_device:
+            offset += period
+        records.append((offset, line))
+    return records
+
+
+def load_recording(path, period=DEFAULT_PERIOD):
+    """Detect the recording type and load it"""
+    if path.endswith('.json'):
+        try:
+            return load_edge_impulse(path)
+        except (ValueError, KeyError, TypeError):
+            pass  # Bukan format Edge Impulse, anggap log mentah
+    return load_raw_log(path, period)
+
+
+class ReplaySerial:
+    def __init__(self, records, speed=1.0, loop=False, timeout=0.1, chunk_size=4096):
+        """Minimal serial.Serial stand-in (read / in_waiting / open / close)
+
+        speed:      playback factor, 0 = as fast as the reader consumes
+        chunk_size: max bytes buffered at once, like a UART driver buffer
+        """
+        self.records = records
+        self.speed = speed
+        self.loop = loop
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.port = 'replay'
+        self.is_open = True
+        self.done = threading.Event()
+        self.lines_sent = 0
+        self.bytes_sent = 0
+
+        self._buffer = bytearray()
+        self._index = 0
+        self._start = None
+        self._loop_offset = 0.0
+        self._span = records[-1][0] + DEFAULT_PERIOD if records else 0.0
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def _due_time(self):
+        """perf_counter() time at which the next record becomes available"""
+        if not self.speed:
+            return 0.0
+        return self._start + (self._loop_offset + self.records[self._index][0]) / self.speed
+
+    def _fill(self):
+        """Move every record that is due into the buffer"""
+        if self._start is None:
+            self._start = time.perf_counter()
+        now = time.perf_counter()
+        records = self.records
+        while len(self._buffer) < self.chunk_size:
+            if self._index >= len(records):
+                if not self.loop or not records:
+                    self.done.set()
+                    return
+                self._index = 0
+                self._loop_offset += self._span
+            if self._due_time() > now:
+                return
+            line = records[self._index][1]
+            self._buffer += line
+            self._index += 1
+            self.lines_sent += 1
+            self.bytes_sent += len(line)
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return len(self._buffer)
+
+    def read(self, size=1):
+        """Return up to size bytes, blocking until data is due or timeout expires"""
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            self._fill()
+            if self._buffer:
+                data = bytes(self._buffer[:size])
+                del self._buffer[:size]
+                return data
+            if self.done.is_set():
+                return b''
+            wait = min(self._due_time(), deadline) - time.perf_counter()
+            if wait <= 0 and time.perf_counter() >= deadline:
+                return b''
+            if wait > 0:
+                time.sleep(wait)
+
+
+class PtyReplay:
+    def __init__(self, records, speed=1.0, loop=False):
+        """Write records into a pseudo-terminal; open .port with pyserial"""
+        import pty
+        import tty
+
+        self.records = records
+        self.speed = speed
+        self.loop = loop
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)  # Tanpa translasi newline / echo
+        self.port = os.ttyname(self.slave)
+        self.done = threading.Event()
+        self.lines_sent = 0
+        self.bytes_sent = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write_loop, name="pty-replay", daemon=True)
+        self._thread.start()
+
+    def _write_loop(self):
+        span = self.records[-1][0] + DEFAULT_PERIOD if self.records else 0.0
+        start = time.perf_counter()
+        loop_offset = 0.0
+        while not self._stop_event.is_set():
+            for offset, line in self.records:
+                if self.speed:
+                    wait = start + (loop_offset + offset) / self.speed - time.perf_counter()
+                    if wait > 0 and self._stop_event.wait(wait):
+                        return
+                elif self._stop_event.is_set():
+                    return
+                try:
+                    os.write(self.master, line)
+                except OSError:
+                    return
+                self.lines_sent += 1
+                self.bytes_sent += len(line)
+            if not self.loop or not self.records:
+                break
+            loop_offset += span
+        self.done.set()
+
+    def close(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
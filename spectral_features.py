@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Spectral Feature Extraction
+Sliding window over the 9 IMU axes with NumPy-vectorized features, so the
+gateway can publish a compact feature vector instead of the raw stream.
+Every hop samples the whole 9 x N window is processed at once:
+
+    rms, peak (max |x|), kurtosis (excess), dominant frequency and the
+    energy of n_bands equal-width FFT bands (rfft of the mean-removed,
+    Hann-windowed block)
+
+The sample rate is estimated from the device timestamps in the window.
+"""
+
+from sensor_parser import IMU_FIELDS, IMU_SLICE
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TIME_FEATURES = ('rms', 'peak', 'kurtosis', 'dominant_hz')
+
+
+def feature_names(n_bands=8):
+    return TIME_FEATURES + tuple(f'band{b}' for b in range(n_bands))
+
+
+class SlidingWindow:
+    def __init__(self, length, channels=len(IMU_FIELDS)):
+        """Ring buffer of the last length samples, channel-major"""
+        self.length = length
+        self._data = np.zeros((channels, length))
+        self._timestamps = np.zeros(length)
+        self._pos = 0
+        self.count = 0
+
+    def append(self, sample, timestamp):
+        pos = self._pos
+        self._data[:, pos] = sample
+        self._timestamps[pos] = timestamp
+        self._pos = (pos + 1) % self.length
+        self.count += 1
+
+    def is_full(self):
+        return self.count >= self.length
+
+    def block(self):
+        """(channels, length) array in chronological order and matching timestamps"""
+        pos = self._pos
+        if pos == 0:
+            return self._data.copy(), self._timestamps.copy()
+        return (np.concatenate((self._data[:, pos:], self._data[:, :pos]), axis=1),
+                np.concatenate((self._timestamps[pos:], self._timestamps[:pos])))
+
+
+def compute_features(block, sample_rate, n_bands=8):
+    """Feature matrix (channels, len(feature_names(n_bands))) for a (channels, N) block"""
+    n = block.shape[1]
+    mean = block.mean(axis=1, keepdims=True)
+    centered = block - mean
+
+    rms = np.sqrt(np.mean(block * block, axis=1))
+    peak = np.max(np.abs(block), axis=1)
+    var = np.mean(centered * centered, axis=1)
+    m4 = np.mean(centered ** 4, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kurtosis = np.where(var > 0, m4 / (var * var) - 3.0, 0.0)
+
+    spectrum = np.fft.rfft(centered * np.hanning(n), axis=1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    dominant = np.argmax(power[:, 1:], axis=1) + 1  # Lewati DC
+    dominant_hz = dominant * sample_rate / n
+
+    edges = np.linspace(1, power.shape[1], n_bands + 1).astype(int)[:-1]
+    bands = np.add.reduceat(power, edges, axis=1) / n
+
+    return np.column_stack((rms, peak, kurtosis, dominant_hz, bands))
+
+
+class FeatureExtractor:
+    def __init__(self, window=128, hop=64, n_bands=8, sample_rate=10.0):
+        """Emit a feature vector every hop samples once window samples are buffered
+
+        sample_rate: fallback when device timestamps cannot be used
+        """
+        if np is None:
+            raise ValueError("Feature extraction requires 'pip install numpy'")
+        if hop < 1 or window < 2 * n_bands:
+            raise ValueError(f"Invalid feature window {window} / hop {hop} for {n_bands} bands")
+        self.window = SlidingWindow(window)
+        self.hop = hop
+        self.n_bands = n_bands
+        self.sample_rate = sample_rate
+        self.names = list(feature_names(n_bands))
+        self.computed = 0
+        self._since_last = 0
+
+    def push(self, values):
+        """Add one sensor_parser sample, returns a payload dict when a new vector is due"""
+        self.window.append(values[IMU_SLICE], values[0])
+        self._since_last += 1
+        if self._since_last < self.hop or not self.window.is_full():
+            return None
+        self._since_last = 0
+        return self.compute()
+
+    def window_block(self):
+        """Current (9, N) window, its device timestamps and the estimated sample rate"""
+        block, timestamps = self.window.block()
+        span = timestamps[-1] - timestamps[0]
+        sample_rate = (len(timestamps) - 1) * 1000.0 / span if span > 0 else self.sample_rate
+        return block, timestamps, sample_rate
+
+    def compute(self):
+        block, timestamps, sample_rate = self.window_block()
+        features = compute_features(block, sample_rate, self.n_bands)
+        self.computed += 1
+        return {
+            "timestamp": int(timestamps[-1]),
+            "window": len(timestamps),
+            "sample_rate": round(sample_rate, 3),
+            "axes": list(IMU_FIELDS),
+            "columns": self.names,
+            "values": np.round(features, 5).tolist(),
+        }
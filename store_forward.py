@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Store-and-Forward MQTT Spool
+Durable outbound queue for the ESP32 reader. While the broker is
+unreachable (or a backlog is still draining) messages are written to a
+SQLite database in WAL mode with a fixed byte budget and oldest-first
+eviction. After reconnect the backlog is drained at a configurable rate and
+rows are deleted only once the broker has acknowledged them, so a gateway
+restart during an outage does not lose history.
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class StoreForwardQueue:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """Open (or create) the spool database"""
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " topic TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " qos INTEGER NOT NULL,"
+            " retain INTEGER NOT NULL,"
+            " size INTEGER NOT NULL)"
+        )
+        self.count, self.bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outbox").fetchone()
+        self._cursor = 0  # id terakhir yang sudah diambil untuk dikirim
+        self.evicted = 0
+        self.evicted_bytes = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, topic, payload, qos=1, retain=False):
+        """Append one message, evicting the oldest rows if over budget"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        size = len(topic) + len(payload)
+        with self._lock:
+            if size > self.max_bytes:
+                self.evicted += 1
+                self.evicted_bytes += size
+                return
+            self._conn.execute(
+                "INSERT INTO outbox (topic, payload, qos, retain, size) VALUES (?, ?, ?, ?, ?)",
+                (topic, payload, qos, int(retain), size))
+            self.count += 1
+            self.bytes += size
+            if self.bytes > self.max_bytes:
+                self._evict(self.bytes - self.max_bytes)
+
+    def _evict(self, excess):
+        """Delete oldest rows until at least excess bytes are freed"""
+        freed = 0
+        removed = 0
+        last_id = None
+        for row_id, size in self._conn.execute("SELECT id, size FROM outbox ORDER BY id"):
+            freed += size
+            removed += 1
+            last_id = row_id
+            if freed >= excess:
+                break
+        if last_id is None:
+            return
+        self._conn.execute("DELETE FROM outbox WHERE id <= ?", (last_id,))
+        self.count -= removed
+        self.bytes -= freed
+        self.evicted += removed
+        self.evicted_bytes += freed
+
+    def take(self, limit):
+        """Return up to limit not-yet-sent rows (id, topic, payload, qos, retain), oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, topic, payload, qos, retain FROM outbox WHERE id > ? ORDER BY id LIMIT ?",
+                (self._cursor, limit)).fetchall()
+            if rows:
+                self._cursor = rows[-1][0]
+            return rows
+
+    def rewind(self, row_id=0):
+        """Resend rows after row_id on the next take()"""
+        with self._lock:
+            self._cursor = min(self._cursor, row_id)
+
+    def ack(self, row_ids):
+        """Delete rows acknowledged by the broker"""
+        if not row_ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            deleted = 0
+            for row_id in row_ids:
+                row = self._conn.execute("SELECT size FROM outbox WHERE id = ?", (row_id,)).fetchone()
+                if row is None:
+                    continue  # Sudah di-evict
+                self._conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+                self.bytes -= row[0]
+                deleted += 1
+            self._conn.execute("COMMIT")
+            self.count -= deleted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SpoolingPublisher:
+    def __init__(self, client, spool, drain_rate=100.0, window=50):
+        """Route publishes through spool whenever the live path is not usable
+
+        client:     paho client (loop must be running)
+        drain_rate: max spooled messages per second after reconnect
+        window:     max spooled messages awaiting PUBACK at once
+        """
+        self.client = client
+        self.spool = spool
+        self.drain_rate = drain_rate
+        self.window = window
+        self.is_connected = False
+        self.drained = 0
+
+        self._connected_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._work_event = threading.Event()
+        self._inflight = []  # (MQTTMessageInfo, row_id)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._drain_loop, name="spool-drain", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._connected_event.set()
+        self._work_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def on_connect(self):
+        self.is_connected = True
+        self._connected_event.set()
+
+    def on_disconnect(self):
+        self.is_connected = False
+        self._connected_event.clear()
+
+    def publish(self, topic, payload, qos=1, retain=False):
+        """Publish directly when connected and no backlog exists, else spool"""
+        if self.is_connected and not self.spool.count:
+            info = self.client.publish(topic, payload, qos=qos, retain=retain)
+            # NO_CONN (qos>0): paho sudah menyimpan pesan dan akan mengirim ulang
+            if info.rc == mqtt.MQTT_ERR_SUCCESS or (info.rc == mqtt.MQTT_ERR_NO_CONN and qos > 0):
+                return info
+        self.spool.push(topic, payload, qos, retain)
+        self._work_event.set()
+        return None
+
+    def _drain_loop(self):
+        """Drain the spool at drain_rate once the broker is connected"""
+        tick = 0.1
+        per_tick = max(1, int(self.drain_rate * tick))
+        while not self._stop_event.is_set():
+            if not self._connected_event.wait(timeout=1.0):
+                continue
+            if self._stop_event.is_set():
+                break
+
+            # Hapus baris yang sudah di-PUBACK broker
+            done = []
+            pending = []
+            for entry in self._inflight:
+                (done if entry[0].is_published() else pending).append(entry)
+            if done:
+                self._inflight = pending
+                self.spool.ack([row_id for _, row_id in done])
+                self.drained += len(done)
+
+            if not pending and not self.spool.count:
+                # Tidak ada backlog, tunggu sampai ada pesan masuk spool
+                self._work_event.wait(timeout=1.0)
+                self._work_event.clear()
+                continue
+
+            budget = min(per_tick, self.window - len(self._inflight))
+            if budget > 0 and self.is_connected:
+                for row_id, topic, payload, qos, retain in self.spool.take(budget):
+                    info = self.client.publish(topic, payload, qos=qos, retain=bool(retain))
+                    if info.rc == mqtt.MQTT_ERR_QUEUE_SIZE:
+                        self.spool.rewind(row_id - 1)
+                        break
+                    if qos == 0 and info.rc == mqtt.MQTT_ERR_SUCCESS:
+                        self.spool.ack([row_id])
+                        self.drained += 1
+                    elif qos > 0 and info.rc in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+                        self._inflight.append((info, row_id))
+                    else:
+                        if info.rc != mqtt.MQTT_ERR_NO_CONN:
+                            print(f"[!] Spool drain publish failed (rc={info.rc})", file=sys.stderr)
+                        self.spool.rewind(row_id - 1)
+                        break
+
+            time.sleep(tick)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Timestamp-aligned Resampling
+Places ESP32 samples on an exact uniform grid using the device timestamp
+(millis()) instead of the arrival time of the serial line. Values between
+two device samples are linearly interpolated, vectorized over all channels.
+
+Irregularities are detected rather than smoothed over:
+
+    duplicate     same timestamp as the previous sample (dropped)
+    out_of_order  timestamp before the previous one, e.g. after an ESP32
+                  reset (the grid restarts at the new sample)
+    gap           interval longer than max_gap_ms; no values are invented
+                  for grid points inside the gap
+
+Grid timestamps are multiples of interval_ms from the first sample of a
+segment, so a gap does not shift the phase of later samples. align() puts
+several streams (e.g. sensor nodes mapped to the host clock) on one
+shared grid.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_INTERVAL_MS = 100  # readInterval di ESP32.ino (10Hz)
+
+
+def _grid_after(t, origin, interval):
+    """First grid point (origin + k * interval) strictly after t"""
+    return origin + ((t - origin) // interval + 1) * interval
+
+
+def interpolate(timestamps, values, grid, max_gap_ms):
+    """Linear interpolation of (N, C) values at grid times, returns (grid values, valid mask)
+
+    timestamps must be strictly increasing; grid points outside the data or
+    inside a gap longer than max_gap_ms are marked invalid.
+    """
+    # Index sample kanan untuk tiap titik grid, lalu bobot linear
+    right = np.clip(np.searchsorted(timestamps, grid, side='left'), 1, len(timestamps) - 1)
+    left = right - 1
+    span = timestamps[right] - timestamps[left]
+    weight = ((grid - timestamps[left]) / span)[:, None]
+    grid_v = values[left] + (values[right] - values[left]) * weight
+    valid = (span <= max_gap_ms) & (grid >= timestamps[0]) & (grid <= timestamps[-1])
+    return grid_v, valid
+
+
+def resample(timestamps, values, interval_ms=DEFAULT_INTERVAL_MS, max_gap_ms=None):
+    """Resample a whole recording onto a uniform grid
+
+    timestamps: (N,) device timestamps in ms
+    values:     (N, C) samples
+    Returns (grid_timestamps, grid_values, stats) where stats is the
+    timing_stats() dict of the input.
+    """
+    if np is None:
+        raise ValueError("Resampling requires 'pip install numpy'")
+    if max_gap_ms is None:
+        max_gap_ms = 3 * interval_ms
+    t = np.asarray(timestamps, dtype=np.float64)
+    v = np.asarray(values, dtype=np.float64).reshape(len(t), -1)
+    stats = timing_stats(t, interval_ms, max_gap_ms)
+    if len(t) < 2:
+        return t.copy(), v.copy(), stats
+
+    # Buang duplikat, potong segmen di timestamp mundur (reset ESP32)
+    dt = np.diff(t)
+    keep = np.concatenate(([True], dt != 0))
+    t, v = t[keep], v[keep]
+    dt = np.diff(t)
+    breaks = np.flatnonzero(dt < 0) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(t)]))
+
+    out_t, out_v = [], []
+    for start, end in zip(starts, ends):
+        seg_t, seg_v = t[start:end], v[start:end]
+        if len(seg_t) == 1:
+            out_t.append(seg_t)
+            out_v.append(seg_v)
+            continue
+        grid = np.arange(seg_t[0], seg_t[-1] + 1e-9, interval_ms)
+        # Titik grid di dalam gap tidak diisi
+        grid_v, valid = interpolate(seg_t, seg_v, grid, max_gap_ms)
+        out_t.append(grid[valid])
+        out_v.append(grid_v[valid])
+    return np.concatenate(out_t), np.concatenate(out_v), stats
+
+
+def monotonic_mask(timestamps):
+    """Mask of samples newer than every earlier sample (drops duplicates and jumps back)"""
+    t = np.asarray(timestamps, dtype=np.float64)
+    return t > np.concatenate(([-np.inf], np.maximum.accumulate(t)[:-1]))
+
+
+def align(streams, interval_ms=DEFAULT_INTERVAL_MS, max_gap_ms=None):
+    """Put several (timestamps, (N, C)) streams on one shared grid over their overlap
+
+    Timestamps must share a clock (e.g. device time mapped to host time).
+    Returns (grid timestamps, (n, sum of C) values); grid points missing in
+    any stream are dropped. Grid points are multiples of interval_ms.
+    Samples that are not newer than every earlier sample of their stream
+    are ignored (see monotonic_mask), so split device resets before calling.
+    """
+    if np is None:
+        raise ValueError("Resampling requires 'pip install numpy'")
+    if max_gap_ms is None:
+        max_gap_ms = 3 * interval_ms
+    cleaned = []
+    for timestamps, values in streams:
+        t = np.asarray(timestamps, dtype=np.float64)
+        v = np.asarray(values, dtype=np.float64).reshape(len(t), -1)
+        # Hanya sample yang maju (buang duplikat / lompatan mundur)
+        keep = monotonic_mask(t)
+        if keep.sum() < 2:
+            raise ValueError("Every stream needs at least 2 samples to align")
+        cleaned.append((t[keep], v[keep]))
+
+    start = max(t[0] for t, _ in cleaned)
+    end = min(t[-1] for t, _ in cleaned)
+    grid = np.arange(np.ceil(start / interval_ms) * interval_ms, end + 1e-9, interval_ms)
+    columns = []
+    valid = np.ones(len(grid), dtype=bool)
+    for t, v in cleaned:
+        grid_v, ok = interpolate(t, v, grid, max_gap_ms)
+        columns.append(grid_v)
+        valid &= ok
+    return grid[valid], np.hstack(columns)[valid]
+
+
+def timing_stats(timestamps, interval_ms=DEFAULT_INTERVAL_MS, max_gap_ms=None):
+    """Interval/jitter statistics of device timestamps (vectorized)"""
+    if max_gap_ms is None:
+        max_gap_ms = 3 * interval_ms
+    dt = np.diff(np.asarray(timestamps, dtype=np.float64))
+    duplicates = int(np.count_nonzero(dt == 0))
+    out_of_order = int(np.count_nonzero(dt < 0))
+    gaps = int(np.count_nonzero(dt > max_gap_ms))
+    regular = dt[(dt > 0) & (dt <= max_gap_ms)]
+    if not len(regular):
+        return {'samples': len(timestamps), 'mean_ms': None,
+                'jitter_ms': None, 'max_jitter_ms': None, 'min_ms': None, 'max_ms': None,
+                'gaps': gaps, 'duplicates': duplicates, 'out_of_order': out_of_order}
+    deviation = np.abs(regular - interval_ms)
+    return {
+        'samples': len(timestamps),
+        'mean_ms': round(float(regular.mean()), 3),
+        'jitter_ms': round(float(regular.std()), 3),
+        'max_jitter_ms': round(float(deviation.max()), 3),
+        'min_ms': float(regular.min()),
+        'max_ms': float(regular.max()),
+        'gaps': gaps,
+        'duplicates': duplicates,
+        'out_of_order': out_of_order,
+    }
+
+
+def format_stats(stats):
+    """One-line summary of a timing_stats()/StreamResampler.stats() dict"""
+    if stats['mean_ms'] is None:
+        timing = "no regular intervals"
+    else:
+        timing = (f"interval {stats['mean_ms']:.1f} ms (min {stats['min_ms']:.0f}, max {stats['max_ms']:.0f}), "
+                  f"jitter {stats['jitter_ms']:.2f} ms (max {stats['max_jitter_ms']:.1f})")
+    return (f"{timing}, {stats['gaps']} gaps, {stats['duplicates']} duplicates, "
+            f"{stats['out_of_order']} out of order")
+
+
+class StreamResampler:
+    def __init__(self, interval_ms=DEFAULT_INTERVAL_MS, max_gap_ms=None):
+        """Incremental resampler for sensor_parser tuples (timestamp first)"""
+        if np is None:
+            raise ValueError("Resampling requires 'pip install numpy'")
+        if interval_ms <= 0:
+            raise ValueError(f"Invalid resample interval: {interval_ms} ms")
+        self.interval_ms = interval_ms
+        self.max_gap_ms = max_gap_ms if max_gap_ms is not None else 3 * interval_ms
+        self._prev_t = None
+        self._prev_v = None
+        self._origin = None
+        self._next = None
+
+        self.samples = 0
+        self.emitted = 0
+        self.gaps = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+        # Statistik interval (running, tanpa menyimpan semua sample)
+        self._n = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._min = None
+        self._max = None
+        self._max_jitter = 0.0
+
+    def _restart(self, t, v):
+        """Start a new grid segment at this sample"""
+        self._origin = t
+        self._prev_t = t
+        self._prev_v = v
+        self._next = t + self.interval_ms
+        return [tuple([int(t)] + v.tolist())]
+
+    def push(self, values):
+        """Add one parsed sample, returns the list of grid samples it completes"""
+        t = float(values[0])
+        self.samples += 1
+        if self._prev_t is None:
+            out = self._restart(t, np.asarray(values[1:], dtype=np.float64))
+            self.emitted += 1
+            return out
+
+        dt = t - self._prev_t
+        if dt == 0:
+            self.duplicates += 1
+            return []
+        if dt < 0:
+            self.out_of_order += 1
+            out = self._restart(t, np.asarray(values[1:], dtype=np.float64))
+            self.emitted += 1
+            return out
+        if dt > self.max_gap_ms:
+            self.gaps += 1
+            # Lanjutkan fase grid yang sama setelah gap
+            self._prev_t = t
+            self._prev_v = np.asarray(values[1:], dtype=np.float64)
+            if (t - self._origin) % self.interval_ms == 0:
+                self._next = t + self.interval_ms
+                self.emitted += 1
+                return [tuple([int(t)] + self._prev_v.tolist())]
+            self._next = _grid_after(t, self._origin, self.interval_ms)
+            return []
+
+        self._n += 1
+        self._sum += dt
+        self._sumsq += dt * dt
+        self._min = dt if self._min is None else min(self._min, dt)
+        self._max = dt if self._max is None else max(self._max, dt)
+        self._max_jitter = max(self._max_jitter, abs(dt - self.interval_ms))
+
+        if t < self._next:
+            self._prev_t = t
+            self._prev_v = np.asarray(values[1:], dtype=np.float64)
+            return []
+
+        # Semua titik grid di (prev, t], interpolasi sekaligus
+        v = np.asarray(values[1:], dtype=np.float64)
+        grid = np.arange(self._next, t + 1e-9, self.interval_ms)
+        weight = ((grid - self._prev_t) / dt)[:, None]
+        grid_v = self._prev_v + (v - self._prev_v) * weight
+        self._next = grid[-1] + self.interval_ms
+        self._prev_t = t
+        self._prev_v = v
+        self.emitted += len(grid)
+        return [tuple([int(ts)] + row) for ts, row in zip(grid.tolist(), grid_v.tolist())]
+
+    def stats(self):
+        """Same keys as timing_stats()"""
+        if not self._n:
+            mean = jitter = None
+        else:
+            mean = self._sum / self._n
+            jitter = max(self._sumsq / self._n - mean * mean, 0.0) ** 0.5
+        return {
+            'samples': self.samples,
+            'mean_ms': None if mean is None else round(mean, 3),
+            'jitter_ms': None if jitter is None else round(jitter, 3),
+            'max_jitter_ms': round(self._max_jitter, 3) if self._n else None,
+            'min_ms': self._min,
+            'max_ms': self._max,
+            'gaps': self.gaps,
+            'duplicates': self.duplicates,
+            'out_of_order': self.out_of_order,
+        }
+
@@ -0,0 +1,26 @@
+"""Tests for sensor_parser: fast path and tolerant fallback must agree"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sensor_parser import SensorLineParser  # noqa: E402
+
+LINE = ('{"timestamp":1,"adxl345":{"ax":%s,"ay":1.0,"az":2.0},'
+        '"mpu6050":{"accel":{"x":0.1,"y":0.2,"z":0.3},"gyro":{"x":0,"y":0,"z":0},"temp":25.0},'
+        '"bmp280":{"temp":24.0,"pressure":1000.0,"altitude":10.0}}')
+
+
+def test_valid_line_uses_fast_path():
+    parser = SensorLineParser()
+    assert parser.parse(LINE % '0.5')[:2] == (1, 0.5)
+    assert parser.fast_path == 1
+
+
+def test_bad_values_rejected_on_both_paths():
+    for value in ('true', 'NaN', 'Infinity', 'null', '"1.0"'):
+        parser = SensorLineParser()
+        assert parser.parse(LINE % value) is None, value
+        assert parser.parse('garbage ' + LINE % value) is None, value
+        assert parser.rejected['bad_value'] == 2, value
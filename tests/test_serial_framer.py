@@ -0,0 +1,22 @@
+"""Tests for serial_framer.LineFramer resynchronization"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from serial_framer import LineFramer  # noqa: E402
+
+
+def test_resync_without_marker_keeps_no_garbage():
+    framer = LineFramer(max_frame_size=32)
+    assert framer.feed(b'x' * 100) == []
+    assert framer.pending == 0
+    assert framer.feed(b'{"timestamp":1}\n') == ['{"timestamp":1}']
+
+
+def test_resync_keeps_split_marker_prefix():
+    framer = LineFramer(max_frame_size=32)
+    assert framer.feed(b'x' * 100 + b'{"time') == []
+    assert framer.feed(b'stamp":2}\n') == ['{"timestamp":2}']
+    assert framer.discarded_bytes == 100